@@ -1,6 +1,11 @@
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import List
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 import requests
 import jwt
@@ -8,12 +13,23 @@ from jwt.algorithms import RSAAlgorithm
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from prometheus_client import Counter, Histogram
 from rest_framework import exceptions
 from rest_framework.authentication import get_authorization_header, BaseAuthentication
 
 from accounts.models import User as _User_type
 
 User: _User_type = get_user_model()
+logger = logging.getLogger(__name__)
+
+JWKS_REFRESH_SECONDS = Histogram(
+    "innohassle_jwks_refresh_seconds",
+    "Time spent fetching InNoHassle Accounts JWKS",
+)
+JWKS_REFRESH_FAILURES = Counter(
+    "innohassle_jwks_refresh_failures",
+    "Failed fetches of InNoHassle Accounts JWKS",
+)
 
 
 class InNoHassleAuthentication(BaseAuthentication):
@@ -49,6 +65,14 @@ class InNoHassleAuthentication(BaseAuthentication):
         Validate the token and return a user matching email.
         """
 
+        user_id = verified_tokens.get(token)
+        if user_id is not None:
+            try:
+                return User.objects.get(pk=user_id), token
+            except User.DoesNotExist:
+                verified_tokens.discard(token)
+                raise exceptions.AuthenticationFailed('Invalid token')
+
         claims = InNoHassleAccounts.decode_jwt(token)
         if not claims:
             # Invalid token. Let other authentication classes handle it.
@@ -61,6 +85,7 @@ class InNoHassleAuthentication(BaseAuthentication):
         except User.DoesNotExist:
             raise exceptions.AuthenticationFailed('Invalid token')
 
+        verified_tokens.add(token, user.pk, claims.get('exp'))
         return user, token
 
     def authenticate_header(self, request):
@@ -73,21 +98,100 @@ class InNoHassleAuthentication(BaseAuthentication):
         return "Bearer"
 
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of tokens that passed verification, mapped to the id of their user.
+    Tokens are stored by hash and expire at their `exp` claim, tokens without `exp` are not cached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[int]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def add(self, token: str, user_id: int, expires_at: Optional[float]):
+        if expires_at is None or self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 class InNoHassleAccounts:
     keys: List[RSAPublicKey] = []
+    # Keys by their `kid`, a token with a known `kid` is checked against its key first
+    keys_by_kid: Dict[str, RSAPublicKey] = {}
+    # Keys published without `kid`
+    unnamed_keys: List[RSAPublicKey] = []
     keys_timestamp: datetime = datetime.min
 
+    # Keys are fetched by a background thread of each worker, requests never fetch them themselves
+    _refresher: Optional[threading.Thread] = None
+    _refresher_lock = threading.Lock()
+    _wake = threading.Event()
+    _stop = threading.Event()
+    # Number of finished refresh attempts, requests wait on the condition for the next attempt
+    _refresh_generation = 0
+    _refreshed = threading.Condition()
+    # Monotonic time of the last refresh requested for an unknown kid
+    _refresh_requested_at = float("-inf")
+
     @classmethod
     def decode_jwt(cls, token: str):
         """
         Decode the JWT token and return the payload.
         """
 
-        # Fetch the keys if necessary
-        cls.load_keys()
+        generation = cls._refresh_generation
+        cls.start_refresher()
+        if not cls.keys:
+            # Keys were never loaded, wait for the first attempt
+            cls.wait_for_refresh(generation)
+
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.PyJWTError:
+            return None
+
+        if kid and kid not in cls.keys_by_kid and cls.request_refresh():
+            # The keys might have been rotated, wait for the refresh
+            cls.wait_for_refresh(generation)
 
-        # Decode the token using each key
-        for key in cls.keys:
+        # Decode the token using the key with its kid, or else using each key,
+        # as tokens without kid or with a kid not loaded yet were always accepted
+        if kid in cls.keys_by_kid:
+            candidates = [cls.keys_by_kid[kid]]
+        else:
+            candidates = list(cls.keys_by_kid.values()) + cls.unnamed_keys
+        for key in candidates:
             try:
                 return jwt.decode(
                     token,
@@ -116,17 +220,88 @@ class InNoHassleAccounts:
         return None
 
     @classmethod
-    def load_keys(cls):
+    def start_refresher(cls):
+        """
+        Start the background thread refreshing the keys, if it is not running.
+        """
+
+        if cls._refresher is not None and cls._refresher.is_alive():
+            return
+        with cls._refresher_lock:
+            if cls._refresher is None or not cls._refresher.is_alive():
+                cls._stop.clear()
+                cls._refresher = threading.Thread(target=cls._refresh_forever, name="jwks-refresher", daemon=True)
+                cls._refresher.start()
+
+    @classmethod
+    def stop_refresher(cls):
+        cls._stop.set()
+        cls._wake.set()
+        if cls._refresher is not None:
+            cls._refresher.join()
+            cls._refresher = None
+
+    @classmethod
+    def _refresh_forever(cls):
+        while not cls._stop.is_set():
+            success = cls.refresh_keys()
+            # Retry failed fetches sooner, previous keys are served meanwhile
+            interval = (
+                innohassle_settings["KEYS_RELOAD_INTERVAL"] * 3600 if success
+                else innohassle_settings["KEYS_RETRY_INTERVAL"]
+            )
+            cls._wake.wait(interval)
+            cls._wake.clear()
+
+    @classmethod
+    def refresh_keys(cls) -> bool:
+        """
+        Load the keys, keeping the previous ones on failure, and wake up requests waiting for them.
+        """
+
+        with JWKS_REFRESH_SECONDS.time():
+            try:
+                success = cls._load_keys()
+            except Exception:
+                # Unexpected JWKS content must not stop the refresher
+                logger.exception("Failed to load InNoHassle Accounts keys")
+                success = False
+        if success:
+            cls.keys_timestamp = datetime.now()
+        else:
+            JWKS_REFRESH_FAILURES.inc()
+
+        with cls._refreshed:
+            cls._refresh_generation += 1
+            cls._refreshed.notify_all()
+        return success
+
+    @classmethod
+    def request_refresh(cls) -> bool:
+        """
+        Ask the background thread to refresh the keys now,
+        at most once per KEYS_RETRY_INTERVAL seconds.
+        """
+
+        with cls._refresher_lock:
+            now = time.monotonic()
+            if now - cls._refresh_requested_at < innohassle_settings["KEYS_RETRY_INTERVAL"]:
+                return False
+            cls._refresh_requested_at = now
+        cls._wake.set()
+        return True
+
+    @classmethod
+    def wait_for_refresh(cls, generation: int):
         """
-        Check if the keys need to be refreshed and load them if necessary.
+        Wait until a refresh attempt started after the given generation finishes, bounded by the fetch timeout.
         """
 
-        refresh_time = datetime.now() - timedelta(hours=innohassle_settings["KEYS_RELOAD_INTERVAL"])
-        if cls.keys_timestamp < refresh_time:
-            # Load the keys and update the timestamp
-            success = cls._load_keys()
-            if success:
-                cls.keys_timestamp = datetime.now()
+        with cls._refreshed:
+            cls._refreshed.wait_for(
+                lambda: cls._refresh_generation > generation,
+                timeout=innohassle_settings["KEYS_FETCH_TIMEOUT"],
+            )
 
     @classmethod
     def _load_keys(cls):
@@ -134,19 +309,26 @@ class InNoHassleAccounts:
 
         # Fetch the JWKS
         try:
-            response = requests.get(jwks_uri)
+            response = requests.get(jwks_uri, timeout=innohassle_settings["KEYS_FETCH_TIMEOUT"])
             response.raise_for_status()
             result = response.json()
-        except requests.RequestException:
+        except (requests.RequestException, ValueError):
             return False
 
         # Load the keys
         keys = []
-        for key in result["keys"]:
+        keys_by_kid = {}
+        unnamed_keys = []
+        for jwk in result["keys"]:
             try:
-                keys.append(RSAAlgorithm.from_jwk(json.dumps(key)))
+                key = RSAAlgorithm.from_jwk(json.dumps(jwk))
             except jwt.PyJWTError:
                 continue
+            keys.append(key)
+            if jwk.get("kid"):
+                keys_by_kid[jwk["kid"]] = key
+            else:
+                unnamed_keys.append(key)
 
         if len(keys) == 0 and len(cls.keys) > 0:
             # Something went wrong
@@ -154,7 +336,12 @@ class InNoHassleAccounts:
 
         # Success
         cls.keys = keys
+        cls.keys_by_kid = keys_by_kid
+        cls.unnamed_keys = unnamed_keys
+        # Tokens verified with withdrawn keys must be verified again
+        verified_tokens.clear()
         return True
 
 
 innohassle_settings = settings.AUTH_INNOHASSLE
+verified_tokens = VerifiedTokenCache(innohassle_settings["VERIFIED_TOKENS_CACHE_SIZE"])
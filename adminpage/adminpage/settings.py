@@ -294,8 +294,11 @@ AUTH_ADFS = {
 AUTH_INNOHASSLE = {
     "API_URL": "https://api.innohassle.ru/accounts/v0",
     "KEYS_RELOAD_INTERVAL": 24,  # hours
+    "KEYS_RETRY_INTERVAL": 60,  # seconds, after a failed fetch or for a token with unknown kid
+    "KEYS_FETCH_TIMEOUT": 5,  # seconds
     "AUDIENCE": "sport",
     "USERNAME_CLAIM": "email",
+    "VERIFIED_TOKENS_CACHE_SIZE": 1024,  # tokens per worker
 }
 
 LOGIN_URL = "login"
@@ -467,6 +470,19 @@ EMAIL_TEMPLATES = {
         'Best regards,\n'
         'School of Sport and Healthy Lifestyle'
     ),
+    'trainings_rescheduled': (
+        '[IU Sport] Training Schedule Change',
+        'Dear {student_name},\n\n'
+        'The schedule of <i>{group_name}</i> has been changed, '
+        'your check-ins for the following training sessions were cancelled:\n'
+        '{changes}\n\n'
+        'We kindly ask you to <b>check in for the trainings again</b> on '
+        '<a href="https://sport.innopolis.university">sport.innopolis.university</a>.\n\n'
+        'We apologize for any inconvenience this may have caused.\n'
+        'Thank you for your understanding.\n\n'
+        'Best regards,\n'
+        'School of Sport and Healthy Lifestyle'
+    ),
     'training_reminder': (
         '[IU Sport] Reminder: you have an upcoming training session',
         """\
@@ -524,6 +540,12 @@ if DEBUG:
 
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", None)
 
+# Emails are queued in the outbox and sent by `manage.py send_outbox_emails`
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+# Delay before the first retry, doubled after every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = timedelta(minutes=1)
+
 ACADEMIC_DURATION_PERCENTAGE = 0.05
 ACADEMIC_DURATION_MAX = 2
 
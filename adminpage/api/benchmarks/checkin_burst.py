@@ -0,0 +1,171 @@
+"""
+Check-in burst benchmark.
+
+Seeds a semester with groups, trainings and students using the test factories,
+then fires concurrent check-ins, mostly at one popular training, and reports
+throughput, latency percentiles, lock wait time and correctness.
+Every student also tries several other trainings of the same day, some of the same sport,
+so that check-ins of one student compete for the daily and per-sport hour limits.
+
+It runs against the test PostgreSQL database (local or docker) and is not
+collected with the regular tests, run it explicitly:
+
+    pytest api/benchmarks/checkin_burst.py -s
+
+Tune it with environment variables:
+    CHECKIN_BENCH_STUDENTS - number of students (default 2000)
+    CHECKIN_BENCH_THREADS - number of concurrent clients (default 32)
+    CHECKIN_BENCH_CAPACITY - capacity of the popular training (default 100)
+    CHECKIN_BENCH_TRAININGS - number of trainings, the first one is popular (default 10)
+    CHECKIN_BENCH_PER_STUDENT - other trainings of the day every student tries (default 3)
+"""
+import os
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone as django_timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import api.views.training
+from sport.models import Student, TrainingCheckIn, MedicalGroups
+
+STUDENTS = int(os.getenv("CHECKIN_BENCH_STUDENTS", 2000))
+THREADS = int(os.getenv("CHECKIN_BENCH_THREADS", 32))
+CAPACITY = int(os.getenv("CHECKIN_BENCH_CAPACITY", 100))
+TRAININGS = int(os.getenv("CHECKIN_BENCH_TRAININGS", 10))
+PER_STUDENT = int(os.getenv("CHECKIN_BENCH_PER_STUDENT", 3))
+# Trainings share sports, so that the per-sport hour limit is hit too
+SPORTS = 3
+# Every n-th student sends the check-in twice, to check that duplicates are rejected
+DUPLICATE_EVERY = 10
+
+
+def percentile(values, p):
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+@pytest.fixture
+def seed(student_factory, sport_factory, semester_factory, group_factory, training_factory):
+    today = datetime.now(timezone.utc).replace(hour=6, minute=0, second=0, microsecond=0)
+    semester = semester_factory("Benchmark", (today - timedelta(days=10)).date(), (today + timedelta(days=30)).date())
+    sports = [sport_factory(f"Sport {i}") for i in range(SPORTS)]
+
+    # All trainings are on the same day, 2 academic hours each
+    trainings = []
+    for i in range(TRAININGS):
+        group = group_factory(
+            f"G{i}",
+            capacity=CAPACITY if i == 0 else STUDENTS,
+            sport=sports[i % SPORTS],
+            semester=semester,
+        )
+        start = today + timedelta(days=1, hours=i)
+        trainings.append(training_factory(group=group, start=start, end=start + timedelta(minutes=90)))
+
+    users = [student_factory(email=f"bench{i}@example.com") for i in range(STUDENTS)]
+    Student.objects.update(medical_group_id=MedicalGroups.GENERAL)
+    return trainings, users
+
+
+@pytest.mark.django_db(transaction=True)
+def test_checkin_burst(seed, monkeypatch, capsys):
+    trainings, users = seed
+
+    # Half of the students rush the popular training, all of them try other trainings of the same day.
+    # Requests of one student are adjacent, so they go to different threads and run concurrently
+    requests = []
+    others = trainings[1:] or trainings
+    for i, user in enumerate(users):
+        student_trainings = [trainings[0]] if i % 2 == 0 else []
+        student_trainings += [others[(i + j) % len(others)] for j in range(min(PER_STUDENT, len(others)))]
+        for training in student_trainings:
+            requests.append((user, training))
+        if i % DUPLICATE_EVERY == 0:
+            requests.append((user, student_trainings[0]))
+
+    lock_waits = []
+    lock_for_check_in = api.views.training.lock_for_check_in
+
+    def timed_lock_for_check_in(student, training):
+        started = time.perf_counter()
+        lock_for_check_in(student, training)
+        lock_waits.append(time.perf_counter() - started)
+
+    monkeypatch.setattr(api.views.training, "lock_for_check_in", timed_lock_for_check_in)
+
+    latencies = []
+    responses = Counter()
+    accepted = Counter()
+    barrier = threading.Barrier(THREADS)
+
+    def client_thread(chunk):
+        client = APIClient()
+        barrier.wait()
+        try:
+            for user, training in chunk:
+                client.force_authenticate(user)
+                started = time.perf_counter()
+                response = client.post(f"/{settings.PREFIX}api/training/{training.pk}/check_in")
+                latencies.append(time.perf_counter() - started)
+                responses[response.status_code] += 1
+                if response.status_code == status.HTTP_200_OK:
+                    accepted[training.pk] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=client_thread, args=(requests[i::THREADS],)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    checkins = Counter(dict(
+        TrainingCheckIn.objects.values_list("training_id").annotate(count=Count("id"))
+    ))
+    duplicates = (
+        TrainingCheckIn.objects.values("student_id", "training_id")
+        .annotate(count=Count("id")).filter(count__gt=1).count()
+    )
+    overflows = [t.pk for t in trainings if checkins[t.pk] > t.group.capacity]
+
+    # Hours of every student by local day and by (local day, sport)
+    day_hours = defaultdict(float)
+    sport_hours = defaultdict(float)
+    for checkin in TrainingCheckIn.objects.select_related("training__group"):
+        day = django_timezone.localtime(checkin.training.start).date()
+        day_hours[checkin.student_id, day] += checkin.training.academic_duration
+        sport_hours[checkin.student_id, day, checkin.training.group.sport_id] += checkin.training.academic_duration
+    over_day_limit = [key for key, hours in day_hours.items() if hours > 4]
+    over_sport_limit = [key for key, hours in sport_hours.items() if hours > 2]
+
+    with capsys.disabled():
+        print()
+        print(f"Check-in burst: {len(requests)} requests, {STUDENTS} students, {THREADS} threads, "
+              f"{len(trainings)} trainings, popular training capacity {CAPACITY}")
+        print(f"Throughput: {len(requests) / elapsed:.1f} requests/s in {elapsed:.2f}s")
+        print("Latency, ms: p50 {:.1f}, p95 {:.1f}, p99 {:.1f}, max {:.1f}".format(
+            *(percentile(latencies, p) * 1000 for p in (50, 95, 99)), max(latencies) * 1000))
+        print("Lock wait, ms: p50 {:.1f}, p95 {:.1f}, p99 {:.1f}, total {:.0f}".format(
+            *(percentile(lock_waits, p) * 1000 for p in (50, 95, 99)), sum(lock_waits) * 1000))
+        print(f"Responses: {dict(responses)}")
+        print(f"Popular training: {checkins[trainings[0].pk]}/{CAPACITY} places taken")
+        print(f"Capacity overflows: {len(overflows)}, duplicate check-ins: {duplicates}")
+        print(f"Students over the daily limit: {len(over_day_limit)}, over the sport limit: {len(over_sport_limit)}")
+
+    assert not overflows
+    assert duplicates == 0
+    assert not over_day_limit
+    assert not over_sport_limit
+    assert checkins == accepted
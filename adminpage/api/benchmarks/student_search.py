@@ -0,0 +1,104 @@
+"""
+Student search benchmark.
+
+Seeds synthetic students and measures latency of the ranked student search
+behind the trainer and fitness test autocomplete, for typical keystrokes:
+short prefixes, parts of names and emails, full names and misses.
+Prints the query plan to show whether the trigram indexes are used.
+
+It runs against the test PostgreSQL database (local or docker) and is not
+collected with the regular tests, run it explicitly:
+
+    pytest api/benchmarks/student_search.py -s
+
+Tune it with environment variables:
+    SEARCH_BENCH_USERS - number of students (default 50000)
+    SEARCH_BENCH_REPEAT - searches per term (default 20)
+"""
+import os
+import random
+import statistics
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.crud import get_email_name_like_students
+from sport.models import Student
+
+USERS = int(os.getenv("SEARCH_BENCH_USERS", 50000))
+REPEAT = int(os.getenv("SEARCH_BENCH_REPEAT", 20))
+BATCH_SIZE = 5000
+
+FIRST_NAMES = [
+    "Alexander", "Anna", "Artem", "Daria", "Dmitry", "Elena", "Fedor", "Ivan", "Kirill", "Maria",
+    "Mikhail", "Nikita", "Olga", "Pavel", "Polina", "Roman", "Sergey", "Sofia", "Timur", "Yulia",
+]
+LAST_NAME_PARTS = [
+    "Ivan", "Petr", "Smirn", "Kuzn", "Popov", "Sokol", "Lebed", "Kozl", "Novik", "Moroz",
+    "Volk", "Solov", "Vasil", "Zaits", "Pavl", "Semen", "Golub", "Vinogr", "Bogd", "Fedor",
+]
+TERMS = ["a", "ko", "fed", "vasil", "olga", "maria novik", "k.moroz", "@example", "zzz"]
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+@pytest.fixture
+def seed():
+    User = get_user_model()
+    rng = random.Random(0)
+    for offset in range(0, USERS, BATCH_SIZE):
+        users = []
+        for i in range(offset, min(offset + BATCH_SIZE, USERS)):
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAME_PARTS) + rng.choice(["ov", "ova", "in", "ina", "ev", "eva"])
+            users.append(User(
+                email=f"{first_name[0].lower()}.{last_name.lower()}{i}@example.com",
+                first_name=first_name,
+                last_name=last_name,
+                password="!",
+            ))
+        User.objects.bulk_create(users)
+        Student.objects.bulk_create([Student(user=user) for user in users])
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE auth_user")
+        cursor.execute("ANALYZE student")
+
+
+@pytest.mark.django_db
+def test_student_search(seed, capsys):
+    latencies = {}
+    found = {}
+    for term in TERMS:
+        latencies[term] = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            found[term] = get_email_name_like_students(term)
+            latencies[term].append(time.perf_counter() - started)
+
+    # the plan of the very query the search runs, with its parameters
+    with CaptureQueriesContext(connection) as queries:
+        get_email_name_like_students("vasil")
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {queries[-1]['sql']}")
+        plan = [row[0] for row in cursor.fetchall()]
+
+    with capsys.disabled():
+        print()
+        print(f"Student search: {USERS} students, {REPEAT} searches per term")
+        for term in TERMS:
+            print("{:>14}: p50 {:.1f} ms, p95 {:.1f} ms, {} found".format(
+                repr(term), percentile(latencies[term], 50) * 1000,
+                percentile(latencies[term], 95) * 1000, len(found[term])))
+        print("Plan of a substring search:")
+        for line in plan:
+            print(f"    {line}")
+
+    assert len(found["vasil"]) == 5
+    assert all(student["email"].startswith("k.moroz") for student in found["k.moroz"])
+    assert found["zzz"] == []
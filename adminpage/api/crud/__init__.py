@@ -1,4 +1,5 @@
 from .crud_attendance import *
+from .crud_hours_distribution import *
 from .crud_enrolled import *
 from .crud_groups import *
 from .crud_schedule import *
@@ -9,3 +10,6 @@ from .crud_faq import *
 from .crud_fitness_test import *
 from .crud_medical_groups import *
 from .crud_training_class import *
+from .crud_analytics import *
+from .crud_export import *
+from .crud_bootstrap import *
@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+from typing import Optional, Dict, Union, List
+
+from django.db import connection
+
+from api.crud.utils import dictfetchall
+
+ANALYTICS_GROUP_BY_COLUMNS = {
+    "sport": "c.sport_id",
+    "medical_group": "c.medical_group_id",
+    "group": "c.group_id",
+}
+
+
+def _buckets(start: date, end: date, granularity: str) -> List[date]:
+    """
+    Starts of all periods between start and end, aligned like PostgreSQL date_trunc
+    """
+    if granularity == "week":
+        current = start - timedelta(days=start.weekday())
+    elif granularity == "month":
+        current = start.replace(day=1)
+    else:
+        current = start
+
+    buckets = []
+    while current <= end:
+        buckets.append(current)
+        if granularity == "week":
+            current += timedelta(weeks=1)
+        elif granularity == "month":
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+    return buckets
+
+
+def get_attendance_series(
+        start: date,
+        end: date,
+        granularity: str = "day",
+        group_by: Optional[str] = None,
+        sport_id: Optional[int] = None,
+        medical_group_id: Optional[int] = None,
+) -> Dict[str, Union[int, Dict[Optional[int], int]]]:
+    """
+    Counts attendance records by period of the training start, from the daily attendance cube
+    @param start - first day of the window
+    @param end - last day of the window
+    @param granularity - period length: day, week or month
+    @param group_by - optionally split counts by sport, medical_group or group
+    @param sport_id - count only trainings of the sport
+    @param medical_group_id - count only students of the medical group
+    @return dense series: period start -> count, or period start -> {key -> count} when grouped
+    """
+    key_column = ANALYTICS_GROUP_BY_COLUMNS[group_by] if group_by else "NULL::int"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT date_trunc(%(granularity)s, c.day)::date AS bucket, '
+            f'{key_column} AS key, '
+            f'sum(c.attendance_count)::int AS count '
+            f'FROM attendance_daily_cube c '
+            f'WHERE c.day BETWEEN %(start)s AND %(end)s '
+            f'AND (%(sport_id)s::int IS NULL OR c.sport_id = %(sport_id)s) '
+            f'AND (%(medical_group_id)s::int IS NULL OR c.medical_group_id = %(medical_group_id)s) '
+            f'GROUP BY 1, 2', {
+                "granularity": granularity,
+                "start": start,
+                "end": end,
+                "sport_id": sport_id,
+                "medical_group_id": medical_group_id,
+            })
+        rows = dictfetchall(cursor)
+
+    counts = {(row["bucket"], row["key"]): row["count"] for row in rows}
+    buckets = _buckets(start, end, granularity)
+    if not group_by:
+        return {bucket.isoformat(): counts.get((bucket, None), 0) for bucket in buckets}
+
+    keys = sorted({row["key"] for row in rows}, key=lambda key: (key is None, key))
+    return {
+        bucket.isoformat(): {key: counts.get((bucket, key), 0) for key in keys}
+        for bucket in buckets
+    }
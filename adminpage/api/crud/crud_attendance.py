@@ -1,5 +1,5 @@
 from math import floor
-from typing import Iterable, Tuple, List
+from typing import Iterable, Tuple, List, Optional, Dict
 
 from django.db.models import F, Value, BooleanField, Case, When, CharField, Sum, IntegerField, OuterRef
 from django.db.models.functions import Concat, Coalesce
@@ -9,9 +9,11 @@ from typing import TypedDict
 from django.db import connection
 
 from api.crud.utils import dictfetchall
-from sport.models import Student, Semester, Training, SelfSportReport, Reference, Debt
+from sport.models import Student, Semester, Training, SelfSportReport, Reference, Debt, StudentHoursLedger, \
+    StudentStatuses
 
 from api.crud.crud_semester import get_ongoing_semester
+from api.crud.crud_hours_distribution import get_hours_distribution
 from sport.models import Attendance
 from .utils import SumSubquery
 
@@ -32,7 +34,7 @@ def get_brief_hours(student: Student) -> List[BriefHours]:
     """
     Retrieves statistics of hours per different semesters
     """
-    hours = get_student_hours(student)
+    hours = get_student_hours(student.pk)
     hours = [hours['ongoing_semester']] + hours['last_semesters_hours']
 
     brief_hours: List[BriefHours] = []
@@ -115,13 +117,64 @@ def get_detailed_hours_and_self(student, semester: Semester):
     return att.union(self).union(ref).order_by('timestamp')
 
 
+# Writes marks of one training from arrays of student ids and hours in one statement:
+# zero hours delete the attendance record, positive hours insert or update it
+MARK_HOURS_SQL = (
+    'WITH marks AS ('
+    '    SELECT * FROM unnest(%(student_ids)s::int[], %(hours)s::numeric[]) AS m(student_id, hours)'
+    '), deleted AS ('
+    '    DELETE FROM attendance a USING marks m '
+    '    WHERE a.training_id = %(training_id)s AND a.student_id = m.student_id AND m.hours = 0'
+    ') '
+    'INSERT INTO attendance (student_id, training_id, hours) '
+    'SELECT student_id, %(training_id)s, hours FROM marks WHERE hours > 0 '
+    'ON CONFLICT ON CONSTRAINT unique_attendance '
+    'DO UPDATE SET hours = excluded.hours'
+)
+
+# Validates the whole roster against student statuses and the hours limit and, only if no mark
+# is out of bounds, writes marks of students with normal status, all in one statement
+GRADE_STUDENTS_SQL = (
+    'WITH marks AS ('
+    '    SELECT m.student_id, m.hours, u.email, s.student_status_id = %(normal_status)s AS is_normal, '
+    '           CASE WHEN m.hours < 0 THEN \'negative\' '
+    '                WHEN m.hours > %(max_hours)s THEN \'overflow\' END AS error '
+    '    FROM unnest(%(student_ids)s::int[], %(hours)s::numeric[]) AS m(student_id, hours) '
+    '    JOIN student s ON s.user_id = m.student_id '
+    '    JOIN auth_user u ON u.id = s.user_id'
+    '), valid AS ('
+    '    SELECT student_id, hours FROM marks '
+    '    WHERE is_normal AND NOT EXISTS (SELECT 1 FROM marks WHERE error IS NOT NULL)'
+    '), deleted AS ('
+    '    DELETE FROM attendance a USING valid v '
+    '    WHERE a.training_id = %(training_id)s AND a.student_id = v.student_id AND v.hours = 0'
+    '), upserted AS ('
+    '    INSERT INTO attendance (student_id, training_id, hours) '
+    '    SELECT student_id, %(training_id)s, hours FROM valid WHERE hours > 0 '
+    '    ON CONFLICT ON CONSTRAINT unique_attendance '
+    '    DO UPDATE SET hours = excluded.hours'
+    ') '
+    'SELECT student_id, email, error, is_normal FROM marks ORDER BY student_id'
+)
+
+
+def _marks_arrays(student_hours: Iterable[Tuple[int, float]]) -> Dict[str, list]:
+    # The last mark of a student wins, a statement can not upsert the same row twice
+    marks = dict(student_hours)
+    return {
+        "student_ids": list(marks.keys()),
+        "hours": list(marks.values()),
+    }
+
+
 def mark_hours(training: Training, student_hours: Iterable[Tuple[int, float]]):
     """
     Puts hours for one training session to one student. If hours for session were already put, updates it
     @param training: given training
     @param student_hours: iterable with items (<student_id:int>, <student_hours:float>)
     """
-    for student_id, student_mark in student_hours:
+    marks = _marks_arrays(student_hours)
+    for student_id, student_mark in zip(marks["student_ids"], marks["hours"]):
         if student_id <= 0 or student_mark < 0.0:
             raise ValueError(
                 f"All students id and marks must be non-negative, got {(student_id, student_mark)}")
@@ -131,23 +184,51 @@ def mark_hours(training: Training, student_hours: Iterable[Tuple[int, float]]):
         if floor(student_mark) >= floor_max:
             raise ValueError(f"All students marks must floor to less than {floor_max}, "
                              f"got {student_mark} -> {floor(student_mark)} >= {floor_max}")
+    if not marks["student_ids"]:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(MARK_HOURS_SQL, {"training_id": training.pk, **marks})
+
+
+class GradeReport(TypedDict):
+    negative_marks: List[dict]
+    overflow_marks: List[dict]
+    marked: List[dict]
+
+
+def grade_students(training: Training, student_hours: Iterable[Tuple[int, float]]) -> GradeReport:
+    """
+    Marks hours of a training roster in one query.
+    Nothing is written if some marks are negative or exceed the training duration,
+    students with not normal status and unknown students are skipped
+    @param training: given training
+    @param student_hours: iterable with items (<student_id:int>, <student_hours:float>)
+    @return marks out of bounds and marks written, as lists of {"email", "hours"}
+    """
+    report: GradeReport = {"negative_marks": [], "overflow_marks": [], "marked": []}
+    marks = _marks_arrays(student_hours)
+    if not marks["student_ids"]:
+        return report
+
     with connection.cursor() as cursor:
-        args_add_str = b",".join(
-            cursor.mogrify("(%s, %s, %s)", (student_id,
-                           training.pk, student_mark))
-            for student_id, student_mark in student_hours if student_mark > 0
-        )
-        args_del_str = b",".join(
-            cursor.mogrify("(%s, %s)", (student_id, training.pk))
-            for student_id, student_mark in student_hours if student_mark == 0
-        )
-        if len(args_add_str) > 0:
-            cursor.execute(f'INSERT INTO attendance (student_id, training_id, hours) VALUES {args_add_str.decode()} '
-                           f'ON CONFLICT ON CONSTRAINT unique_attendance '
-                           f'DO UPDATE set hours=excluded.hours')
-        if len(args_del_str) > 0:
-            cursor.execute(f'DELETE FROM attendance '
-                           f'WHERE  (student_id, training_id) IN ({args_del_str.decode()})')
+        cursor.execute(GRADE_STUDENTS_SQL, {
+            "training_id": training.pk,
+            "max_hours": training.academic_duration,
+            "normal_status": StudentStatuses.NORMAL,
+            **marks,
+        })
+        rows = dictfetchall(cursor)
+
+    hours = dict(zip(marks["student_ids"], marks["hours"]))
+    for row in rows:
+        grade = {"email": row["email"], "hours": hours[row["student_id"]]}
+        if row["error"]:
+            report[f"{row['error']}_marks"].append(grade)
+        elif row["is_normal"]:
+            report["marked"].append(grade)
+    if report["negative_marks"] or report["overflow_marks"]:
+        report["marked"] = []
+    return report
 
 
 def toggle_has_QR(student: Student):
@@ -167,79 +248,84 @@ class SemesterHours(TypedDict):
     debt: int
 
 
-def get_student_hours(student_id, **kwargs) -> TypedDict('StudentHours',
-                                                         {'last_semesters_hours': List[SemesterHours],
-                                                          'ongoing_semester': SemesterHours}):
-    student = Student.objects.get(user_id=student_id)
-    sem_info_cur = {"id_sem": 0, "hours_not_self": 0.0, "hours_self_not_debt": 0.0,
-                    "hours_self_debt": 0.0, "hours_sem_max": 0.0, "debt": 0.0}
-
-    query_attend_current_semester = Attendance.objects.filter(student_id=student_id,
-                                                              training__group__semester=get_ongoing_semester())
-    sem_info_cur['id_sem'] = get_ongoing_semester().id
-    sem_info_cur['hours_sem_max'] = get_ongoing_semester().hours
-
-    try:
-        sem_info_cur['debt'] = Debt.objects.get(
-            semester_id=get_ongoing_semester().id, student_id=student_id).debt
-    except Debt.DoesNotExist:
-        sem_info_cur['debt'] = 0
-
-    for sem in query_attend_current_semester:
-        if sem.cause_report is None:
-            sem_info_cur['hours_not_self'] += float(sem.hours)
-        elif sem.cause_report.debt is True:
-            sem_info_cur['hours_self_debt'] += float(sem.hours)
-        else:
-            sem_info_cur['hours_self_not_debt'] += float(sem.hours)
-
-    sem_info = {"id_sem": 0, "hours_not_self": 0.0, "hours_self_not_debt": 0.0,
-                "hours_self_debt": 0.0, "hours_sem_max": 0.0, "debt": 0.0}
-    last_sem_info_arr = []
-
-    last_semesters = Semester.objects.filter(
-        end__lt=get_ongoing_semester().start).order_by('-end')
-
-    for sem in last_semesters:
-        if student in sem.academic_leave_students.all():
-            pass
-        elif sem.end.year >= student.enrollment_year:
-            sem_info["id_sem"] = sem.id
-            sem_info["hours_sem_max"] = sem.hours
-            try:
-                sem_info['debt'] = Debt.objects.get(semester_id=get_ongoing_semester().id,
-                                                    student_id=student_id).debt
-            except Debt.DoesNotExist:
-                sem_info['debt'] = 0
-            query_attend_last_semester = Attendance.objects.filter(student_id=student_id,
-                                                                   training__group__semester=sem)
-            for att in query_attend_last_semester:
-                if att.cause_report is None:
-                    sem_info['hours_not_self'] += float(att.hours)
-                elif att.cause_report.debt is True:
-                    sem_info['hours_self_debt'] += float(att.hours)
-                else:
-                    sem_info['hours_self_not_debt'] += float(att.hours)
-            last_sem_info_arr.append(sem_info)
-            sem_info = {"id_sem": 0, "hours_not_self": 0.0, "hours_self_not_debt": 0.0,
-                        "hours_self_debt": 0.0, "hours_sem_max": 0.0, "debt": 0.0}
+def _ledger_semester_hours(semester: Semester, ledger: Optional[StudentHoursLedger], debt: int) -> SemesterHours:
     return {
-        "last_semesters_hours": last_sem_info_arr,
-        "ongoing_semester": sem_info_cur
+        "id_sem": semester.id,
+        "hours_not_self": float(ledger.hours_not_self) if ledger else 0.0,
+        "hours_self_not_debt": float(ledger.hours_self_not_debt) if ledger else 0.0,
+        "hours_self_debt": float(ledger.hours_self_debt) if ledger else 0.0,
+        "hours_sem_max": semester.hours,
+        "debt": debt,
+    }
+
+
+class StudentHours(TypedDict):
+    last_semesters_hours: List[SemesterHours]
+    ongoing_semester: SemesterHours
+
+
+def get_students_hours(student_ids: Iterable[int]) -> Dict[int, StudentHours]:
+    """
+    Retrieves hours of many students in the ongoing and past semesters from the hours ledger
+    in a constant number of queries
+    @param student_ids - ids of searched students, unknown ids are skipped
+    @return mapping from student id to hours info
+    """
+    students = list(Student.objects.filter(pk__in=student_ids))
+    if not students:
+        return {}
+
+    ongoing_semester = get_ongoing_semester()
+    last_semesters = list(Semester.objects.filter(
+        end__lt=ongoing_semester.start).order_by('-end'))
+
+    ledger = {
+        (row.student_id, row.semester_id): row
+        for row in StudentHoursLedger.objects.filter(student__in=students)
     }
+    academic_leave = set(
+        Semester.academic_leave_students.through.objects
+        .filter(student__in=students, semester__in=last_semesters)
+        .values_list("student_id", "semester_id")
+    )
+
+    result = {}
+    for student in students:
+        ongoing_ledger = ledger.get((student.pk, ongoing_semester.id))
+        ongoing_debt = ongoing_ledger.debt if ongoing_ledger else 0
+
+        last_sem_info_arr = []
+        for sem in last_semesters:
+            if (student.pk, sem.id) in academic_leave or sem.end.year < student.enrollment_year:
+                continue
+            # Past semesters report the debt of the ongoing semester
+            last_sem_info_arr.append(
+                _ledger_semester_hours(sem, ledger.get((student.pk, sem.id)), ongoing_debt)
+            )
+
+        result[student.pk] = {
+            "last_semesters_hours": last_sem_info_arr,
+            "ongoing_semester": _ledger_semester_hours(ongoing_semester, ongoing_ledger, ongoing_debt),
+        }
+    return result
+
+
+def get_student_hours(student_id, **kwargs) -> StudentHours:
+    """
+    Retrieves hours of the student in the ongoing and past semesters from the hours ledger
+    """
+    hours = get_students_hours([student_id])
+    if student_id not in hours:
+        raise Student.DoesNotExist(f"Student {student_id} does not exist")
+    return hours[student_id]
 
 
 def get_negative_hours(student_id, hours_info=None, **kwargs):
     student_hours = get_student_hours(
         student_id) if hours_info is None else hours_info
     sem_now = student_hours['ongoing_semester']
-    try:
-        debt = Debt.objects.get(
-            student=student_id, semester=get_ongoing_semester()).debt
-    except:
-        debt = 0
     res = sem_now['hours_self_debt'] + sem_now['hours_not_self'] + \
-        sem_now['hours_self_not_debt'] - debt
+        sem_now['hours_self_not_debt'] - sem_now['debt']
 
     return res
 
@@ -250,31 +336,7 @@ def create_debt(last_semester, **kwargs):
 
 
 def better_than(student_id):
-    qs = Student.objects.all().annotate(_debt=Coalesce(
-        SumSubquery(Debt.objects.filter(semester_id=get_ongoing_semester().pk,
-                                        student_id=OuterRef("pk")), 'debt'),
-        0
-    ))
-
-    qs = qs.annotate(_ongoing_semester_hours=Coalesce(
-        SumSubquery(Attendance.objects.filter(
-            training__group__semester_id=get_ongoing_semester().pk, student_id=OuterRef("pk")), 'hours'),
-        0
-    ))
-
-    qs = qs.annotate(complex_hours=ExpressionWrapper(
-        F('_ongoing_semester_hours') - F('_debt'), output_field=IntegerField()
-    ))
-
-    student_hours = qs.get(pk=student_id).complex_hours
-    if student_hours <= 0:
-        return 0
-
-    all = qs.filter(complex_hours__gt=0, ).count()
-    if all == 1:
-        return 100
-
-    worse = qs.filter(complex_hours__gt=0,
-                      complex_hours__lt=student_hours).count()
-
-    return round(worse / (all - 1) * 100, 1)
+    """
+    Retrieves percentage of students with less hours in the ongoing semester
+    """
+    return get_hours_distribution(get_ongoing_semester().pk).better_than(student_id)
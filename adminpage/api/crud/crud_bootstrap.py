@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.crud.crud_faq import get_faq
+from api.crud.crud_semester import get_ongoing_semester
+from sport.models import Semester, MedicalGroup, TrainingClass, SelfSportType, Measurement, Sport
+
+# How long a worker trusts its reference data version without consulting the shared cache (seconds)
+REFERENCE_DATA_TTL = 10
+# Shared cache key, bumped on every change of reference data to invalidate caches of all workers
+REFERENCE_DATA_VERSION_KEY = "reference_data_version"
+
+
+class _ReferenceDataVersion:
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.checked_at = float("-inf")
+        self.lock = threading.Lock()
+
+
+_version = _ReferenceDataVersion()
+
+
+def get_reference_data_version() -> int:
+    """
+    Version of slowly changing reference data, cached per worker for a few seconds
+    @return number that is increased on every change of the data
+    """
+    now = time.monotonic()
+    with _version.lock:
+        if _version.version is None or now - _version.checked_at >= REFERENCE_DATA_TTL:
+            _version.version = cache.get(REFERENCE_DATA_VERSION_KEY, 0)
+            _version.checked_at = now
+        return _version.version
+
+
+def _drop_local_reference_data_version():
+    with _version.lock:
+        _version.version = None
+
+
+def _bump_reference_data_version():
+    _drop_local_reference_data_version()
+    try:
+        cache.incr(REFERENCE_DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(REFERENCE_DATA_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_reference_data():
+    """
+    Makes this worker check the version at once
+    and all workers see a new version when the current transaction is committed
+    """
+    _drop_local_reference_data_version()
+    transaction.on_commit(_bump_reference_data_version)
+
+
+def get_reference_data() -> dict:
+    """
+    Slowly changing data the frontend needs on load, one query per kind of data
+    @return semesters, ongoing semester, medical groups, training classes, self sport types,
+    measurements, sports of the ongoing semester and FAQ
+    """
+    ongoing_semester = get_ongoing_semester()
+    return {
+        'ongoing_semester': ongoing_semester,
+        'semesters': list(Semester.objects.order_by('start')),
+        'medical_groups': list(MedicalGroup.objects.all()),
+        'training_classes': list(TrainingClass.objects.all()),
+        'self_sport_types': list(SelfSportType.objects.filter(is_active=True)),
+        'measurements': list(Measurement.objects.all()),
+        'sports': list(
+            Sport.objects.filter(
+                group__semester=ongoing_semester, special=False, visible=True,
+            ).distinct().order_by('name')
+        ),
+        'faq': get_faq(),
+    }
@@ -0,0 +1,113 @@
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator, List
+
+from django.db import connection
+from django.utils import timezone
+
+from api.crud.crud_fitness_test import FitnessTestGrader
+from sport.models import Group, Semester, Training, StudentStatuses, FitnessTestExercise, FitnessTestResult
+
+EXPORT_DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def _iter_rows(query: str, params: dict) -> Iterator[tuple]:
+    # Server-side cursor, rows are fetched in chunks, so memory does not depend on the result size
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(query, params)
+        yield from cursor
+
+
+def iter_group_attendance(group: Group) -> Iterator[List]:
+    """
+    Student × training attendance matrix of a group,
+    for students enrolled in the group or attending any of its trainings
+    @param group - exported group
+    @return header and then one row per student: email, full name, medical group, hours per training, total
+    """
+    trainings = list(Training.objects.filter(group=group).order_by("start", "id").only("start"))
+    yield ["email", "full_name", "med_group"] + [
+        timezone.localtime(training.start).strftime(EXPORT_DATETIME_FORMAT) for training in trainings
+    ] + ["total"]
+
+    rows = _iter_rows(
+        'SELECT d.email, concat(d.first_name, \' \', d.last_name) AS full_name, m.name AS med_group, '
+        'ARRAY('
+        '    SELECT coalesce(a.hours, 0) '
+        '    FROM unnest(%(training_ids)s::int[]) WITH ORDINALITY AS t(id, n) '
+        '    LEFT JOIN attendance a ON a.training_id = t.id AND a.student_id = s.user_id '
+        '    ORDER BY t.n'
+        ') AS hours '
+        'FROM student s '
+        'JOIN auth_user d ON d.id = s.user_id '
+        'LEFT JOIN medical_group m ON m.id = s.medical_group_id '
+        'WHERE s.user_id IN ('
+        '    SELECT e.student_id FROM enroll e WHERE e.group_id = %(group_id)s '
+        '    UNION '
+        '    SELECT a.student_id FROM attendance a, training t '
+        '    WHERE a.training_id = t.id AND t.group_id = %(group_id)s'
+        ') '
+        'ORDER BY full_name, d.email', {
+            "group_id": group.pk,
+            "training_ids": [training.pk for training in trainings],
+        })
+    for email, full_name, med_group, hours in rows:
+        yield [email, full_name, med_group] + hours + [sum(hours)]
+
+
+def iter_semester_hours(semester: Semester) -> Iterator[List]:
+    """
+    Hours of all students in a semester from the hours ledger,
+    for students with normal status or with any hours or debt in the semester
+    @param semester - exported semester
+    @return header and then one row per student
+    """
+    yield [
+        "email", "full_name", "course", "med_group", "student_status",
+        "hours_not_self", "hours_self_not_debt", "hours_self_debt", "total_hours", "debt", "required_hours",
+    ]
+    yield from _iter_rows(
+        'SELECT d.email, concat(d.first_name, \' \', d.last_name) AS full_name, s.course, '
+        'm.name AS med_group, ss.name AS student_status, '
+        'coalesce(l.hours_not_self, 0), coalesce(l.hours_self_not_debt, 0), coalesce(l.hours_self_debt, 0), '
+        'coalesce(l.hours_not_self + l.hours_self_not_debt + l.hours_self_debt, 0) AS total_hours, '
+        'coalesce(l.debt, 0), %(required_hours)s '
+        'FROM student s '
+        'JOIN auth_user d ON d.id = s.user_id '
+        'LEFT JOIN medical_group m ON m.id = s.medical_group_id '
+        'LEFT JOIN student_status ss ON ss.id = s.student_status_id '
+        'LEFT JOIN student_hours_ledger l ON l.student_id = s.user_id AND l.semester_id = %(semester_id)s '
+        'WHERE s.student_status_id = %(normal_status)s OR l.id IS NOT NULL '
+        'ORDER BY d.email', {
+            "semester_id": semester.pk,
+            "required_hours": semester.hours,
+            "normal_status": StudentStatuses.NORMAL,
+        })
+
+
+def iter_fitness_test_scores(semester: Semester) -> Iterator[List]:
+    """
+    Fitness test scores of all students in a semester, graded in memory with grading tables loaded once
+    @param semester - exported semester
+    @return header and then one row per student attempt: email, full name, retake, score per exercise, total, grade
+    """
+    exercises = list(FitnessTestExercise.objects.filter(semester=semester).order_by("pk"))
+    grader = FitnessTestGrader(exercises)
+    columns = {exercise.pk: i for i, exercise in enumerate(exercises)}
+    yield ["email", "full_name", "retake"] + [exercise.exercise_name for exercise in exercises] + \
+        ["total_score", "grade"]
+
+    results = FitnessTestResult.objects.filter(exercise__semester=semester).order_by(
+        "student__user__email", "student_id", "session__retake", "pk",
+    ).values_list(
+        "student_id", "session__retake", "student__user__email", "student__user__first_name",
+        "student__user__last_name", "student__gender", "exercise_id", "value",
+    )
+    for (_, retake), attempt in groupby(results.iterator(chunk_size=2000), key=itemgetter(0, 1)):
+        attempt = list(attempt)
+        _, _, email, first_name, last_name, gender = attempt[0][:6]
+        grade = grader.grade(semester, gender, [(exercise_id, value) for *_, exercise_id, value in attempt])
+        scores = [None] * len(exercises)
+        for (*_, exercise_id, _), detail in zip(attempt, grade["details"]):
+            scores[columns[exercise_id]] = detail["score"]
+        yield [email, f"{first_name} {last_name}", retake] + scores + [grade["total_score"], grade["grade"]]
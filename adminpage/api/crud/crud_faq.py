@@ -1,11 +1,11 @@
-from sport.models import FAQCategory, FAQElement
+from sport.models import FAQCategory
 
 
 def get_faq() -> list:
     """
     Get FAQ
     """
-    result = []
-    for i in FAQCategory.objects.all():
-        result.append({'name': i.name, 'values': list(FAQElement.objects.filter(category__name=i.name))})
-    return result
+    return [
+        {'name': category.name, 'values': list(category.faqelement_set.all())}
+        for category in FAQCategory.objects.prefetch_related('faqelement_set')
+    ]
@@ -1,10 +1,18 @@
 import datetime
+import weakref
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple, TypedDict
 
-from django.db.models import Q
+from asgiref.local import Local
+from django.db import transaction
 
 from api.crud import get_ongoing_semester
 from sport.models import FitnessTestResult, FitnessTestExercise, FitnessTestGrading, Student, FitnessTestSession, \
-    Semester
+    Semester, FitnessTestScore
+from sport.models.enums import GenderInFTGrading
 
 
 def get_exercises_crud(semester_id):
@@ -14,7 +22,50 @@ def get_exercises_crud(semester_id):
         return list(FitnessTestExercise.objects.all())
 
 
-def post_student_exercises_result_crud(semester, retake, results, session_id, teacher):
+class FitnessTestUploadReport(TypedDict):
+    session_id: int
+    errors: List[dict]
+
+
+# Range of the integer column of result values
+RESULT_VALUE_MIN = -2 ** 31
+RESULT_VALUE_MAX = 2 ** 31 - 1
+
+
+def _validate_result(
+        res: dict,
+        students: Set[int],
+        exercises: Dict[int, FitnessTestExercise],
+        semester: Semester,
+) -> Tuple[Optional[int], Optional[str]]:
+    """
+    @return value of a result row and error message, if the row is invalid
+    """
+    if res['student_id'] not in students:
+        return None, f"No student with id={res['student_id']}"
+    exercise = exercises.get(res['exercise_id'])
+    if exercise is None:
+        return None, f"No exercise with id={res['exercise_id']}"
+    if exercise.semester_id != semester.pk:
+        return None, f"Exercise {exercise.exercise_name} is not in semester {semester.name}"
+    try:
+        value = int(res['value'])
+    except (TypeError, ValueError):
+        return None, f"Value {res['value']!r} is not an integer"
+    if not RESULT_VALUE_MIN <= value <= RESULT_VALUE_MAX:
+        return None, f"Value {value} is out of range"
+    if exercise.select is not None and not 0 <= value < len(exercise.select.split(',')):
+        return None, f"Value {value} is not an option of exercise {exercise.exercise_name}"
+    return value, None
+
+
+def post_student_exercises_result_crud(semester, retake, results, session_id, teacher) -> FitnessTestUploadReport:
+    """
+    Saves results of a fitness test session, a result of a student for an exercise in the session is replaced.
+    Students and exercises are resolved with one query each and results are written with one upsert,
+    invalid rows are reported and skipped without failing the other rows
+    @return session id and errors as a list of {"index", "student_id", "exercise_id", "detail"}
+    """
     session, created = FitnessTestSession.objects.get_or_create(
         id=session_id,
         defaults={
@@ -25,28 +76,296 @@ def post_student_exercises_result_crud(semester, retake, results, session_id, te
         }
     )
 
-    for res in results:
-        student = Student.objects.get(user__id=res['student_id'])
-        exercise = FitnessTestExercise.objects.get(id=res['exercise_id'])
+    students = set(Student.objects.filter(
+        pk__in={res['student_id'] for res in results},
+    ).values_list('pk', flat=True))
+    exercises = FitnessTestExercise.objects.in_bulk({res['exercise_id'] for res in results})
 
-        FitnessTestResult.objects.update_or_create(
-            exercise=exercise,
-            student=student,
-            defaults={'value': res['value']},
-            session=session
-        )
+    errors = []
+    # The last row wins when a student has several results for an exercise, like with consecutive updates
+    values = {}
+    for index, res in enumerate(results):
+        value, error = _validate_result(res, students, exercises, semester)
+        if error is not None:
+            errors.append({
+                'index': index,
+                'student_id': res['student_id'],
+                'exercise_id': res['exercise_id'],
+                'detail': error,
+            })
+            continue
+        values[(res['student_id'], res['exercise_id'])] = value
+
+    FitnessTestResult.objects.bulk_create(
+        [
+            FitnessTestResult(student_id=student_id, exercise_id=exercise_id, session=session, value=value)
+            for (student_id, exercise_id), value in values.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['student', 'exercise', 'session'],
+        update_fields=['value'],
+    )
+    # bulk_create does not send signals that refresh the score table
+    refresh_fitness_test_scores(semester.pk, {student_id for student_id, _ in values})
+    return {'session_id': session.id, 'errors': errors}
+
+
+class FitnessTestGrade(TypedDict):
+    grade: bool
+    total_score: int
+    details: List[dict]
 
-    return session.id
 
+class FitnessTestGrader:
+    """
+    Grading tables of fitness test exercises, loaded with one query.
+    Scores are looked up in memory, a table of an exercise for a gender
+    is sorted once and a value is found among its ranges with bisect
+    """
 
-def get_grading_scheme(student: Student, result: FitnessTestResult):
-    return FitnessTestGrading.objects.filter(Q(gender__exact=-1) | Q(gender__exact=student.gender),
-                                             exercise=result.exercise)
+    def __init__(self, exercises: Iterable[FitnessTestExercise]):
+        self.exercises = {exercise.pk: exercise for exercise in exercises}
+        self._gradings = defaultdict(list)
+        for exercise_id, gender, start_range, end_range, score in FitnessTestGrading.objects.filter(
+                exercise_id__in=self.exercises,
+        ).values_list('exercise_id', 'gender', 'start_range', 'end_range', 'score'):
+            self._gradings[(exercise_id, gender)].append((start_range, end_range, score))
+        self._tables = {}
+
+    def _table(self, exercise_id: int, gender: int) -> Tuple[List[int], List[Tuple[int, int, int]]]:
+        key = (exercise_id, gender)
+        if key not in self._tables:
+            # Ranges for both genders apply to everyone, like in the grading scheme query
+            ranges = self._gradings[(exercise_id, GenderInFTGrading.BOTH)]
+            if gender != GenderInFTGrading.BOTH:
+                ranges = ranges + self._gradings[(exercise_id, gender)]
+            ranges = sorted(ranges)
+            self._tables[key] = ([start_range for start_range, _, _ in ranges], ranges)
+        return self._tables[key]
+
+    def score(self, exercise_id: int, gender: int, value: Optional[int]) -> int:
+        """
+        @return score of the range start_range <= value < end_range, 0 if there is no such range
+        """
+        if value is None:
+            return 0
+        starts, ranges = self._table(exercise_id, gender)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value < ranges[i][1]:
+            return ranges[i][2]
+        return 0
+
+    def max_score(self, exercise_id: int, gender: int) -> int:
+        return max((score for _, _, score in self._table(exercise_id, gender)[1]), default=0)
+
+    def grade(
+            self,
+            semester: Semester,
+            gender: int,
+            results: Iterable[Tuple[int, Optional[int]]],
+    ) -> FitnessTestGrade:
+        """
+        Grades results of one fitness test attempt
+        @param semester - semester of the exercises
+        @param gender - gender of the student
+        @param results - pairs (exercise_id, value)
+        @return scores of every result, total score and whether the test is passed
+        """
+        passed = True
+        total_score = 0
+        details = []
+        for exercise_id, value in results:
+            exercise = self.exercises[exercise_id]
+            score = self.score(exercise_id, gender, value)
+            details.append({
+                'exercise': exercise.exercise_name,
+                'unit': exercise.value_unit,
+                'value': value if exercise.select is None else exercise.select.split(',')[value],
+                'score': score,
+                'max_score': self.max_score(exercise_id, gender),
+            })
+            passed = passed and score >= exercise.threshold
+            total_score += score
+
+        return {
+            'grade': passed and total_score >= semester.points_fitness_test,
+            'total_score': total_score,
+            'details': details,
+        }
 
 
 def get_score(student: Student, result: FitnessTestResult):
-    return get_grading_scheme(student, result).get(start_range__lte=result.value, end_range__gt=result.value).score
+    return FitnessTestGrader([result.exercise]).score(result.exercise_id, student.gender, result.value)
 
 
 def get_max_score(student: Student, result: FitnessTestResult):
-    return max(map(lambda x: x[0], get_grading_scheme(student, result).values_list('score')))
+    return FitnessTestGrader([result.exercise]).max_score(result.exercise_id, student.gender)
+
+
+def refresh_fitness_test_scores(semester_id: int, student_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recomputes the fitness test score table of a semester from the results, keeping the best attempt of a student
+    @param semester_id - semester of the exercises
+    @param student_ids - refresh only these students, all students by default
+    @return number of students with scores
+    """
+    grader = FitnessTestGrader(FitnessTestExercise.objects.filter(semester_id=semester_id))
+    results = FitnessTestResult.objects.filter(exercise__semester_id=semester_id)
+    scores = FitnessTestScore.objects.filter(semester_id=semester_id)
+    if student_ids is not None:
+        student_ids = set(student_ids)
+        results = results.filter(student_id__in=student_ids)
+        scores = scores.filter(student_id__in=student_ids)
+
+    best = {}
+    for (student_id, retake), attempt in groupby(
+            results.order_by('student_id', 'session__retake', 'pk')
+            .values_list('student_id', 'session__retake', 'student__gender', 'exercise_id', 'value'),
+            key=itemgetter(0, 1),
+    ):
+        exercise_scores = {
+            str(exercise_id): grader.score(exercise_id, gender, value)
+            for _, _, gender, exercise_id, value in attempt
+        }
+        score = FitnessTestScore(
+            student_id=student_id,
+            semester_id=semester_id,
+            retake=retake,
+            total_score=sum(exercise_scores.values()),
+            exercise_scores=exercise_scores,
+        )
+        if student_id not in best or score.total_score > best[student_id].total_score:
+            best[student_id] = score
+
+    with transaction.atomic():
+        scores.exclude(student_id__in=best).delete()
+        FitnessTestScore.objects.bulk_create(
+            best.values(),
+            update_conflicts=True,
+            unique_fields=['student', 'semester'],
+            update_fields=['retake', 'total_score', 'exercise_scores', 'updated_at'],
+        )
+    return len(best)
+
+
+# Refreshes pending in the current transaction of each connection. Only the commit callbacks of
+# a transaction hold the refresh, so the weak reference is gone once the transaction is rolled back
+_pending_refreshes = Local()
+
+
+class _ScoreRefresh:
+    """
+    Refreshes of the fitness test score table requested in one transaction,
+    merged per semester and run once when the transaction is committed
+    """
+
+    def __init__(self, using: str):
+        self.using = using
+        # semester id -> ids of students to refresh, None for all students
+        self.semesters: Dict[int, Optional[Set[int]]] = {}
+
+    def add(self, semester_id: int, student_ids: Optional[Iterable[int]]):
+        if student_ids is None:
+            self.semesters[semester_id] = None
+        elif semester_id not in self.semesters:
+            self.semesters[semester_id] = set(student_ids)
+        elif self.semesters[semester_id] is not None:
+            self.semesters[semester_id].update(student_ids)
+
+    def __call__(self):
+        pending = getattr(_pending_refreshes, self.using, None)
+        if pending is not None and pending() is self:
+            delattr(_pending_refreshes, self.using)
+        for semester_id, student_ids in self.semesters.items():
+            refresh_fitness_test_scores(semester_id, student_ids)
+
+
+def refresh_fitness_test_scores_on_commit(semester_id: int, student_ids: Optional[Iterable[int]] = None):
+    """
+    Refreshes the fitness test score table when the current transaction is committed.
+    Refreshes requested in one transaction are merged, so a semester is refreshed once
+    @param semester_id - semester of the exercises
+    @param student_ids - refresh only these students, all students by default
+    """
+    connection = transaction.get_connection()
+    pending = getattr(_pending_refreshes, connection.alias, None)
+    refresh = pending() if pending is not None else None
+    if refresh is not None:
+        refresh.add(semester_id, student_ids)
+        return
+    refresh = _ScoreRefresh(connection.alias)
+    refresh.add(semester_id, student_ids)
+    if connection.in_atomic_block:
+        setattr(_pending_refreshes, connection.alias, weakref.ref(refresh))
+    transaction.on_commit(refresh)
+
+
+def _histogram(values: List[int], bin_size: int) -> List[dict]:
+    """
+    Counts of sorted values in bins [from, to) of the given size, bins are aligned to multiples of the size
+    """
+    if not values:
+        return []
+    edges = range(values[0] // bin_size * bin_size, values[-1] + 1, bin_size)
+    return [
+        {'from': edge, 'to': edge + bin_size, 'count': bisect_left(values, edge + bin_size) - bisect_left(values, edge)}
+        for edge in edges
+    ]
+
+
+def get_fitness_test_leaderboard(
+        semester: Semester,
+        student_id: Optional[int] = None,
+        bin_size: int = 5,
+        top: int = 10,
+) -> dict:
+    """
+    Compares fitness test scores of students in a semester, from the score table.
+    Ranks and percentiles are found with bisect in sorted scores,
+    the percentile of a score is the share of students with the same or a lower score
+    @param semester - semester of the test
+    @param student_id - also return rank and percentile of the student
+    @param bin_size - width of total score histogram bins
+    @param top - number of best students to return
+    @return number of students, histograms of total and exercise scores, best students and the student
+    """
+    rows = list(
+        FitnessTestScore.objects.filter(semester=semester)
+        .order_by('-total_score', 'student__user__email')
+        .values('student_id', 'student__user__email', 'student__user__first_name', 'student__user__last_name',
+                'retake', 'total_score', 'exercise_scores')
+    )
+    totals = sorted(row['total_score'] for row in rows)
+
+    def standing(row: dict) -> dict:
+        below_or_equal = bisect_right(totals, row['total_score'])
+        return {
+            'student_id': row['student_id'],
+            'email': row['student__user__email'],
+            'full_name': f"{row['student__user__first_name']} {row['student__user__last_name']}",
+            'retake': row['retake'],
+            'total_score': row['total_score'],
+            'rank': len(totals) - below_or_equal + 1,
+            'percentile': round(100 * below_or_equal / len(totals), 1),
+        }
+
+    exercises = FitnessTestExercise.objects.filter(semester=semester).order_by('pk')
+    student = next((row for row in rows if row['student_id'] == student_id), None)
+    return {
+        'semester': semester.name,
+        'students': len(totals),
+        'histogram': _histogram(totals, bin_size),
+        'exercises': [
+            {
+                'id': exercise.pk,
+                'name': exercise.exercise_name,
+                'histogram': _histogram(sorted(
+                    row['exercise_scores'][str(exercise.pk)] for row in rows
+                    if str(exercise.pk) in row['exercise_scores']
+                ), 1),
+            }
+            for exercise in exercises
+        ],
+        'top': [standing(row) for row in rows[:top]],
+        'student': standing(student) if student is not None else None,
+    }
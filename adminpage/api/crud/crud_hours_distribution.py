@@ -0,0 +1,113 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.db.models import F
+
+from sport.models import StudentHoursLedger
+
+# How often the ledger is polled for changes (seconds)
+HOURS_DISTRIBUTION_REFRESH_INTERVAL = 5
+# How often the distribution is rebuilt from scratch, to heal missed changes (seconds)
+HOURS_DISTRIBUTION_REBUILD_INTERVAL = 60 * 60
+# Changes are re-read with this overlap, because a ledger row stamped
+# before the last seen change may be committed after it was polled
+HOURS_DISTRIBUTION_CHANGES_OVERLAP = timedelta(minutes=1)
+
+
+class HoursDistribution:
+    """
+    Complex hours (semester hours minus debt) of all students in one semester,
+    with positive values kept in a sorted array for percentile lookups.
+    The distribution is kept in sync with the hours ledger incrementally.
+    """
+
+    def __init__(self, semester_id: int):
+        self.semester_id = semester_id
+        self.student_hours: Dict[int, int] = {}
+        self.sorted_hours: List[int] = []
+        self.last_change: Optional[datetime] = None
+        self.checked_at = float("-inf")
+        self.rebuilt_at = float("-inf")
+        self.lock = threading.Lock()
+
+    def _ledger(self):
+        return StudentHoursLedger.objects.filter(semester_id=self.semester_id).annotate(
+            complex_hours=F("hours_not_self") + F("hours_self_debt") + F("hours_self_not_debt") - F("debt"),
+        ).values_list("student_id", "complex_hours", "updated_at")
+
+    def _set(self, student_id: int, hours: int):
+        old_hours = self.student_hours.get(student_id, 0)
+        if old_hours == hours:
+            return
+        if old_hours > 0:
+            del self.sorted_hours[bisect_left(self.sorted_hours, old_hours)]
+        if hours > 0:
+            insort(self.sorted_hours, hours)
+        self.student_hours[student_id] = hours
+
+    def _track(self, updated_at: datetime):
+        if self.last_change is None or updated_at > self.last_change:
+            self.last_change = updated_at
+
+    def rebuild(self):
+        rows = list(self._ledger())
+        self.student_hours = {student_id: hours for student_id, hours, _ in rows}
+        self.sorted_hours = sorted(hours for hours in self.student_hours.values() if hours > 0)
+        self.last_change = None
+        for _, _, updated_at in rows:
+            self._track(updated_at)
+
+    def apply_changes(self):
+        changes = self._ledger()
+        if self.last_change is not None:
+            changes = changes.filter(updated_at__gt=self.last_change - HOURS_DISTRIBUTION_CHANGES_OVERLAP)
+        for student_id, hours, updated_at in changes:
+            self._set(student_id, hours)
+            self._track(updated_at)
+
+    def refresh(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.rebuilt_at >= HOURS_DISTRIBUTION_REBUILD_INTERVAL:
+                self.rebuild()
+                self.rebuilt_at = now
+            elif now - self.checked_at >= HOURS_DISTRIBUTION_REFRESH_INTERVAL:
+                self.apply_changes()
+            else:
+                return
+            self.checked_at = now
+
+    def better_than(self, student_id: int) -> float:
+        """
+        Percentage of students with positive complex hours that have less hours than the student
+        """
+        with self.lock:
+            student_hours = self.student_hours.get(student_id, 0)
+            if student_hours <= 0:
+                return 0
+
+            total = len(self.sorted_hours)
+            if total == 1:
+                return 100
+
+            worse = bisect_left(self.sorted_hours, student_hours)
+        return round(worse / (total - 1) * 100, 1)
+
+
+_distributions: Dict[int, HoursDistribution] = {}
+_distributions_lock = threading.Lock()
+
+
+def get_hours_distribution(semester_id: int) -> HoursDistribution:
+    """
+    Retrieves process-wide hours distribution of the semester, refreshed from the hours ledger
+    """
+    with _distributions_lock:
+        distribution = _distributions.get(semester_id)
+        if distribution is None:
+            distribution = _distributions[semester_id] = HoursDistribution(semester_id)
+    distribution.refresh()
+    return distribution
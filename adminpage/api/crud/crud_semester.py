@@ -1,13 +1,109 @@
-from typing import List
-from sport.models import Semester
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date
+from typing import List, Optional
+
+from django.core.cache import cache
+from django.core.signals import request_started, request_finished
+from django.db import transaction, connection
+from django.dispatch import receiver
+
+from api.crud.utils import dictfetchall
+from sport.models import Semester, StudentStatuses
+from sport.utils import today
+
+# How long a worker trusts its cached ongoing semester without consulting the shared cache (seconds)
+ONGOING_SEMESTER_TTL = 10
+# Shared cache key, bumped on every semester change to invalidate caches of all workers
+ONGOING_SEMESTER_VERSION_KEY = "ongoing_semester_version"
+
+
+class _OngoingSemesterCache:
+    def __init__(self):
+        self.semester: Optional[Semester] = None
+        self.version: Optional[int] = None
+        self.day: Optional[date] = None
+        self.checked_at = float("-inf")
+        self.lock = threading.Lock()
+
+
+_cache = _OngoingSemesterCache()
+# Semester resolved within the current request, so that it is the same object for all callers
+_request_semester: ContextVar[Optional[dict]] = ContextVar("request_semester", default=None)
+
+
+@receiver(request_started)
+def _start_request_scope(**kwargs):
+    _request_semester.set({})
+
+
+@receiver(request_finished)
+def _finish_request_scope(**kwargs):
+    _request_semester.set(None)
+
+
+def _fetch_ongoing_semester() -> Semester:
+    return Semester.objects.raw('SELECT * FROM semester WHERE id = current_semester()')[0]
+
+
+def _resolve_ongoing_semester() -> Semester:
+    now = time.monotonic()
+    day = today()
+    with _cache.lock:
+        if _cache.semester is not None and _cache.day == day:
+            if now - _cache.checked_at < ONGOING_SEMESTER_TTL:
+                return _cache.semester
+            if cache.get(ONGOING_SEMESTER_VERSION_KEY, 0) == _cache.version:
+                _cache.checked_at = now
+                return _cache.semester
+
+        # version is read before the semester, so a concurrent change is never missed
+        version = cache.get(ONGOING_SEMESTER_VERSION_KEY, 0)
+        _cache.semester = _fetch_ongoing_semester()
+        _cache.version = version
+        _cache.day = day
+        _cache.checked_at = now
+        return _cache.semester
 
 
 def get_ongoing_semester() -> Semester:
     """
-    Retrieves current ongoing semester
+    Retrieves current ongoing semester.
+    The semester is cached per worker and returns the same object within a request
     @return ongoing semester
     """
-    return Semester.objects.raw('SELECT * FROM semester WHERE id = current_semester()')[0]
+    scope = _request_semester.get()
+    if scope is None:
+        return _resolve_ongoing_semester()
+    if "semester" not in scope:
+        scope["semester"] = _resolve_ongoing_semester()
+    return scope["semester"]
+
+
+def _drop_local_ongoing_semester():
+    with _cache.lock:
+        _cache.semester = None
+    scope = _request_semester.get()
+    if scope is not None:
+        scope.pop("semester", None)
+
+
+def _bump_ongoing_semester_version():
+    _drop_local_ongoing_semester()
+    try:
+        cache.incr(ONGOING_SEMESTER_VERSION_KEY)
+    except ValueError:
+        cache.set(ONGOING_SEMESTER_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_ongoing_semester():
+    """
+    Drops cached ongoing semester in this worker at once
+    and in all workers when the current transaction is committed
+    """
+    _drop_local_ongoing_semester()
+    transaction.on_commit(_bump_ongoing_semester_version)
 
 
 def get_semester_crud(current: bool, with_ft_exercises: bool) -> List[Semester]:
@@ -17,3 +113,60 @@ def get_semester_crud(current: bool, with_ft_exercises: bool) -> List[Semester]:
         return [elem for elem in Semester.objects.filter(fitnesstestexercise__isnull=False).distinct()]
     else:
         return [elem for elem in Semester.objects.all()]
+
+
+# Normal students of participating courses who collected less than the required hours
+# in the semester, attendance hours minus the semester debt, and whose debt is not rolled over yet
+DEBT_ROLLOVER_SQL = (
+    'SELECT s.user_id AS student_id, d.email, concat(d.first_name, \' \', d.last_name) AS full_name, '
+    'trunc(%(required_hours)s - (coalesce(h.hours, 0) - coalesce(sd.debt, 0)))::int AS debt '
+    'FROM student s '
+    'JOIN auth_user d ON d.id = s.user_id '
+    'LEFT JOIN ('
+    '    SELECT a.student_id, sum(a.hours) AS hours '
+    '    FROM attendance a, training t, "group" g '
+    '    WHERE a.training_id = t.id AND t.group_id = g.id AND g.semester_id = %(semester_id)s '
+    '    GROUP BY a.student_id'
+    ') h ON h.student_id = s.user_id '
+    'LEFT JOIN ('
+    '    SELECT student_id, sum(debt) AS debt FROM debt WHERE semester_id = %(semester_id)s GROUP BY student_id'
+    ') sd ON sd.student_id = s.user_id '
+    'WHERE s.student_status_id = %(normal_status)s '
+    'AND s.course IN (SELECT course_id FROM semester_participating_courses WHERE semester_id = %(semester_id)s) '
+    'AND coalesce(h.hours, 0) - coalesce(sd.debt, 0) < %(required_hours)s '
+    'AND NOT EXISTS (SELECT 1 FROM debt x WHERE x.student_id = s.user_id AND x.semester_id IS NULL)'
+)
+
+
+def _debt_rollover_params(semester: Semester) -> dict:
+    return {
+        "semester_id": semester.pk,
+        "required_hours": semester.hours,
+        "normal_status": StudentStatuses.NORMAL,
+    }
+
+
+def get_debts_to_roll_over(semester: Semester) -> List[dict]:
+    """
+    Previews debts that creation of the next semester would roll over from the given one
+    @param semester - semester to roll debts over from, usually the ongoing one
+    @return list of {"student_id", "email", "full_name", "debt"} ordered by email
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'{DEBT_ROLLOVER_SQL} ORDER BY d.email', _debt_rollover_params(semester))
+        return dictfetchall(cursor)
+
+
+def roll_over_debts(semester: Semester) -> int:
+    """
+    Creates debts for students who lack hours in the given semester, in one statement.
+    Debts are created without semester and are attached to the next semester when it is saved
+    @param semester - semester to roll debts over from, usually the ongoing one
+    @return number of created debts
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO debt (student_id, semester_id, debt) '
+            f'SELECT rollover.student_id, NULL, rollover.debt FROM ({DEBT_ROLLOVER_SQL}) rollover',
+            _debt_rollover_params(semester))
+        return cursor.rowcount
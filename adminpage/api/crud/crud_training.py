@@ -1,7 +1,12 @@
-from datetime import datetime, timedelta
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta, time
+from typing import Dict, Iterable, Optional
 
+import pglock
+from django.conf import settings
 from django.db import connection
-from django.db.models import Q, Prefetch
+from django.db.models import Q, Prefetch, Count
 from django.utils import timezone
 
 from api.crud.crud_semester import get_ongoing_semester
@@ -49,74 +54,110 @@ def get_group_info(group_id: int, student: Student):
 _week_delta = timedelta(days=7)
 
 
-def can_check_in(
-    student: Student, training: Training, student_checkins=None, time_now=None
-):
-    """Determines if a student can check into a training session based on several criteria."""
+def get_check_in_eligibility(
+    student: Student, trainings: Iterable[Training], time_now=None
+) -> Dict[int, bool]:
+    """
+    Determines if a student can check into each of the trainings based on several criteria.
+    Runs a fixed number of queries regardless of the number of trainings.
+    @param student - student checking in
+    @param trainings - trainings with selected groups
+    @param time_now - moment of the check in, now by default
+    @return mapping from training id to whether the student can check in
+    """
     time_now = time_now or timezone.now()
-    t_date = training.start.date()
+    trainings = list(trainings)
+    if not trainings:
+        return {}
+    training_ids = [t.pk for t in trainings]
+    group_ids = {t.group_id for t in trainings}
+
+    checkins_count = dict(
+        TrainingCheckIn.objects.filter(training_id__in=training_ids)
+        .values_list("training_id")
+        .annotate(count=Count("id"))
+    )
+    banned_groups = set(
+        Group.banned_students.through.objects.filter(group_id__in=group_ids, student_id=student.pk)
+        .values_list("group_id", flat=True)
+    )
+    allowed_groups = set(
+        Group.allowed_students.through.objects.filter(group_id__in=group_ids, student_id=student.pk)
+        .values_list("group_id", flat=True)
+    )
+    medical_group_allowed_groups = set(
+        Group.allowed_medical_groups.through.objects.filter(
+            group_id__in=group_ids, medicalgroup_id=student.medical_group_id
+        ).values_list("group_id", flat=True)
+    )
 
-    # The training must not be finished yet, and you can check in only during 1 week before the training start
-    if not (training.start < (time_now + _week_delta) and time_now < training.end):
-        return False
+    # Hours the student has already checked in for, by local day and by (local day, sport)
+    t_dates = {timezone.localtime(t.start).date() for t in trainings}
+    day_start = timezone.make_aware(datetime.combine(min(t_dates), time.min))
+    day_end = timezone.make_aware(datetime.combine(max(t_dates) + timedelta(days=1), time.min))
+    day_hours = defaultdict(float)
+    sport_hours = defaultdict(float)
+    for c in TrainingCheckIn.objects.filter(
+        student=student, training__start__gte=day_start, training__start__lt=day_end
+    ).select_related("training__group"):
+        c_date = timezone.localtime(c.training.start).date()
+        day_hours[c_date] += c.training.academic_duration
+        sport_hours[c_date, c.training.group.sport_id] += c.training.academic_duration
+
+    education_levels = (-1, 2 if student.is_college else 1)
+    result = {}
+    for training in trainings:
+        group = training.group
+        t_date = timezone.localtime(training.start).date()
+
+        result[training.pk] = (
+            # The training must not be finished yet, and you can check in only during 1 week before the training start
+            training.start < (time_now + _week_delta) and time_now < training.end
+            # The training must be for college/students, depending on student's education level
+            and group.allowed_education_level in education_levels
+            # The training must have free places left
+            and group.capacity - checkins_count.get(training.pk, 0) > 0
+            # The student can only get 4 hours at one day
+            and day_hours[t_date] + training.academic_duration <= 4
+            # The student can only get 2 hours at one day for the same sport type
+            and sport_hours[t_date, group.sport_id] + training.academic_duration <= 2
+            # Students in "Banned students" list are always prohibited
+            and group.pk not in banned_groups
+            # Students in "Allowed students" list can check in, no matter their medical group or gender,
+            # other students must be of allowed medical groups and allowed gender
+            and (
+                group.pk in allowed_groups
+                or (group.pk in medical_group_allowed_groups and group.allowed_gender in (student.gender, -1))
+            )
+        )
+    return result
 
-    # The training must be for college/students, depending on student's education level
-    if training.group.allowed_education_level not in (-1, 2 if student.is_college else 1):
-        return False
 
-    # The training must have free places left
-    free_places = training.group.capacity - training.checkins.count()
-    if free_places <= 0:
-        return False
+def lock_for_check_in(student: Student, training: Training):
+    """
+    Serializes check-ins competing for the same resources: free places of the training
+    and hours of the student at the training day. Unrelated check-ins proceed in parallel.
+    Locks are held until the end of the current transaction.
+    @param student - student checking in
+    @param training - training to check in
+    """
+    # The student-day lock is always taken first, so that two check-ins cannot deadlock
+    # Days are local, as for the hour limits
+    pglock.advisory(f"check-in-{student.pk}-{timezone.localtime(training.start).date()}", xact=True).acquire()
+    # A concurrent check-in to the same training waits for this one to commit before counting free places
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id FROM training WHERE id = %s FOR UPDATE', [training.pk])
 
-    student_checkins = student_checkins or (
-        TrainingCheckIn.objects.filter(
-            student=student, training__start__date=t_date
-        ).select_related("training", "training__group__sport")
-    )
 
-    # The student can only get 4 hours at one day
-    total_hours = sum(
-        c.training.academic_duration
-        for c in student_checkins
-        if c.training.start.date() == t_date
-    )
-    if total_hours + training.academic_duration > 4:
-        return False
-
-    # The student can only get 2 hours at one day for the same sport type
-    t_sport_id = training.group.sport.id if training.group.sport else None
-    same_type_hours = sum(
-        c.training.academic_duration
-        for c in student_checkins
-        if c.training.group.sport.id == t_sport_id and c.training.start.date() == t_date
-    )
-    if same_type_hours + training.academic_duration > 2:
-        return False
-
-    # Students in "Banned students" list are always prohibited
-    banned_students = training.group.banned_students.all()
-    if student in banned_students:
-        return False
-
-    # Students in "Allowed students" list can check in, no matter their medical group or gender
-    allowed_students = training.group.allowed_students.all()
-    if student in allowed_students:
-        return True  # Allow
-
-    # Other students must be of allowed medical groups and allowed gender
-    allowed_medical_groups = training.group.allowed_medical_groups.all()
-    return (
-        student.medical_group in allowed_medical_groups and
-        training.group.allowed_gender in (student.gender, -1)
-    )
+def can_check_in(student: Student, training: Training, time_now=None) -> bool:
+    """Determines if a student can check into a training session based on several criteria."""
+    return get_check_in_eligibility(student, [training], time_now)[training.pk]
 
 
 def get_trainings_for_student(student: Student, start: datetime, end: datetime):
     # Assume current_semester() is a function that retrieves the current semester object.
-    # Prefetch groups and allowed medical groups.
-    group_prefetch = Prefetch("group", queryset=Group.objects.select_related("sport").prefetch_related(
-        "allowed_medical_groups"))
+    # Prefetch groups, check-in restrictions are evaluated by get_check_in_eligibility
+    group_prefetch = Prefetch("group", queryset=Group.objects.select_related("sport"))
 
     # Assuming TrainingCheckIn model has a 'student' and 'training' foreign key.
     # And Training has a 'group' foreign key with an 'allowed_medical_groups' many-to-many field.
@@ -143,24 +184,20 @@ def get_trainings_for_student(student: Student, start: datetime, end: datetime):
         .prefetch_related(
             group_prefetch,
             "training_class",
-            "checkins",
         )
     )
 
     # get all student check-ins for the given time range
-    student_checkins = (
+    checked_in_trainings = set(
         TrainingCheckIn.objects.filter(student=student, training__start__range=(start, end))
-        .select_related("training", "training__group__sport")
+        .values_list("training_id", flat=True)
     )
-    student_checkins_map = {checkin.training_id: checkin for checkin in student_checkins}
 
-    trainings_data = []
-    time_now = timezone.now()
+    trainings = list(trainings)
+    eligibility = get_check_in_eligibility(student, trainings)
 
+    trainings_data = []
     for t in trainings:
-        # Example of calculating can_check_in data. You need to adapt this to your actual model structure and data.
-        # This is a placeholder for the logic to calculate the necessary data for can_check_in.
-        can_check_in_result = can_check_in(student, t, student_checkins, time_now)
         group_frontend_name = t.group.to_frontend_name()
 
         training_dict = {
@@ -172,8 +209,8 @@ def get_trainings_for_student(student: Student, start: datetime, end: datetime):
             "training_class": t.training_class.name if t.training_class else None,
             "group_accredited": t.group.accredited,
             "can_grade": False,
-            "can_check_in": can_check_in_result,
-            "checked_in": student_checkins_map.get(t.id) is not None,
+            "can_check_in": eligibility[t.id],
+            "checked_in": t.id in checked_in_trainings,
             "is_paid": t.group.is_paid,
         }
         trainings_data.append(training_dict)
@@ -212,6 +249,64 @@ def get_trainings_for_trainer(trainer: Trainer, start: datetime, end: datetime):
     } for e in trainings]
 
 
+def get_personal_schedule_fingerprint(
+    student: Optional[Student], trainer: Optional[Trainer], start: datetime, end: datetime, time_now=None
+) -> str:
+    """
+    Cheap fingerprint of the personal calendar in the given range, takes one query.
+    It changes when a training of the range, its group, schedule or check-ins are created, changed or deleted,
+    when the student profile changes or when the time passes a moment at which a training
+    becomes editable or open for check-in. Trainings are selected wider than for the calendar itself,
+    so the fingerprint may change without the calendar, but not the other way around
+    @param student - calendar owner student, if any
+    @param trainer - calendar owner trainer, if any
+    @param start - range start date
+    @param end - range end date
+    @param time_now - moment of the request, now by default
+    @return fingerprint of the calendar
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'WITH t AS ('
+            '    SELECT t.id, t.group_id, t.start, t."end", t.updated_at '
+            '    FROM training t '
+            '    JOIN "group" g ON g.id = t.group_id '
+            '    WHERE g.semester_id = %(semester_id)s '
+            '    AND t.start <= %(end)s AND t."end" >= %(start)s '
+            '    AND ('
+            '        (%(student_id)s IS NOT NULL AND g.sport_id IS NOT NULL) '
+            '        OR EXISTS ('
+            '            SELECT 1 FROM group_trainers gt WHERE gt.group_id = g.id AND gt.trainer_id = %(trainer_id)s'
+            '        )'
+            '    )'
+            ') '
+            'SELECT * FROM '
+            '(SELECT count(*), max(t.updated_at) FROM t) trainings, '
+            '(SELECT min(b.moment) FROM t, LATERAL (VALUES '
+            '    (t.start - %(check_in_interval)s), (t.start), (t.start + %(editable_interval)s), (t."end")'
+            ') AS b(moment) WHERE b.moment > %(now)s) next_change, '
+            '(SELECT max(g.updated_at) FROM "group" g WHERE g.id IN (SELECT group_id FROM t)) training_groups, '
+            '(SELECT count(*), max(s.updated_at) FROM schedule s WHERE s.group_id IN (SELECT group_id FROM t)) '
+            'schedules, '
+            '(SELECT count(*), max(c.updated_at) FROM sport_trainingcheckin c '
+            ' WHERE c.training_id IN (SELECT id FROM t)) checkins, '
+            # check-ins of the student at other trainings limit hours of the day
+            '(SELECT count(*), max(c.updated_at) FROM sport_trainingcheckin c '
+            ' WHERE c.student_id = %(student_id)s) student_checkins', {
+                "semester_id": get_ongoing_semester().pk,
+                "start": start,
+                "end": end,
+                "student_id": student and student.pk,
+                "trainer_id": trainer and trainer.pk,
+                "check_in_interval": _week_delta,
+                "editable_interval": settings.TRAINING_EDITABLE_INTERVAL,
+                "now": time_now or timezone.now(),
+            })
+        row = cursor.fetchone()
+    profile = student and (student.medical_group_id, student.is_college, student.gender)
+    return hashlib.md5(repr((start, end, profile, row)).encode()).hexdigest()
+
+
 def get_students_grades(training_id: int):
     """
     Retrieves student grades for specific training
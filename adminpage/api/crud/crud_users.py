@@ -1,33 +1,64 @@
+from django.contrib.postgres.search import TrigramSimilarity
 from django.db import connection
-from django.db.models import F
+from django.db.models import F, Func, Case, When, BooleanField, CharField
 from django.db.models import Q
 from django.db.models import Value
-from django.db.models.functions import Concat
+from django.db.models.functions import Concat, Greatest, Lower
 
 from api.crud.utils import dictfetchall
 from sport.models import Student, Group
 
 
+class LowerFullName(Func):
+    """
+    lower(first_name || ' ' || last_name), the expression of auth_user_full_name_trgm_index
+    """
+    template = "lower(%(expressions)s)"
+    arg_joiner = " || ' ' || "
+    output_field = CharField()
+
+
 def get_email_name_like_students(pattern: str, limit: int = 5, requirement=~Q(pk=None)):
     """
-    Retrieve at most <limit students> which emails start with <email_pattern>
-    @param pattern - beginning of student email/name
+    Retrieve at most <limit> students which email or full name contains <pattern>.
+    Students which email, full name or last name start with the pattern go first,
+    the rest are ranked by trigram similarity
+    @param pattern - part of student email/name
     @param limit - how many student will be retrieved maximum
+    @param requirement - additional filter of students
     @return list of students that are
     """
-
+    pattern = pattern.strip().lower()
     query = Student.objects.annotate(
         id=F('user__id'),
         first_name=F('user__first_name'),
         last_name=F('user__last_name'),
         email=F('user__email'),
-        full_name=Concat('user__first_name', Value(' '), 'user__last_name')
+        full_name=Concat('user__first_name', Value(' '), 'user__last_name'),
+        search_email=Lower('user__email'),
+        search_full_name=LowerFullName('user__first_name', 'user__last_name'),
     ).filter(
         requirement & (
-            Q(email__icontains=pattern) |
-            Q(full_name__icontains=pattern) |
-            Q(last_name__icontains=pattern)
+            Q(search_email__contains=pattern) |
+            Q(search_full_name__contains=pattern)
         )
+    ).annotate(
+        is_prefix=Case(
+            When(
+                Q(search_email__startswith=pattern) |
+                Q(search_full_name__startswith=pattern) |
+                Q(last_name__istartswith=pattern),
+                then=Value(True),
+            ),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        similarity=Greatest(
+            TrigramSimilarity('search_email', pattern),
+            TrigramSimilarity('search_full_name', pattern),
+        ),
+    ).order_by(
+        '-is_prefix', '-similarity', 'email'
     ).values(
         'id',
         'first_name',
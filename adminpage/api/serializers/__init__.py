@@ -11,8 +11,13 @@ from .attendance import (
     AttendanceMarkSerializer,
     HoursInfoSerializer,
     HoursInfoFullSerializer,
+    StudentsHoursQuerySerializer,
+    StudentHoursInfoSerializer,
     AttendanceSerializer,
 )
+from .analytics import (
+    AttendanceAnalyticsQuerySerializer,
+)
 from .calendar import (
     CalendarRequestSerializer,
     ScheduleExtendedPropsSerializer,
@@ -67,3 +72,6 @@ from .medical_groups import (
 from .training_class import (
     TrainingClassSerializer
 )
+from .bootstrap import (
+    BootstrapSerializer,
+)
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+
+class AttendanceAnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, help_text="First day of the window, the window is 30 days long by default")
+    end = serializers.DateField(required=False, help_text="Last day of the window, today by default")
+    granularity = serializers.ChoiceField(choices=["day", "week", "month"], default="day")
+    group_by = serializers.ChoiceField(choices=["sport", "medical_group", "group"], required=False)
+    sport_id = serializers.IntegerField(required=False)
+    medical_group_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end")
+        return attrs
@@ -82,6 +82,21 @@ class HoursInfoFullSerializer(serializers.Serializer):
     final_hours = serializers.IntegerField()
 
 
+class StudentsHoursQuerySerializer(serializers.Serializer):
+    student_id = serializers.ListField(child=serializers.IntegerField(), required=False)
+    group_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get("student_id") and attrs.get("group_id") is None:
+            raise serializers.ValidationError("Either student_id or group_id is required")
+        return attrs
+
+
+class StudentHoursInfoSerializer(HoursInfoSerializer):
+    student_id = serializers.IntegerField()
+    final_hours = serializers.IntegerField()
+
+
 class BetterThanInfoSerializer(serializers.Serializer):
     better_than = serializers.FloatField()
 
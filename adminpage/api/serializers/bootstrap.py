@@ -0,0 +1,30 @@
+from rest_framework import serializers
+
+from api.serializers.group import SportSerializer
+from api.serializers.measurement import MeasurementSerializer
+from api.serializers.medical_groups import MedicalGroupSerializer
+from api.serializers.self_sport_report import SelfSportTypes
+from api.serializers.semester import SemesterSerializer
+from api.serializers.training_class import TrainingClassSerializer
+
+
+class FAQElementSerializer(serializers.Serializer):
+    question = serializers.CharField()
+    answer = serializers.CharField()
+
+
+class FAQCategorySerializer(serializers.Serializer):
+    name = serializers.CharField()
+    values = FAQElementSerializer(many=True)
+
+
+class BootstrapSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    ongoing_semester = SemesterSerializer()
+    semesters = SemesterSerializer(many=True)
+    medical_groups = MedicalGroupSerializer(many=True)
+    training_classes = TrainingClassSerializer(many=True)
+    self_sport_types = SelfSportTypes(many=True)
+    measurements = MeasurementSerializer(many=True)
+    sports = SportSerializer(many=True)
+    faq = FAQCategorySerializer(many=True)
@@ -84,3 +84,10 @@ class FitnessTestSessionWithResult(serializers.Serializer):
     session = FitnessTestSessionSerializer()
     exercises = FitnessTestExerciseSerializer(many=True)
     results = serializers.DictField(child=FitnessTestResultSerializer(many=True))
+
+
+class FitnessTestLeaderboardQuery(serializers.Serializer):
+    semester_id = serializers.IntegerField(required=False, help_text="Ongoing semester by default")
+    student_id = serializers.IntegerField(required=False, help_text="Also return rank and percentile of the student")
+    bin_size = serializers.IntegerField(min_value=1, default=5, help_text="Width of total score histogram bins")
+    top = serializers.IntegerField(min_value=0, max_value=100, default=10, help_text="Number of best students")
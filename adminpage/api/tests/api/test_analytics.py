@@ -0,0 +1,73 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from django.conf import settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+analytics_url = f"/{settings.PREFIX}api/analytics/attendance"
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(datetime(2020, 1, 31, 12, 0, 0, tzinfo=timezone.utc))
+def test_attendance_analytics(
+        user_factory,
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+        attendance_factory,
+):
+    staff = user_factory("staff@example.com", is_staff=True)
+    students = [student_factory(email=f"student{i}@example.com").student for i in range(3)]
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 2, 20))
+    football = group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=semester)
+    tennis = group_factory("G2", capacity=20, sport=sport_factory("Tennis"), semester=semester)
+
+    def training(group, day):
+        return training_factory(
+            group=group,
+            start=datetime(2020, 1, day, 12, 0, 0, tzinfo=timezone.utc),
+            end=datetime(2020, 1, day, 13, 30, 0, tzinfo=timezone.utc),
+        )
+
+    for student in students:
+        attendance_factory(student, training(football, 6), 2)
+    attendance_factory(students[0], training(tennis, 6), 2)
+    attendance_factory(students[0], training(tennis, 14), 2)
+    # outside the default window of 30 days
+    attendance_factory(students[1], training(football, 1), 2)
+
+    client = APIClient()
+    client.force_authenticate(staff)
+
+    response = client.get(analytics_url)
+    assert response.status_code == status.HTTP_200_OK
+    # the series is dense, days without attendance are present
+    assert len(response.data) == 30
+    assert "2020-01-01" not in response.data
+    assert response.data["2020-01-02"] == 0
+    assert response.data["2020-01-06"] == 4
+    assert response.data["2020-01-07"] == 0
+    assert response.data["2020-01-14"] == 1
+
+    response = client.get(analytics_url, {
+        "start": "2020-01-01", "end": "2020-01-31", "granularity": "week", "group_by": "sport",
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        "2019-12-30": {football.sport_id: 1, tennis.sport_id: 0},
+        "2020-01-06": {football.sport_id: 3, tennis.sport_id: 1},
+        "2020-01-13": {football.sport_id: 0, tennis.sport_id: 1},
+        "2020-01-20": {football.sport_id: 0, tennis.sport_id: 0},
+        "2020-01-27": {football.sport_id: 0, tennis.sport_id: 0},
+    }
+
+    response = client.get(analytics_url, {
+        "start": "2020-01-01", "end": "2020-01-31", "granularity": "month", "sport_id": tennis.sport_id,
+    })
+    assert response.data == {"2020-01-01": 2}
+
+    response = client.get(analytics_url, {"granularity": "year"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
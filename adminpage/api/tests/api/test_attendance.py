@@ -9,7 +9,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from api.views.attendance import AttendanceErrors
-from sport.models import Trainer, Training, Attendance
+from sport.models import Trainer, Training, Attendance, Group, StudentStatuses
 
 User = get_user_model()
 assertMembers = unittest.TestCase().assertCountEqual
@@ -255,3 +255,87 @@ def test_attendance_dates_trainer_report(
             'student_id': other_student_user.pk
         },
     ])
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(during_training)
+def test_students_hours_bulk(
+        setup,
+        student_factory,
+        enroll_factory,
+        attendance_factory,
+        django_assert_max_num_queries,
+):
+    training, trainer_user, student_user = setup
+    client = APIClient()
+    client.force_authenticate(trainer_user)
+    attendance_factory(student_user.student, training, 2)
+    Group.objects.filter(pk=training.group_id).update(capacity=20)
+
+    for i in range(10):
+        other = student_factory(email=f"student{i}@example.com")
+        enroll_factory(other.student, training.group)
+
+    # the number of queries must not depend on the roster size
+    with django_assert_max_num_queries(10):
+        response = client.get(
+            f"/{settings.PREFIX}api/attendance/hours",
+            {"group_id": training.group.pk},
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data) == 11
+    hours = {item["student_id"]: item for item in response.data}
+    assert hours[student_user.pk]["ongoing_semester"]["hours_not_self"] == 2
+    assert hours[student_user.pk]["final_hours"] == 2
+
+    response = client.get(
+        f"/{settings.PREFIX}api/attendance/hours",
+        {"student_id": [student_user.pk]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["student_id"] for item in response.data] == [student_user.pk]
+
+    response = client.get(f"/{settings.PREFIX}api/attendance/hours")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(during_training)
+def test_attendance_roster_marked_in_bulk(
+        setup,
+        student_factory,
+        django_assert_max_num_queries,
+):
+    training, trainer_user, student_user = setup
+    client = APIClient()
+    client.force_authenticate(trainer_user)
+    Attendance.objects.create(student=student_user.student, training=training, hours=1)
+
+    roster = [student_factory(email=f"roster{i}@example.com") for i in range(300)]
+    dropped = roster[0].student
+    dropped.student_status_id = StudentStatuses.DROPPED
+    dropped.save()
+
+    data = {
+        "training_id": training.pk,
+        "students_hours": [
+            {"student_id": student_user.student.pk, "hours": 0},
+            *({"student_id": user.student.pk, "hours": 2} for user in roster),
+        ],
+    }
+
+    # the number of queries must not depend on the roster size
+    with django_assert_max_num_queries(6):
+        response = client.post(
+            f"/{settings.PREFIX}api/attendance/mark",
+            data=data,
+            format='json'
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data) == 300
+    assert {"email": roster[1].email, "hours": 2} in response.data
+    assert not Attendance.objects.filter(student=student_user.student).exists()
+    assert not Attendance.objects.filter(student=dropped).exists()
+    assert Attendance.objects.filter(training=training, hours=2).count() == 299
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta, timezone
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from rest_framework import exceptions
+
+from adminpage import authentication
+from adminpage.authentication import InNoHassleAccounts, InNoHassleAuthentication
+
+issued_at = datetime(2020, 1, 15, 12, 0, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    monkeypatch.setattr(InNoHassleAccounts, "keys", [key.public_key()])
+    monkeypatch.setattr(InNoHassleAccounts, "keys_by_kid", {"current": key.public_key()})
+    monkeypatch.setattr(InNoHassleAccounts, "unnamed_keys", [])
+    monkeypatch.setattr(InNoHassleAccounts, "start_refresher", classmethod(lambda cls: None))
+    monkeypatch.setattr(InNoHassleAccounts, "request_refresh", classmethod(lambda cls: False))
+    monkeypatch.setattr(authentication, "verified_tokens", authentication.VerifiedTokenCache(2))
+    return key
+
+
+def make_token(key, email, kid="current", lifetime=timedelta(hours=1), issued=issued_at):
+    return jwt.encode(
+        {"email": email, "aud": "sport", "iat": issued, "exp": issued + lifetime},
+        key,
+        algorithm="RS256",
+        headers={"kid": kid} if kid else None,
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(issued_at + timedelta(minutes=1))
+def test_verified_tokens_are_cached(signing_key, student_factory, monkeypatch, freezer):
+    user = student_factory("student@example.com")
+    token = make_token(signing_key, user.email)
+    auth = InNoHassleAuthentication()
+
+    decoded = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decoded.append(kwargs["key"])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+
+    assert auth.authenticate_credentials(token) == (user, token)
+    assert auth.authenticate_credentials(token) == (user, token)
+    # the second request is served from the cache
+    assert decoded == [signing_key.public_key()]
+
+    # a token without kid or with unknown kid is checked against every key
+    assert auth.authenticate_credentials(make_token(signing_key, user.email, kid=None))[0] == user
+    assert auth.authenticate_credentials(make_token(signing_key, user.email, kid="unknown"))[0] == user
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    assert auth.authenticate_credentials(make_token(other_key, user.email, kid=None)) is None
+    assert len(decoded) == 4
+
+    # cached tokens expire with the token
+    freezer.move_to(issued_at + timedelta(hours=2))
+    with pytest.raises(exceptions.AuthenticationFailed, match="Token expired"):
+        auth.authenticate_credentials(token)
+
+
+def test_verified_token_cache_is_bounded():
+    cache = authentication.VerifiedTokenCache(2)
+    expires_at = datetime.now(timezone.utc).timestamp() + 60
+    cache.add("a", 1, expires_at)
+    cache.add("b", 2, expires_at)
+    assert cache.get("a") == 1
+    cache.add("c", 3, expires_at)
+    # the least recently used token is evicted
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.add("d", 4, None)
+    assert cache.get("d") is None
+
+
+@pytest.fixture
+def jwks_server(monkeypatch):
+    """
+    Local stub of InNoHassle Accounts serving JWKS from the returned state
+    """
+    state = {"keys": [], "status": 200, "delay": 0, "requests": 0}
+
+    class JWKSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            time.sleep(state["delay"])
+            body = json.dumps({"keys": state["keys"]}).encode()
+            self.send_response(state["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JWKSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setitem(authentication.innohassle_settings, "API_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setitem(authentication.innohassle_settings, "KEYS_FETCH_TIMEOUT", 0.5)
+    monkeypatch.setattr(InNoHassleAccounts, "keys", [])
+    monkeypatch.setattr(InNoHassleAccounts, "keys_by_kid", {})
+    monkeypatch.setattr(InNoHassleAccounts, "unnamed_keys", [])
+    monkeypatch.setattr(InNoHassleAccounts, "_refresh_requested_at", float("-inf"))
+    monkeypatch.setattr(authentication, "verified_tokens", authentication.VerifiedTokenCache(2))
+    yield state
+    InNoHassleAccounts.stop_refresher()
+    server.shutdown()
+
+
+def jwk(key, kid):
+    return {**json.loads(RSAAlgorithm.to_jwk(key.public_key())), "kid": kid}
+
+
+def refresh_failures():
+    metric, = authentication.JWKS_REFRESH_FAILURES.collect()
+    return next(sample.value for sample in metric.samples if sample.name.endswith("_total"))
+
+
+def test_keys_are_refreshed_in_background(jwks_server):
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    now = datetime.now(timezone.utc)
+    jwks_server["keys"] = [jwk(old_key, "old")]
+
+    # the first request waits for the initial keys
+    assert InNoHassleAccounts.decode_jwt(make_token(old_key, "a@example.com", kid="old", issued=now))
+    assert jwks_server["requests"] == 1
+
+    # an unknown kid triggers a refresh
+    jwks_server["keys"] = [jwk(new_key, "new")]
+    assert InNoHassleAccounts.decode_jwt(make_token(new_key, "a@example.com", kid="new", issued=now))
+    assert jwks_server["requests"] == 2
+
+    # refreshes for unknown kids are rate limited, such tokens are checked against the loaded keys
+    assert InNoHassleAccounts.decode_jwt(make_token(new_key, "a@example.com", kid="other", issued=now))
+    assert jwks_server["requests"] == 2
+
+    # failed and slow fetches keep the previous keys
+    failures = refresh_failures()
+    jwks_server["status"] = 500
+    assert not InNoHassleAccounts.refresh_keys()
+    jwks_server["status"] = 200
+    jwks_server["delay"] = 1
+    assert not InNoHassleAccounts.refresh_keys()
+    assert refresh_failures() == failures + 2
+    assert list(InNoHassleAccounts.keys_by_kid) == ["new"]
+    assert InNoHassleAccounts.decode_jwt(make_token(new_key, "a@example.com", kid="new", issued=now))
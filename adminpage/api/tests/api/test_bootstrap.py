@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from sport.models import TrainingClass, FAQCategory, FAQElement
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-01-20 10:00')
+def test_bootstrap_etag(
+        student_factory,
+        semester_factory,
+        sport_factory,
+        group_factory,
+        django_capture_on_commit_callbacks,
+):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 5, 31))
+    group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=semester)
+    sport_factory("Chess")
+    category = FAQCategory.objects.create(name="General")
+    FAQElement.objects.create(category=category, question="Where?", answer="Here")
+
+    client = APIClient()
+    client.force_authenticate(student_factory("A@foo.bar"))
+    url = f"/{settings.PREFIX}api/bootstrap"
+
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["ongoing_semester"]["name"] == "S20"
+    assert [sport["name"] for sport in response.data["sports"]] == ["Football"]
+    assert response.data["faq"] == [{"name": "General", "values": [{"question": "Where?", "answer": "Here"}]}]
+    etag = response["ETag"]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert len(queries) == 0
+    # permissions are checked before the ETag
+    response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # cached data is served without querying it again
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] == etag
+    assert len(queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        TrainingClass.objects.create(name="Gym")
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+    assert [training_class["name"] for training_class in response.data["training_classes"]] == ["Gym"]
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from sport.models import MedicalGroups, TrainingCheckIn
+
+training_start = datetime(2020, 1, 15, 18, 0, 0, tzinfo=timezone.utc)
+training_end = datetime(2020, 1, 15, 19, 30, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(datetime(2020, 1, 15, 12, 0, 0, tzinfo=timezone.utc))
+def test_personal_schedule_not_modified(
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+        freezer,
+):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 1, 30))
+    group = group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=semester)
+    training = training_factory(group=group, start=training_start, end=training_end)
+    user = student_factory("student@example.com")
+    user.student.medical_group_id = MedicalGroups.GENERAL
+    user.student.save()
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = f"/{settings.PREFIX}api/calendar/trainings"
+    params = {"start": "2020-01-13T00:00:00Z", "end": "2020-01-20T00:00:00Z"}
+
+    response = client.get(url, params)
+    assert response.status_code == status.HTTP_200_OK
+    assert [event["extendedProps"]["can_check_in"] for event in response.data] == [True]
+    etag = response["ETag"]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    # permissions load the profile, the calendar itself takes the fingerprint query only
+    assert len([query for query in queries if "training" in query["sql"]]) == 1
+    assert client.get(url, {**params, "end": "2020-01-21T00:00:00Z"}, HTTP_IF_NONE_MATCH=etag).status_code \
+        == status.HTTP_200_OK
+
+    TrainingCheckIn.objects.create(student=user.student, training=training)
+    response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert [event["extendedProps"]["checked_in"] for event in response.data] == [True]
+    etag = response["ETag"]
+
+    # changes are told apart by updated_at, so the frozen clock has to move
+    freezer.tick()
+    group.banned_students.add(user.student)
+    response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == []
+    etag = response["ETag"]
+    assert client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # the training becomes editable at its start
+    freezer.tick()
+    group.banned_students.clear()
+    response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert [event["extendedProps"]["can_edit"] for event in response.data] == [False]
+    etag = response["ETag"]
+    freezer.move_to(training_start)
+    response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert [event["extendedProps"]["can_edit"] for event in response.data] == [True]
@@ -0,0 +1,117 @@
+import csv
+from datetime import date, datetime, timezone
+from io import BytesIO, StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient
+from openpyxl import load_workbook
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import api.views.export
+from sport.models import StudentStatuses
+
+
+@pytest.mark.django_db
+def test_export_group_attendance_and_semester_hours(
+        user_factory,
+        trainer_factory,
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+        enroll_factory,
+        attendance_factory,
+):
+    staff = user_factory("staff@example.com", is_staff=True)
+    trainer = trainer_factory("trainer@example.com")
+    first = student_factory("a@example.com", first_name="Anna", last_name="A").student
+    second = student_factory("b@example.com", first_name="Boris", last_name="B").student
+    dropped = student_factory("c@example.com", first_name="Chris", last_name="C").student
+    dropped.student_status_id = StudentStatuses.DROPPED
+    dropped.save()
+
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 2, 20))
+    group = group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=semester)
+    trainings = [
+        training_factory(
+            group=group,
+            start=datetime(2020, 1, day, 12, 0, 0, tzinfo=timezone.utc),
+            end=datetime(2020, 1, day, 13, 30, 0, tzinfo=timezone.utc),
+        )
+        for day in (14, 7)
+    ]
+    enroll_factory(first, group)
+    attendance_factory(first, trainings[0], 2)
+    # attended without being enrolled
+    attendance_factory(second, trainings[1], 1)
+
+    client = APIClient()
+    client.force_authenticate(trainer)
+    response = client.get(f"/{settings.PREFIX}api/export/group/{group.pk}/attendance.csv")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    client.force_authenticate(staff)
+    response = client.get(f"/{settings.PREFIX}api/export/group/{group.pk}/attendance.csv")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming
+    rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+    assert rows == [
+        ["email", "full_name", "med_group", "2020-01-07 15:00", "2020-01-14 15:00", "total"],
+        ["a@example.com", "Anna A", "Medical checkup not passed", "0", "2", "2"],
+        ["b@example.com", "Boris B", "Medical checkup not passed", "1", "0", "1"],
+    ]
+
+    response = client.get(f"/{settings.PREFIX}api/export/group/{group.pk}/attendance.xlsx")
+    assert response.status_code == status.HTTP_200_OK
+    sheet = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+    assert [[cell.value for cell in row] for row in sheet.iter_rows(min_row=2)] == [
+        ["a@example.com", "Anna A", "Medical checkup not passed", 0, 2, 2],
+        ["b@example.com", "Boris B", "Medical checkup not passed", 1, 0, 1],
+    ]
+
+    response = client.get(f"/{settings.PREFIX}api/export/semester/{semester.pk}/hours.csv")
+    assert response.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+    assert [row[0] for row in rows] == ["email", "a@example.com", "b@example.com"]
+    assert rows[1][5:] == ["2", "0", "0", "2", "0", str(semester.hours)]
+
+
+@pytest.mark.django_db
+def test_export_streams_under_asgi(user_factory, student_factory, semester_factory, monkeypatch):
+    staff = user_factory("staff@example.com", is_staff=True)
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 2, 20))
+    for i in range(5):
+        student_factory(f"s{i}@example.com")
+
+    # Rows pulled from the database so far
+    pulled = []
+    iter_semester_hours = api.views.export.iter_semester_hours
+
+    def counted_iter_semester_hours(semester):
+        for row in iter_semester_hours(semester):
+            pulled.append(row)
+            yield row
+
+    monkeypatch.setattr(api.views.export, "iter_semester_hours", counted_iter_semester_hours)
+    monkeypatch.setattr(api.views.export, "ASYNC_BATCH_SIZE", 2)
+
+    async def export():
+        client = AsyncClient()
+        await client.aforce_login(staff)
+        response = await client.get(f"/{settings.PREFIX}api/export/semester/{semester.pk}/hours.csv")
+        chunks = aiter(response.streaming_content)
+        first_chunk = await anext(chunks)
+        pulled_before_rest = len(pulled)
+        return response, [first_chunk] + [chunk async for chunk in chunks], pulled_before_rest
+
+    response, chunks, pulled_before_rest = async_to_sync(export)()
+    assert response.status_code == status.HTTP_200_OK
+    assert response.is_async
+    # the first chunk is sent before the rest of the rows are read
+    assert pulled_before_rest == 2
+    rows = list(csv.reader(StringIO(b"".join(chunks).decode())))
+    assert [row[0] for row in rows] == ["email"] + [f"s{i}@example.com" for i in range(5)]
@@ -0,0 +1,249 @@
+import csv
+from datetime import date, datetime, timezone
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import api.crud.crud_fitness_test
+from api.crud import FitnessTestGrader
+from sport.models import FitnessTestExercise, FitnessTestGrading, FitnessTestResult, FitnessTestSession, Gender, \
+    FitnessTestScore
+from sport.models.enums import GenderInFTGrading
+
+
+@pytest.fixture
+def fitness_test(semester_factory, django_capture_on_commit_callbacks):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 5, 31))
+    semester.points_fitness_test = 5
+    semester.save()
+    # score refreshes queued by the exercises are run here, so that tests see their own ones
+    with django_capture_on_commit_callbacks(execute=True):
+        push_ups = FitnessTestExercise.objects.create(exercise_name="Push-ups", semester=semester, threshold=1)
+        flexibility = FitnessTestExercise.objects.create(
+            exercise_name="Flexibility", semester=semester, select="bad,good", threshold=0,
+        )
+    FitnessTestGrading.objects.bulk_create([
+        FitnessTestGrading(exercise=push_ups, gender=GenderInFTGrading.MALE, start_range=0, end_range=10, score=1),
+        FitnessTestGrading(exercise=push_ups, gender=GenderInFTGrading.MALE, start_range=20, end_range=100, score=5),
+        FitnessTestGrading(exercise=push_ups, gender=GenderInFTGrading.MALE, start_range=10, end_range=20, score=3),
+        FitnessTestGrading(exercise=push_ups, gender=GenderInFTGrading.FEMALE, start_range=0, end_range=100, score=4),
+        FitnessTestGrading(exercise=flexibility, gender=GenderInFTGrading.BOTH, start_range=0, end_range=1, score=0),
+        FitnessTestGrading(exercise=flexibility, gender=GenderInFTGrading.BOTH, start_range=1, end_range=2, score=2),
+    ])
+    return semester, push_ups, flexibility
+
+
+@pytest.mark.django_db
+def test_fitness_test_grader(fitness_test):
+    semester, push_ups, flexibility = fitness_test
+    with CaptureQueriesContext(connection) as queries:
+        grader = FitnessTestGrader([push_ups, flexibility])
+        assert [grader.score(push_ups.pk, Gender.MALE, value) for value in (-1, 0, 9, 10, 19, 20, 99, 100, None)] == \
+               [0, 1, 1, 3, 3, 5, 5, 0, 0]
+        assert grader.score(push_ups.pk, Gender.FEMALE, 15) == 4
+        assert grader.score(push_ups.pk, Gender.UNKNOWN, 15) == 0
+        assert grader.score(flexibility.pk, Gender.FEMALE, 1) == 2
+        assert grader.max_score(push_ups.pk, Gender.MALE) == 5
+        assert grader.max_score(push_ups.pk, Gender.UNKNOWN) == 0
+        grade = grader.grade(semester, Gender.MALE, [(push_ups.pk, 12), (flexibility.pk, 1)])
+    assert len(queries) == 1
+    assert grade["grade"] is True
+    assert grade["total_score"] == 5
+    assert grade["details"][1] == {
+        "exercise": "Flexibility", "unit": None, "value": "good", "score": 2, "max_score": 2,
+    }
+    assert grader.grade(semester, Gender.MALE, [(push_ups.pk, 5), (flexibility.pk, 1)])["grade"] is False
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-06-10 10:00')
+def test_fitness_test_result_and_export(student_factory, user_factory, fitness_test):
+    semester, push_ups, flexibility = fitness_test
+    student = student_factory("a@example.com", first_name="Anna", last_name="A").student
+    student.gender = Gender.MALE
+    student.save()
+    other = student_factory("b@example.com", first_name="Boris", last_name="B").student
+    other.gender = Gender.FEMALE
+    other.save()
+    test_date = datetime(2020, 3, 1, tzinfo=timezone.utc)
+    session = FitnessTestSession.objects.create(semester=semester, date=test_date)
+    retake = FitnessTestSession.objects.create(semester=semester, date=test_date, retake=True)
+    FitnessTestResult.objects.bulk_create([
+        FitnessTestResult(student=student, exercise=push_ups, session=session, value=5),
+        FitnessTestResult(student=student, exercise=flexibility, session=session, value=1),
+        FitnessTestResult(student=student, exercise=push_ups, session=retake, value=30),
+        FitnessTestResult(student=student, exercise=flexibility, session=retake, value=1),
+        FitnessTestResult(student=other, exercise=push_ups, session=session, value=5),
+    ])
+
+    client = APIClient()
+    client.force_authenticate(student.user)
+    response = client.get(f"/{settings.PREFIX}api/fitnesstest/result")
+    assert response.status_code == status.HTTP_200_OK
+    assert [(attempt["retake"], attempt["total_score"], attempt["grade"]) for attempt in response.data] == [
+        (False, 3, False),
+        (True, 7, True),
+    ]
+    assert [detail["value"] for detail in response.data[0]["details"]] == [5, "good"]
+
+    client.force_authenticate(user_factory("staff@example.com", is_staff=True))
+    response = client.get(f"/{settings.PREFIX}api/export/semester/{semester.pk}/fitness_test.csv")
+    assert response.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+    assert rows == [
+        ["email", "full_name", "retake", "Push-ups", "Flexibility", "total_score", "grade"],
+        ["a@example.com", "Anna A", "False", "1", "2", "3", "False"],
+        ["a@example.com", "Anna A", "True", "5", "2", "7", "True"],
+        ["b@example.com", "Boris B", "False", "4", "", "4", "False"],
+    ]
+
+
+@pytest.mark.django_db
+def test_fitness_test_upload_in_bulk(student_factory, trainer_factory, fitness_test):
+    semester, push_ups, flexibility = fitness_test
+    students = [student_factory(f"s{i}@example.com").student for i in range(20)]
+    results = [
+        {"student_id": student.pk, "exercise_id": exercise.pk, "value": "1"}
+        for student in students
+        for exercise in (push_ups, flexibility)
+    ]
+    invalid = [
+        {"student_id": 0, "exercise_id": push_ups.pk, "value": "1"},
+        {"student_id": students[0].pk, "exercise_id": 0, "value": "1"},
+        {"student_id": students[0].pk, "exercise_id": push_ups.pk, "value": "many"},
+        {"student_id": students[0].pk, "exercise_id": flexibility.pk, "value": "2"},
+        {"student_id": students[0].pk, "exercise_id": push_ups.pk, "value": "99999999999"},
+    ]
+
+    client = APIClient()
+    client.force_authenticate(trainer_factory("trainer@example.com", is_superuser=True))
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(f"/{settings.PREFIX}api/fitnesstest/upload", {
+            "semester_id": semester.pk,
+            "retake": False,
+            "results": results + invalid,
+        }, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries) < 20
+    assert [(error["index"], error["detail"]) for error in response.data["errors"]] == [
+        (40, "No student with id=0"),
+        (41, "No exercise with id=0"),
+        (42, "Value 'many' is not an integer"),
+        (43, "Value 2 is not an option of exercise Flexibility"),
+        (44, "Value 99999999999 is out of range"),
+    ]
+    session_id = response.data["session_id"]
+    assert FitnessTestResult.objects.filter(session_id=session_id).count() == 40
+
+    # uploading to the same session replaces results
+    response = client.post(f"/{settings.PREFIX}api/fitnesstest/upload/{session_id}", {
+        "semester_id": semester.pk,
+        "retake": False,
+        "results": [{"student_id": students[0].pk, "exercise_id": push_ups.pk, "value": "15"}],
+    }, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["errors"] == []
+    assert FitnessTestResult.objects.filter(session_id=session_id).count() == 40
+    assert FitnessTestResult.objects.get(student=students[0], exercise=push_ups).value == 15
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-06-10 10:00')
+def test_fitness_test_leaderboard(
+        student_factory, trainer_factory, fitness_test, django_capture_on_commit_callbacks, monkeypatch,
+):
+    semester, push_ups, flexibility = fitness_test
+    session = FitnessTestSession.objects.create(semester=semester, date=datetime(2020, 3, 1, tzinfo=timezone.utc))
+    retake = FitnessTestSession.objects.create(
+        semester=semester, date=datetime(2020, 3, 8, tzinfo=timezone.utc), retake=True,
+    )
+    students = []
+    for i in range(4):
+        student = student_factory(f"s{i}@example.com", first_name="S", last_name=str(i)).student
+        student.gender = Gender.MALE
+        student.save()
+        students.append(student)
+
+    # scores are refreshed once when the changes are committed
+    refreshes = []
+    refresh_fitness_test_scores = api.crud.crud_fitness_test.refresh_fitness_test_scores
+
+    def counted_refresh_fitness_test_scores(semester_id, student_ids=None):
+        refreshes.append((semester_id, student_ids))
+        return refresh_fitness_test_scores(semester_id, student_ids)
+
+    monkeypatch.setattr(api.crud.crud_fitness_test, "refresh_fitness_test_scores", counted_refresh_fitness_test_scores)
+    with django_capture_on_commit_callbacks(execute=True):
+        for student, push_ups_value in zip(students, (5, 15, 15, 50)):
+            FitnessTestResult.objects.create(student=student, exercise=push_ups, session=session, value=push_ups_value)
+            FitnessTestResult.objects.create(student=student, exercise=flexibility, session=session, value=1)
+        # a worse retake does not replace the best attempt
+        FitnessTestResult.objects.create(student=students[3], exercise=push_ups, session=retake, value=1)
+    assert refreshes == [(semester.pk, {student.pk for student in students})]
+
+    assert sorted(FitnessTestScore.objects.values_list("total_score", flat=True)) == [3, 5, 5, 7]
+    assert FitnessTestScore.objects.get(student=students[1]).exercise_scores == {
+        str(push_ups.pk): 3, str(flexibility.pk): 2,
+    }
+
+    client = APIClient()
+    client.force_authenticate(trainer_factory("trainer@example.com"))
+    response = client.get(f"/{settings.PREFIX}api/fitnesstest/leaderboard", {
+        "semester_id": semester.pk, "student_id": students[1].pk, "top": 2,
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["students"] == 4
+    assert response.data["histogram"] == [
+        {"from": 0, "to": 5, "count": 1},
+        {"from": 5, "to": 10, "count": 3},
+    ]
+    assert response.data["exercises"][1]["histogram"] == [{"from": 2, "to": 3, "count": 4}]
+    assert [(row["email"], row["rank"], row["percentile"]) for row in response.data["top"]] == [
+        ("s3@example.com", 1, 100.0),
+        ("s1@example.com", 2, 75.0),
+    ]
+    assert response.data["student"]["rank"] == 2
+    assert response.data["student"]["percentile"] == 75.0
+
+    # changed grading tables are applied to stored scores
+    refreshes.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        for grading in FitnessTestGrading.objects.filter(exercise=flexibility, score=2):
+            grading.score = 0
+            grading.save()
+        FitnessTestGrading.objects.filter(exercise=push_ups, score=1).get().delete()
+        FitnessTestGrading.objects.create(
+            exercise=push_ups, gender=GenderInFTGrading.FEMALE, start_range=100, end_range=200, score=5,
+        )
+    assert refreshes == [(semester.pk, None)]
+    assert sorted(FitnessTestScore.objects.values_list("total_score", flat=True)) == [0, 3, 3, 5]
+
+    # refreshes requested in a rolled back savepoint are dropped, later ones are still run
+    refreshes.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(ValueError):
+            with transaction.atomic():
+                FitnessTestResult.objects.create(student=students[0], exercise=push_ups, session=retake, value=1)
+                raise ValueError
+        FitnessTestResult.objects.create(student=students[1], exercise=push_ups, session=retake, value=1)
+    assert refreshes == [(semester.pk, {students[1].pk})]
+
+    # scores of existing results are filled in by the command after migrating
+    FitnessTestScore.objects.all().delete()
+    call_command("refresh_fitness_test_scores", stdout=StringIO())
+    assert sorted(FitnessTestScore.objects.values_list("total_score", flat=True)) == [0, 3, 3, 5]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT student_id, rank, percentile FROM fitness_test_score_rank WHERE semester_id = %s ORDER BY rank",
+            [semester.pk],
+        )
+        assert [(rank, float(percentile)) for _, rank, percentile in cursor.fetchall()] == [
+            (1, 100.0), (2, 75.0), (2, 75.0), (4, 25.0),
+        ]
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+from django.conf import settings
+from django.db import connections
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import api.views.training
+from sport.models import TrainingCheckIn, MedicalGroups
+
+training_start = datetime(2020, 1, 15, 18, 0, 0, tzinfo=timezone.utc)
+training_end = datetime(2020, 1, 15, 19, 30, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time(datetime(2020, 1, 15, 12, 0, 0, tzinfo=timezone.utc))
+def test_training_checkin_capacity(
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 1, 30))
+    group = group_factory("G1", capacity=1, sport=sport_factory("sport"), semester=semester)
+    training = training_factory(group=group, start=training_start, end=training_end)
+    students = [student_factory(email=f"student{i}@example.com") for i in range(2)]
+    for user in students:
+        user.student.medical_group_id = MedicalGroups.GENERAL
+        user.student.save()
+
+    client = APIClient()
+    url = f"/{settings.PREFIX}api/training/{training.pk}/check_in"
+
+    client.force_authenticate(students[0])
+    assert client.post(url).status_code == status.HTTP_200_OK
+
+    client.force_authenticate(students[1])
+    response = client.post(url)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data["code"] == 2
+
+    assert TrainingCheckIn.objects.filter(training=training).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.freeze_time(datetime(2020, 1, 15, 12, 0, 0, tzinfo=timezone.utc))
+def test_training_checkin_same_day_concurrent(
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+        monkeypatch,
+):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 1, 30))
+    group = group_factory("G1", capacity=20, sport=sport_factory("sport"), semester=semester)
+    # 2 academic hours each, only one of them fits into 2 hours per sport a day
+    trainings = [
+        training_factory(group=group, start=training_start, end=training_end),
+        training_factory(
+            group=group,
+            start=datetime(2020, 1, 15, 20, 0, 0, tzinfo=timezone.utc),
+            end=datetime(2020, 1, 15, 21, 30, 0, tzinfo=timezone.utc),
+        ),
+    ]
+    user = student_factory(email="student@example.com")
+    user.student.medical_group_id = MedicalGroups.GENERAL
+    user.student.save()
+
+    # Both check-ins are checked before either is saved, unless the student-day lock serializes them
+    can_check_in = api.views.training.can_check_in
+
+    def slow_can_check_in(student, training):
+        result = can_check_in(student, training)
+        time.sleep(0.5)
+        return result
+
+    monkeypatch.setattr(api.views.training, "can_check_in", slow_can_check_in)
+
+    responses = []
+    barrier = threading.Barrier(len(trainings))
+
+    def check_in(training):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            responses.append(client.post(f"/{settings.PREFIX}api/training/{training.pk}/check_in").status_code)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=check_in, args=(training,)) for training in trainings]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(responses) == [status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST]
+    assert TrainingCheckIn.objects.filter(student=user.student).count() == 1
@@ -1,10 +1,15 @@
 import pytest
 import unittest
-from datetime import date
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command, CommandError
 from django.utils import timezone
 
-from api.crud import get_detailed_hours, get_brief_hours, mark_hours
-from sport.models import Attendance
+from api.crud import get_detailed_hours, get_brief_hours, mark_hours, get_student_hours, get_negative_hours, \
+    better_than
+from api.crud import crud_hours_distribution
+from sport.models import Attendance, Debt, StudentHoursLedger, AttendanceDailyCube, Student, Training, MedicalGroups
 
 dummy_date = date(2020, 1, 1)
 
@@ -104,3 +109,116 @@ def test_hours_statistics(student_factory, sport_factory, semester_factory, grou
             "hours": 3
         }
     ])
+
+
+@pytest.mark.django_db
+def test_hours_ledger(student_factory, sport_factory, semester_factory, group_factory, training_factory,
+                      attendance_factory, freezer):
+    freezer.move_to("2020-03-15 12:00")
+    student = student_factory("A").student
+    student.enrollment_year = 2000
+    student.save()
+    sport = sport_factory(name="Sport")
+    s1 = semester_factory(name="S19", start=date(2020, 1, 1), end=date(2020, 2, 1))
+    s2 = semester_factory(name="S20", start=date(2020, 3, 1), end=date(2020, 4, 1))
+    g1 = group_factory(name="G1", sport=sport, semester=s1, capacity=20)
+    g2 = group_factory(name="G2", sport=sport, semester=s2, capacity=20)
+    t1 = training_factory(group=g1, start=timezone.now(), end=timezone.now() + timedelta(hours=1))
+    t2 = training_factory(group=g2, start=timezone.now(), end=timezone.now() + timedelta(hours=1))
+
+    attendance_factory(training=t1, student=student, hours=2)
+    mark_hours(t2, [(student.pk, 3)])
+    Debt.objects.create(student=student, semester=s2, debt=5)
+
+    assert StudentHoursLedger.objects.get(student=student, semester=s1).hours_not_self == 2
+    ledger = StudentHoursLedger.objects.get(student=student, semester=s2)
+    assert (ledger.hours_not_self, ledger.debt) == (3, 5)
+
+    hours = get_student_hours(student.pk)
+    assert hours["ongoing_semester"]["id_sem"] == s2.pk
+    assert hours["ongoing_semester"]["hours_not_self"] == 3
+    assert hours["ongoing_semester"]["debt"] == 5
+    assert [s["id_sem"] for s in hours["last_semesters_hours"]] == [s1.pk]
+    assert hours["last_semesters_hours"][0]["hours_not_self"] == 2
+    assert get_negative_hours(student.pk) == -2
+
+    mark_hours(t2, [(student.pk, 0)])
+    Debt.objects.filter(student=student).delete()
+    assert StudentHoursLedger.objects.get(student=student, semester=s2).total_hours == 0
+
+    StudentHoursLedger.objects.filter(student=student).update(hours_not_self=100)
+    with pytest.raises(CommandError):
+        call_command("rebuild_hours_ledger", "--verify", stdout=StringIO())
+    call_command("rebuild_hours_ledger", stdout=StringIO())
+    call_command("rebuild_hours_ledger", "--verify", stdout=StringIO())
+    assert StudentHoursLedger.objects.get(student=student, semester=s1).hours_not_self == 2
+
+
+@pytest.mark.django_db
+def test_better_than(student_factory, sport_factory, semester_factory, group_factory, training_factory,
+                     monkeypatch, freezer):
+    monkeypatch.setattr(crud_hours_distribution, "HOURS_DISTRIBUTION_REFRESH_INTERVAL", 0)
+    freezer.move_to("2020-03-15 12:00")
+    students = [student_factory(f"{i}@foo.bar").student for i in range(4)]
+    sport = sport_factory(name="Sport")
+    semester = semester_factory(name="S20", start=date(2020, 3, 1), end=date(2020, 4, 1))
+    group = group_factory(name="G1", sport=sport, semester=semester, capacity=20)
+    training = training_factory(group=group, start=timezone.now(), end=timezone.now() + timedelta(hours=1))
+
+    mark_hours(training, [(students[0].pk, 1), (students[1].pk, 2), (students[2].pk, 3)])
+    assert better_than(students[0].pk) == 0
+    assert better_than(students[1].pk) == 50
+    assert better_than(students[2].pk) == 100
+    assert better_than(students[3].pk) == 0
+
+    # changes are picked up without waiting for the cache to expire
+    mark_hours(training, [(students[0].pk, 4), (students[3].pk, 5)])
+    Debt.objects.create(student=students[2], semester=semester, debt=3)
+    assert better_than(students[0].pk) == 50
+    assert better_than(students[1].pk) == 0
+    assert better_than(students[2].pk) == 0
+    assert better_than(students[3].pk) == 100
+
+
+@pytest.mark.django_db
+def test_attendance_daily_cube(student_factory, sport_factory, semester_factory, group_factory, training_factory,
+                               freezer):
+    freezer.move_to("2020-03-15 12:00")
+    students = [student_factory(f"{i}@foo.bar").student for i in range(3)]
+    Student.objects.filter(pk__in=[s.pk for s in students]).update(medical_group_id=MedicalGroups.GENERAL)
+    sport = sport_factory(name="Sport")
+    semester = semester_factory(name="S20", start=date(2020, 3, 1), end=date(2020, 4, 1))
+    g1 = group_factory(name="G1", sport=sport, semester=semester, capacity=20)
+    g2 = group_factory(name="G2", sport=None, semester=semester, capacity=20)
+    t1 = training_factory(group=g1, start=timezone.now(), end=timezone.now() + timedelta(hours=1))
+    t2 = training_factory(group=g1, start=timezone.now() + timedelta(hours=2), end=timezone.now() + timedelta(hours=3))
+
+    def cube():
+        return {
+            (c.day, c.group_id, c.medical_group_id): (c.attendance_count, c.hours, c.students)
+            for c in AttendanceDailyCube.objects.all()
+        }
+
+    day = date(2020, 3, 15)
+    mark_hours(t1, [(students[0].pk, 2), (students[1].pk, 1)])
+    mark_hours(t2, [(students[0].pk, 1)])
+    assert cube() == {(day, g1.pk, MedicalGroups.GENERAL): (3, 4, 2)}
+
+    Student.objects.filter(pk=students[1].pk).update(medical_group_id=MedicalGroups.SPECIAL1)
+    mark_hours(t1, [(students[0].pk, 0)])
+    assert cube() == {
+        (day, g1.pk, MedicalGroups.GENERAL): (1, 1, 1),
+        (day, g1.pk, MedicalGroups.SPECIAL1): (1, 1, 1),
+    }
+
+    Training.objects.filter(pk=t2.pk).update(group=g2)
+    Attendance.objects.filter(student=students[1]).delete()
+    assert cube() == {(day, g2.pk, MedicalGroups.GENERAL): (1, 1, 1)}
+    assert AttendanceDailyCube.objects.get().sport_id is None
+
+    AttendanceDailyCube.objects.update(hours=100)
+    with pytest.raises(CommandError):
+        call_command("rebuild_attendance_cube", "--verify", stdout=StringIO())
+    call_command("rebuild_attendance_cube", stdout=StringIO())
+    call_command("rebuild_attendance_cube", "--verify", stdout=StringIO())
+    assert cube() == {(day, g2.pk, MedicalGroups.GENERAL): (1, 1, 1)}
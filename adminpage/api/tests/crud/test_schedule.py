@@ -4,7 +4,7 @@ import pytest
 from datetime import time, date
 
 from api.crud import get_sport_schedule, enroll_student
-from sport.models import Schedule, Training, MedicalGroups
+from sport.models import Schedule, Training, MedicalGroups, TrainingCheckIn, CheckoutHistory, EmailOutbox
 
 assertMembers = unittest.TestCase().assertCountEqual
 
@@ -183,3 +183,56 @@ def test_get_sport_schedule(
             'training_class': None
         }
     ])
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-01-20 10:03')
+def test_schedule_change_reconciles_trainings(
+        student_factory,
+        semester_factory,
+        sport_factory,
+        group_factory,
+        schedule_factory,
+        training_class_factory,
+):
+    sem = semester_factory(name="S20", start=date(2020, 1, 20), end=date(2020, 2, 12))
+    group = group_factory(name="F-S20-01", capacity=30, sport=sport_factory(name="football"), semester=sem)
+    schedule = schedule_factory(group=group, weekday=Schedule.Weekday.MONDAY, start=time(14, 0), end=time(15, 30))
+    trainings = list(Training.objects.filter(schedule=schedule).order_by("start"))
+    assert len(trainings) == 4
+    student = student_factory("A@foo.bar").student
+    for training in trainings[:2]:
+        TrainingCheckIn.objects.create(student=student, training=training)
+
+    # only the class changed, trainings are updated in place and check-ins are kept
+    schedule.training_class = training_class_factory(name="Gym")
+    schedule.save()
+    assert list(Training.objects.filter(schedule=schedule).order_by("start")) == trainings
+    assert Training.objects.filter(schedule=schedule, training_class__name="Gym").count() == 4
+    assert TrainingCheckIn.objects.count() == 2
+    assert EmailOutbox.objects.count() == 0
+
+    # moved to Sunday, the last week is past the end of the semester
+    schedule.weekday = Schedule.Weekday.SUNDAY
+    schedule.save()
+    moved = list(Training.objects.filter(schedule=schedule).order_by("start"))
+    assert [training.pk for training in moved] == [training.pk for training in trainings[:3]]
+    assert [training.start.date() for training in moved] == [date(2020, 1, 26), date(2020, 2, 2), date(2020, 2, 9)]
+    assert not TrainingCheckIn.objects.exists()
+    assert CheckoutHistory.objects.filter(
+        checkout_reason=CheckoutHistory.Reason.TRAINING_TIME_CHANGED).count() == 2
+    email = EmailOutbox.objects.get()
+    assert email.recipients == ["A@foo.bar"]
+    assert "20.01.2020 14:00 moved to 26.01.2020 14:00" in email.message
+    assert "27.01.2020 14:00 moved to 02.02.2020 14:00" in email.message
+
+    # only the group changed, check-ins are cancelled with their own reason and message
+    TrainingCheckIn.objects.create(student=student, training=moved[0])
+    schedule.group = group_factory(name="F-S20-02", capacity=30, sport=group.sport, semester=sem)
+    schedule.save()
+    assert [training.pk for training in Training.objects.filter(schedule=schedule, group=schedule.group)] == \
+        [training.pk for training in moved]
+    assert CheckoutHistory.objects.filter(
+        checkout_reason=CheckoutHistory.Reason.TRAINING_GROUP_CHANGED).count() == 1
+    email = EmailOutbox.objects.latest("pk")
+    assert "26.01.2020 14:00 moved to group football - F-S20-02" in email.message
@@ -1,7 +1,10 @@
 import pytest
 from datetime import date
 
-from api.crud import get_ongoing_semester
+from django.core.cache import cache
+
+from api.crud import get_ongoing_semester, crud_semester
+from sport.models import Semester
 
 
 @pytest.mark.django_db
@@ -10,3 +13,34 @@ def test_get_ongoing_semester(semester_factory):
     s2 = semester_factory(name="S20", start=date(2020, 1, 4), end=date(2020, 1, 24))
 
     assert get_ongoing_semester() == s2
+
+
+@pytest.mark.django_db
+def test_ongoing_semester_cached(semester_factory, django_assert_num_queries):
+    s1 = semester_factory(name="S19", start=date(2020, 1, 1), end=date(2020, 1, 3))
+    assert get_ongoing_semester() == s1
+
+    with django_assert_num_queries(0):
+        assert get_ongoing_semester() is get_ongoing_semester()
+
+    # semester signals drop the cached semester
+    s2 = semester_factory(name="S20", start=date(2020, 1, 4), end=date(2020, 1, 24))
+    assert get_ongoing_semester() == s2
+    s2.delete()
+    assert get_ongoing_semester() == s1
+
+
+@pytest.mark.django_db
+def test_ongoing_semester_version(semester_factory, monkeypatch, freezer):
+    freezer.move_to("2020-01-10 12:00")
+    s1 = semester_factory(name="S19", start=date(2020, 1, 1), end=date(2020, 1, 3))
+    assert get_ongoing_semester() == s1
+
+    # another worker changed semesters, this one notices it once the TTL expires
+    s2 = Semester.objects.bulk_create([Semester(name="S20", start=date(2020, 1, 4), end=date(2020, 1, 24))])[0]
+    assert get_ongoing_semester() == s1
+    freezer.tick(crud_semester.ONGOING_SEMESTER_TTL)
+    assert get_ongoing_semester() == s1
+    cache.set(crud_semester.ONGOING_SEMESTER_VERSION_KEY, cache.get(crud_semester.ONGOING_SEMESTER_VERSION_KEY, 0) + 1)
+    freezer.tick(crud_semester.ONGOING_SEMESTER_TTL)
+    assert get_ongoing_semester() == s2
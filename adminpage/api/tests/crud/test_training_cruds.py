@@ -1,11 +1,12 @@
 import pytest
 import unittest
-from datetime import date, time, datetime
+from datetime import date, time, datetime, timezone
 
 from api.crud import enroll_student, \
     get_group_info, \
-    get_trainings_for_student, get_trainings_for_trainer, get_students_grades
-from sport.models import Training, Schedule
+    get_trainings_for_student, get_trainings_for_trainer, get_students_grades, \
+    get_check_in_eligibility, can_check_in
+from sport.models import Training, Schedule, TrainingCheckIn, MedicalGroups
 
 testcase = unittest.TestCase()
 testcase.maxDiff = None
@@ -244,3 +245,67 @@ assertMembers = testcase.assertCountEqual
 #         "hours": a1.hours,
 #         "full_name": f"{student.user.first_name} {student.user.last_name}",
 #     }]
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-01-15 07:00')
+def test_check_in_eligibility(student_factory, sport_factory, semester_factory, group_factory,
+                              training_factory, django_assert_num_queries):
+    student = student_factory("A1@foo.bar").student
+    student.medical_group_id = MedicalGroups.GENERAL
+    student.save()
+    other_student = student_factory("A2@foo.bar").student
+    semester = semester_factory(name="S20", start=date(2020, 1, 1), end=date(2020, 1, 30))
+    sport_a, sport_b, sport_c, sport_d = (sport_factory(name=name) for name in "ABCD")
+    g1 = group_factory(name="G1", capacity=20, sport=sport_a, semester=semester)
+    g2 = group_factory(name="G2", capacity=20, sport=sport_b, semester=semester)
+    g3 = group_factory(name="G3", capacity=20, sport=sport_c, semester=semester)
+    g_full = group_factory(name="Full", capacity=1, sport=sport_d, semester=semester)
+    g_banned = group_factory(name="Banned", capacity=20, sport=sport_d, semester=semester)
+    g_banned.banned_students.add(student)
+    g_allowed = group_factory(name="Allowed", capacity=20, sport=sport_d, semester=semester,
+                              allowed_medical_groups=[])
+    g_allowed.allowed_students.add(student)
+    g_female = group_factory(name="Female", capacity=20, sport=sport_d, semester=semester)
+    g_female.allowed_gender = 1
+    g_female.save()
+    g_special = group_factory(name="Special", capacity=20, sport=sport_d, semester=semester,
+                              allowed_medical_groups=[MedicalGroups.SPECIAL1])
+
+    def training(group, day, hour):
+        start = datetime(2020, 1, day, hour, tzinfo=timezone.utc)
+        return training_factory(group=group, start=start, end=start.replace(hour=hour + 1, minute=30))
+
+    t_checked_in = training(g1, 15, 8)
+    TrainingCheckIn.objects.create(student=student, training=t_checked_in)
+    t_full = training(g_full, 15, 14)
+    TrainingCheckIn.objects.create(student=other_student, training=t_full)
+    for t in (training(g3, 16, 8), training(g1, 16, 10)):
+        TrainingCheckIn.objects.create(student=student, training=t)
+    # 01:00 on the 17th in Moscow
+    TrainingCheckIn.objects.create(student=student, training=training(g3, 16, 22))
+
+    expected = {
+        t_checked_in: False,  # finished
+        training(g1, 15, 12): False,  # 2 hours of the same sport a day
+        training(g2, 15, 12): True,
+        training(g2, 16, 12): False,  # 4 hours a day
+        training(g3, 17, 8): False,  # 2 hours of the same sport a local day
+        training(g2, 17, 8): True,
+        training(g2, 14, 12): False,  # finished
+        training(g2, 25, 12): False,  # more than a week before the start
+        t_full: False,
+        training(g_banned, 15, 12): False,
+        training(g_allowed, 15, 12): True,
+        training(g_female, 15, 12): False,
+        training(g_special, 15, 12): False,
+    }
+    trainings = list(Training.objects.filter(pk__in=[t.pk for t in expected]).select_related("group"))
+
+    # the number of queries must not depend on the number of trainings
+    with django_assert_num_queries(5):
+        eligibility = get_check_in_eligibility(student, trainings)
+
+    assert eligibility == {t.pk: result for t, result in expected.items()}
+    for t in trainings:
+        assert can_check_in(student, t) == eligibility[t.pk]
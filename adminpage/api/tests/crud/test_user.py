@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 
 from sport.models import Student, Group
 from sport.models import MedicalGroups
-from api.crud import get_email_name_like_students_filtered_by_group
+from api.crud import get_email_name_like_students_filtered_by_group, get_email_name_like_students
 
 
 User = get_user_model()
@@ -28,6 +28,23 @@ def test_student_delete(student_factory):
     assert Student.objects.count() == 0
 
 
+@pytest.mark.django_db
+def test_get_email_name_like_students_ranking(student_factory):
+    student_factory("a.alfedov@example.com", first_name="Anton", last_name="Alfedov")
+    student_factory("i.fedorov@example.com", first_name="Ivan", last_name="Fedorov")
+    student_factory("f.ivanov@example.com", first_name="Fedor", last_name="Ivanov")
+    student_factory("p.petrov@example.com", first_name="Petr", last_name="Petrov")
+
+    found = [student["email"] for student in get_email_name_like_students(" FED ")]
+    # prefix matches of name or last name first, then matches inside
+    assert sorted(found[:2]) == ["f.ivanov@example.com", "i.fedorov@example.com"]
+    assert found[2:] == ["a.alfedov@example.com"]
+
+    assert [student["email"] for student in get_email_name_like_students("ivan fed")] == ["i.fedorov@example.com"]
+    assert get_email_name_like_students("fed", limit=1)[0]["email"] in ("f.ivanov@example.com", "i.fedorov@example.com")
+    assert get_email_name_like_students("f_d") == []
+
+
 # @pytest.mark.django_db
 # def test_get_email_name_like_students_filtered_by_group(
 #         student_factory,
@@ -16,8 +16,10 @@ from api.views import (
     measurement,
     semester,
     analytics,
+    export,
     medical_groups,
-    training_class
+    training_class,
+    bootstrap,
 )
 
 
@@ -64,6 +66,7 @@ urlpatterns = [
     path(r"attendance/<int:group_id>/report",
          attendance.get_last_attended_dates),
     path(r"attendance/mark", attendance.mark_attendance),
+    path(r"attendance/hours", attendance.get_students_hours_info),
     path(r"attendance/<int:student_id>/hours", attendance.get_student_hours_info),
     path(r"attendance/<int:student_id>/negative_hours", attendance.get_negative_hours_info),
     path(r"attendance/<int:student_id>/better_than", attendance.get_better_than_info),
@@ -88,6 +91,7 @@ urlpatterns = [
     path(r"fitnesstest/sessions", fitness_test.get_sessions),
     path(r"fitnesstest/sessions/<int:session_id>", fitness_test.get_session_info),
     path(r"fitnesstest/suggest_student", fitness_test.suggest_fitness_test_student),
+    path(r"fitnesstest/leaderboard", fitness_test.get_leaderboard),
 
     # measurement
     path(r"measurement/student_measurement", measurement.post_student_measurement),
@@ -99,11 +103,22 @@ urlpatterns = [
     # analytics
     path(r"analytics/attendance", analytics.attendance_analytics),
 
+    # exports
+    re_path(r"^export/group/(?P<group_id>\d+)/attendance\.(?P<file_format>csv|xlsx)$",
+            export.export_group_attendance),
+    re_path(r"^export/semester/(?P<semester_id>\d+)/hours\.(?P<file_format>csv|xlsx)$",
+            export.export_semester_hours),
+    re_path(r"^export/semester/(?P<semester_id>\d+)/fitness_test\.(?P<file_format>csv|xlsx)$",
+            export.export_semester_fitness_test),
+
     # medical groups
     path(r"medical_groups/", medical_groups.medical_groups_view),
 
     # training class
     path(r"training_class", training_class.get_training_class_view),
+
+    # reference data
+    path(r"bootstrap", bootstrap.bootstrap),
 ]
 
 urlpatterns.extend([
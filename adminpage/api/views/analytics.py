@@ -1,44 +1,44 @@
-import datetime
+from datetime import timedelta
 
 from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.utils import extend_schema
 from rest_framework import status
 
+from api.crud import get_attendance_series
 from api.permissions import IsStaff, IsSuperUser
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
-from sport.models import Attendance
+from api.serializers import AttendanceAnalyticsQuerySerializer
+from sport.utils import today
 
 
 @extend_schema(
     methods=["GET"],
-    parameters=[
-        OpenApiParameter(name='sport_id', type=OpenApiTypes.INT),
-        OpenApiParameter(name='medical_group_id', type=OpenApiTypes.INT),
-    ],
+    parameters=[AttendanceAnalyticsQuerySerializer],
     responses={
-        status.HTTP_200_OK: dict[str, int],
+        status.HTTP_200_OK: OpenApiTypes.OBJECT,
     }
 )
 @api_view(["GET"])
 @permission_classes([IsStaff | IsSuperUser])
 def attendance_analytics(request, **kwargs):
-    sport_id, medical_group_id = request.GET.get("sport_id"), request.GET.get("medical_group_id")
-    time_period = datetime.datetime.now() - datetime.timedelta(days=30)
-    query = Attendance.objects.filter(training__start__gt=time_period)
-    if sport_id:
-        query = query.filter(training__group__sport__id=sport_id)
-    if medical_group_id:
-        query = query.filter(student__medical_group__id=medical_group_id)
+    """
+    Number of attendance records per day, week or month, optionally split by sport, medical group or group.
+    Periods without attendance are included with zero counts.
+    """
+    serializer = AttendanceAnalyticsQuerySerializer(data=request.GET)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
 
-    result = {}
-    query = sorted(query, key=lambda x: x.training.start)
-    for obj in query:
-        time_key = obj.training.start.strftime("%Y-%m-%d")
-        if time_key not in result.keys():
-            result.update({time_key: 1})
-        else:
-            result[time_key] += 1
-    return Response(result)
+    end = params.get("end") or today()
+    start = params.get("start") or end - timedelta(days=29)
+    return Response(get_attendance_series(
+        start,
+        end,
+        granularity=params["granularity"],
+        group_by=params.get("group_by"),
+        sport_id=params.get("sport_id"),
+        medical_group_id=params.get("medical_group_id"),
+    ))
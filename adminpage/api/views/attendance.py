@@ -13,20 +13,21 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied, NotFound
 from rest_framework.response import Response
-from django.views.decorators.cache import cache_page
 from django.utils.dateparse import parse_date
 
 from api.crud import Training, \
-    get_students_grades, mark_hours, get_student_last_attended_dates, \
-    get_student_hours, get_negative_hours, better_than, get_email_name_like_students_filtered_by_group
+    get_students_grades, grade_students, get_student_last_attended_dates, \
+    get_student_hours, get_students_hours, get_negative_hours, better_than, \
+    get_email_name_like_students_filtered_by_group
 from api.permissions import IsStaff, IsStudent, IsTrainer, IsSuperUser
 from api.serializers import SuggestionQuerySerializer, SuggestionSerializer, \
     NotFoundSerializer, InbuiltErrorSerializer, \
     TrainingGradesSerializer, AttendanceMarkSerializer, error_detail, \
     BadGradeReportGradeSerializer, BadGradeReport, LastAttendedDatesSerializer, HoursInfoSerializer, \
-    HoursInfoFullSerializer, AttendanceSerializer, ErrorSerializer
+    HoursInfoFullSerializer, AttendanceSerializer, ErrorSerializer, StudentsHoursQuerySerializer, \
+    StudentHoursInfoSerializer
 from api.serializers.attendance import BetterThanInfoSerializer
-from sport.models import Group, Student, Attendance
+from sport.models import Group, Student, Attendance, Enroll
 
 User = get_user_model()
 
@@ -54,13 +55,6 @@ def is_training_group(group, trainer):
         )
 
 
-def compose_bad_grade_report(email: str, hours: float) -> dict:
-    return {
-        "email": email,
-        "hours": hours,
-    }
-
-
 @extend_schema(
     methods=["GET"],
     parameters=[SuggestionQuerySerializer],
@@ -212,6 +206,45 @@ def get_student_hours_info(request, student_id, **kwargs):
     return Response(get_student_hours(student_id))
 
 
+@extend_schema(
+    methods=["GET"],
+    parameters=[StudentsHoursQuerySerializer],
+    responses={
+        status.HTTP_200_OK: StudentHoursInfoSerializer(many=True),
+        status.HTTP_404_NOT_FOUND: NotFoundSerializer,
+        status.HTTP_403_FORBIDDEN: InbuiltErrorSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsTrainer | IsStaff | IsSuperUser])
+def get_students_hours_info(request, **kwargs):
+    """
+    Get hours of many students at once, either listed by id or enrolled into the group
+    """
+    serializer = StudentsHoursQuerySerializer(data=request.GET)
+    serializer.is_valid(raise_exception=True)
+
+    student_ids = set(serializer.validated_data.get("student_id", []))
+    group_id = serializer.validated_data.get("group_id")
+    if group_id is not None:
+        group = get_object_or_404(Group, pk=group_id)
+        if not (request.user.is_superuser or request.user.is_staff):
+            is_training_group(group, request.user)
+        student_ids.update(
+            Enroll.objects.filter(group=group).values_list("student_id", flat=True)
+        )
+
+    hours = get_students_hours(student_ids)
+    return Response([
+        {
+            "student_id": student_id,
+            **hours_info,
+            "final_hours": get_negative_hours(student_id, hours_info),
+        }
+        for student_id, hours_info in sorted(hours.items())
+    ])
+
+
 @extend_schema(
     methods=["GET"],
     responses={
@@ -222,7 +255,6 @@ def get_student_hours_info(request, student_id, **kwargs):
 )
 @api_view(["GET"])
 @permission_classes([IsStudent | IsStaff | IsSuperUser])
-@cache_page(60 * 60 * 24)
 def get_better_than_info(request, student_id, **kwargs):
     return Response(better_than(student_id))
 
@@ -246,7 +278,7 @@ def mark_attendance(request, **kwargs):
         training = Training.objects.select_related(
             "group"
         ).only(
-            "group__trainer", "start", "end"
+            "group__trainer", "group__accredited", "start", "end"
         ).get(
             pk=serializer.validated_data["training_id"]
         )
@@ -264,52 +296,21 @@ def mark_attendance(request, **kwargs):
             data=error_detail(*AttendanceErrors.TRAINING_NOT_EDITABLE)
         )
 
-    id_to_hours = dict([
+    report = grade_students(training, [
         (item["student_id"], item["hours"])
         for item in serializer.validated_data["students_hours"]
     ])
 
-    max_hours = training.academic_duration
-    students = User.objects.filter(pk__in=id_to_hours.keys()).only("email")
-
-    hours_to_mark = []
-    negative_mark = []
-    overflow_mark = []
-
-    for student in students:
-        hours_put = id_to_hours[student.pk]
-        if hours_put < 0:
-            negative_mark.append(
-                compose_bad_grade_report(student.email, hours_put)
-            )
-        elif hours_put > max_hours:
-            overflow_mark.append(
-                compose_bad_grade_report(student.email, hours_put)
-            )
-        elif str(Student.objects.filter(user=get_user_model().objects.filter(email=student.email)[0])[
-                     0].student_status) != 'Normal':
-            pass
-        else:
-            hours_to_mark.append((student, hours_put))
-
-    if negative_mark or overflow_mark:
+    if report["negative_marks"] or report["overflow_marks"]:
         return Response(
             status=status.HTTP_400_BAD_REQUEST,
             data={
                 **error_detail(*AttendanceErrors.OUTBOUND_GRADES),
-                "negative_marks": negative_mark,
-                "overflow_marks": overflow_mark,
+                "negative_marks": report["negative_marks"],
+                "overflow_marks": report["overflow_marks"],
             }
         )
-    else:
-        mark_data = [(x[0].pk, x[1]) for x in hours_to_mark]
-        mark_hours(training, mark_data)
-        return Response(list(
-            map(
-                lambda x: compose_bad_grade_report(x[0].email, x[1]),
-                hours_to_mark
-            )
-        ))
+    return Response(report["marked"])
 
 
 @extend_schema(
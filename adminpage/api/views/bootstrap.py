@@ -0,0 +1,59 @@
+import threading
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from api.crud import get_reference_data, get_reference_data_version, get_ongoing_semester
+from api.permissions import IsStudent, IsTrainer, IsSuperUser
+from api.serializers import BootstrapSerializer, InbuiltErrorSerializer
+
+
+class _BootstrapCache:
+    def __init__(self):
+        self.key = None
+        self.data = None
+        self.lock = threading.Lock()
+
+
+_cache = _BootstrapCache()
+
+
+def bootstrap_etag(version: int, ongoing_semester_id: int) -> str:
+    # Sports of the bundle come from the ongoing semester, which changes with the date
+    return quote_etag(f"{version}-{ongoing_semester_id}")
+
+
+@extend_schema(
+    methods=["GET"],
+    responses={
+        status.HTTP_200_OK: BootstrapSerializer,
+        status.HTTP_304_NOT_MODIFIED: None,
+        status.HTTP_403_FORBIDDEN: InbuiltErrorSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsStudent | IsTrainer | IsSuperUser])
+def bootstrap(request, **kwargs):
+    """
+    All slowly changing reference data in one response: semesters, medical groups, training classes,
+    self sport types, measurements, sports of the ongoing semester and FAQ.
+    The response has an ETag, send it in If-None-Match to get 304 while the data is not changed
+    """
+    # version is read before the data, so a concurrent change is never missed
+    version = get_reference_data_version()
+    key = (version, get_ongoing_semester().pk)
+    etag = bootstrap_etag(*key)
+    # Checked after DRF authentication and permissions, so that anonymous clients get 403 and not 304
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    with _cache.lock:
+        if _cache.key != key:
+            _cache.data = BootstrapSerializer({'version': version, **get_reference_data()}).data
+            _cache.key = key
+        return Response(_cache.data, headers={"ETag": etag})
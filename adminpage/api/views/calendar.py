@@ -1,13 +1,16 @@
 from datetime import time
 
 from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
 
-from api.crud import get_sport_schedule, get_trainings_for_student, get_trainings_for_trainer
+from api.crud import get_sport_schedule, get_trainings_for_student, get_trainings_for_trainer, \
+    get_personal_schedule_fingerprint, get_reference_data_version
 from api.permissions import IsStudent, IsTrainer
 from api.serializers import CalendarRequestSerializer, CalendarSerializer
 
@@ -79,35 +82,49 @@ def get_schedule(request, sport_id, **kwargs):
     return Response(list(map(convert_training_schedule, trainings)))
 
 
+def personal_schedule_etag(student, trainer, start, end) -> str:
+    # Names of groups, sports and training classes are reference data
+    return quote_etag(
+        f"{get_reference_data_version()}-{get_personal_schedule_fingerprint(student, trainer, start, end)}"
+    )
+
+
 @extend_schema(
     methods=["GET"],
     parameters=[CalendarRequestSerializer],
     responses={
         status.HTTP_200_OK: CalendarSerializer,
+        status.HTTP_304_NOT_MODIFIED: None,
     }
 )
 @api_view(["GET"])
 @permission_classes([IsStudent | IsTrainer])
 def get_personal_schedule(request, **kwargs):
+    """
+    Trainings of the student and the trainer in the given range.
+    The response has an ETag, send it in If-None-Match to get 304 while the calendar is not changed
+    """
     serializer = CalendarRequestSerializer(data=request.GET)
     serializer.is_valid(raise_exception=True)
+    start = serializer.validated_data["start"]
+    end = serializer.validated_data["end"]
+    student = getattr(request.user, "student", None)
+    trainer = getattr(request.user, "trainer", None)
+
+    # The user is known only after DRF authentication, so the condition is checked here, not by @etag
+    etag = personal_schedule_etag(student, trainer, start, end)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
 
     student_trainings = []
     trainer_trainings = []
 
-    if hasattr(request.user, "student"):
-        student_trainings = get_trainings_for_student(
-            request.user.student,
-            serializer.validated_data["start"],
-            serializer.validated_data["end"],
-        )
+    if student is not None:
+        student_trainings = get_trainings_for_student(student, start, end)
 
-    if hasattr(request.user, "trainer"):
-        trainer_trainings = get_trainings_for_trainer(
-            request.user.trainer,
-            serializer.validated_data["start"],
-            serializer.validated_data["end"],
-        )
+    if trainer is not None:
+        trainer_trainings = get_trainings_for_trainer(trainer, start, end)
 
     result_dict = dict([
         (training["id"], training)
@@ -115,5 +132,6 @@ def get_personal_schedule(request, **kwargs):
     ])
 
     return Response(
-        list(map(convert_personal_training, result_dict.values()))
+        list(map(convert_personal_training, result_dict.values())),
+        headers={"ETag": etag},
     )
@@ -0,0 +1,146 @@
+import csv
+from itertools import islice
+from tempfile import TemporaryFile
+from typing import AsyncIterator, Iterable, Iterator, List, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from openpyxl import Workbook
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+
+from api.crud import iter_group_attendance, iter_semester_hours, iter_fitness_test_scores
+from api.permissions import IsStaff, IsTrainer, IsSuperUser
+from api.serializers import NotFoundSerializer, InbuiltErrorSerializer
+from api.views.attendance import is_training_group
+from sport.models import Group, Semester
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSX_CHUNK_SIZE = 64 * 1024
+# Chunks pulled from a sync iterator at once when streaming under ASGI
+ASYNC_BATCH_SIZE = 500
+
+T = TypeVar("T")
+
+
+class _Echo:
+    """
+    File-like object that returns written value instead of storing it,
+    so that csv.writer renders one row at a time
+    """
+
+    def write(self, value):
+        return value
+
+
+def _stream_csv(rows: Iterable[List]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _stream_xlsx(rows: Iterable[List], title: str) -> Iterator[bytes]:
+    # Write-only workbook keeps rows in a temporary file instead of memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    for row in rows:
+        sheet.append(row)
+    with TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(XLSX_CHUNK_SIZE):
+            yield chunk
+
+
+async def _aiter(chunks: Iterator[T]) -> AsyncIterator[T]:
+    # Under ASGI Django collects a sync iterator into a list before sending it. Here chunks are pulled
+    # in batches in the thread of the request, where the server-side cursor of the rows stays open
+    next_batch = sync_to_async(lambda: list(islice(chunks, ASYNC_BATCH_SIZE)), thread_sensitive=True)
+    while batch := await next_batch():
+        for chunk in batch:
+            yield chunk
+
+
+def export_response(request, rows: Iterable[List], file_format: str, filename: str) -> StreamingHttpResponse:
+    """
+    Streams rows as a CSV or XLSX attachment
+    @param request - export request, an ASGI request gets an asynchronous stream
+    @param rows - header and data rows, consumed lazily
+    @param file_format - csv or xlsx
+    @param filename - attachment name without extension
+    """
+    if file_format == "xlsx":
+        content, content_type = _stream_xlsx(rows, filename), XLSX_CONTENT_TYPE
+    else:
+        content, content_type = _stream_csv(rows), "text/csv"
+    if isinstance(request._request, ASGIRequest):
+        content = _aiter(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+@extend_schema(
+    methods=["GET"],
+    responses={
+        (status.HTTP_200_OK, "text/csv"): OpenApiTypes.BINARY,
+        (status.HTTP_200_OK, XLSX_CONTENT_TYPE): OpenApiTypes.BINARY,
+        status.HTTP_404_NOT_FOUND: NotFoundSerializer,
+        status.HTTP_403_FORBIDDEN: InbuiltErrorSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsTrainer | IsStaff | IsSuperUser])
+def export_group_attendance(request, group_id, file_format, **kwargs):
+    """
+    Student × training attendance matrix of a group for its semester, as CSV or XLSX
+    """
+    group = get_object_or_404(Group, pk=group_id)
+    if not (request.user.is_superuser or request.user.is_staff):
+        is_training_group(group, request.user)
+
+    return export_response(request, iter_group_attendance(group), file_format, f"attendance_group_{group.pk}")
+
+
+@extend_schema(
+    methods=["GET"],
+    responses={
+        (status.HTTP_200_OK, "text/csv"): OpenApiTypes.BINARY,
+        (status.HTTP_200_OK, XLSX_CONTENT_TYPE): OpenApiTypes.BINARY,
+        status.HTTP_404_NOT_FOUND: NotFoundSerializer,
+        status.HTTP_403_FORBIDDEN: InbuiltErrorSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsStaff | IsSuperUser])
+def export_semester_hours(request, semester_id, file_format, **kwargs):
+    """
+    Hours of all students in a semester, as CSV or XLSX
+    """
+    semester = get_object_or_404(Semester, pk=semester_id)
+    return export_response(request, iter_semester_hours(semester), file_format, f"hours_semester_{semester.pk}")
+
+
+@extend_schema(
+    methods=["GET"],
+    responses={
+        (status.HTTP_200_OK, "text/csv"): OpenApiTypes.BINARY,
+        (status.HTTP_200_OK, XLSX_CONTENT_TYPE): OpenApiTypes.BINARY,
+        status.HTTP_404_NOT_FOUND: NotFoundSerializer,
+        status.HTTP_403_FORBIDDEN: InbuiltErrorSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsStaff | IsSuperUser])
+def export_semester_fitness_test(request, semester_id, file_format, **kwargs):
+    """
+    Fitness test scores of all students in a semester, as CSV or XLSX
+    """
+    semester = get_object_or_404(Semester, pk=semester_id)
+    return export_response(
+        request, iter_fitness_test_scores(semester), file_format, f"fitness_test_semester_{semester.pk}"
+    )
@@ -1,6 +1,10 @@
 from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 
 from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 from rest_framework import status, serializers
 from rest_framework.decorators import api_view, permission_classes
@@ -15,12 +19,12 @@ from api.serializers import (
 )
 
 from api.crud import get_exercises_crud, post_student_exercises_result_crud, \
-    get_email_name_like_students, get_ongoing_semester, get_score, get_max_score
+    get_email_name_like_students, get_ongoing_semester, FitnessTestGrader, get_fitness_test_leaderboard
 from api.serializers.attendance import SuggestionQueryFTSerializer
 from api.serializers.fitness_test import FitnessTestExerciseSerializer, FitnessTestSessionSerializer, \
-    FitnessTestSessionWithResult, FitnessTestStudentResult, FitnessTestUpload
+    FitnessTestSessionWithResult, FitnessTestStudentResult, FitnessTestUpload, FitnessTestLeaderboardQuery
 from api.serializers.semester import SemesterInSerializer
-from sport.models import FitnessTestSession, FitnessTestResult, FitnessTestExercise, Semester, Student
+from sport.models import FitnessTestSession, FitnessTestResult, FitnessTestExercise, Semester
 
 
 @extend_schema(
@@ -77,51 +81,60 @@ def get_sessions(request, **kwargs):
 @api_view(["GET"])
 @permission_classes([IsStudent])
 def get_result(request, **kwargs):
-    results = FitnessTestResult.objects.filter(student_id=request.user.student.user_id)
-    student = Student.objects.get(user__id=request.user.student.user_id)
+    student = request.user.student
+    results = list(
+        FitnessTestResult.objects.filter(student_id=student.pk, exercise__semester__isnull=False)
+        .order_by('exercise__semester__start', 'session__retake', 'pk')
+        .values_list('exercise__semester_id', 'session__retake', 'exercise_id', 'value')
+    )
     if not len(results):
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+    grader = FitnessTestGrader(
+        FitnessTestExercise.objects.filter(id__in={result[2] for result in results}).select_related('semester')
+    )
     data = []
-    for result_distinct_semester in results.values('exercise__semester_id', 'session__retake').distinct():
-        semester_id = result_distinct_semester['exercise__semester_id']
-        retake = result_distinct_semester['session__retake']
-
-        semester = Semester.objects.get(id=semester_id)
-        grade = True
-        total_score = 0
-        result_list = []
-        for result in results.filter(exercise__semester_id=semester_id, session__retake=retake):
-            result_list.append({
-                'exercise': result.exercise.exercise_name,
-                'unit': result.exercise.value_unit,
-                'value': (result.value
-                          if result.exercise.select is None
-                          else result.exercise.select.split(',')[result.value]),
-                'score': get_score(request.user.student, result),
-                'max_score': get_max_score(request.user.student, result),
-            })
-            grade = grade and result_list[-1]['score'] >= result.exercise.threshold
-            total_score += result_list[-1]['score']
-
-        if semester_id == get_ongoing_semester().id \
-                and student.medical_group == 0 \
-                and result_list:
-            grade = True
-        else:
-            grade = grade and total_score >= semester.points_fitness_test
-
+    for (semester_id, retake), attempt in groupby(results, key=itemgetter(0, 1)):
+        attempt = [(exercise_id, value) for _, _, exercise_id, value in attempt]
+        semester = grader.exercises[attempt[0][0]].semester
         data.append({
             'semester': semester.name,
             'retake': retake,
-            'grade': grade,
-            'total_score': total_score,
-            'details': result_list,
+            **grader.grade(semester, student.gender, attempt),
         })
 
     return Response(data=data, status=status.HTTP_200_OK)
 
 
+@extend_schema(
+    methods=["GET"],
+    parameters=[FitnessTestLeaderboardQuery],
+    responses={
+        status.HTTP_200_OK: OpenApiTypes.OBJECT,
+        status.HTTP_404_NOT_FOUND: NotFoundSerializer,
+    }
+)
+@api_view(["GET"])
+@permission_classes([IsTrainer | IsSuperUser])
+def get_leaderboard(request, **kwargs):
+    """
+    Fitness test scores of a semester: total score and exercise score histograms, best students,
+    and rank and percentile of a student among all students who took the test
+    """
+    serializer = FitnessTestLeaderboardQuery(data=request.GET)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    semester_id = params.get('semester_id')
+    semester = get_ongoing_semester() if semester_id is None else get_object_or_404(Semester, pk=semester_id)
+    return Response(get_fitness_test_leaderboard(
+        semester,
+        student_id=params.get('student_id'),
+        bin_size=params['bin_size'],
+        top=params['top'],
+    ))
+
+
 @extend_schema(
     methods=["GET"],
     responses={
@@ -144,10 +157,18 @@ def get_session_info(request, session_id, **kwargs):
     }).data)
 
 
+class PostStudentExerciseResultError(serializers.Serializer):
+    index = serializers.IntegerField()
+    student_id = serializers.IntegerField()
+    exercise_id = serializers.IntegerField()
+    detail = serializers.CharField()
+
+
 # TODO: do same thing everywhere
 class PostStudentExerciseResult(serializers.Serializer):
     result = serializers.CharField(default='ok')
     session_id = serializers.IntegerField()
+    errors = PostStudentExerciseResultError(many=True, default=list)
 
 
 @extend_schema(
@@ -181,8 +202,8 @@ def post_student_exercises_result(request, session_id=None, **kwargs):
 
     retake = serializer.validated_data['retake']
     results = serializer.validated_data['results']
-    session = post_student_exercises_result_crud(semester, retake, results, session_id, request.user)
-    return Response(PostStudentExerciseResult({'session_id': session}).data)
+    report = post_student_exercises_result_crud(semester, retake, results, session_id, request.user)
+    return Response(PostStudentExerciseResult(report).data)
 
 
 # TODO: Rewrite suggest to JSON
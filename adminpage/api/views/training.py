@@ -1,6 +1,5 @@
-import pglock
 from django.conf import settings
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
@@ -8,7 +7,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
-from api.crud.crud_training import can_check_in
+from api.crud.crud_training import can_check_in, lock_for_check_in
 from api.permissions import IsStudent, IsTrainer, IsStaff
 from api.serializers import NotFoundSerializer, EmptySerializer, ErrorSerializer, error_detail
 from api.serializers.training import NewTrainingInfoStudentSerializer
@@ -72,7 +71,8 @@ def training_checkin(request, training_id, **kwargs):
         )
     student: Student = request.user.student
 
-    with pglock.advisory("check-in-lock"):  # Handle race condition
+    with transaction.atomic():
+        lock_for_check_in(student, training)
         if not can_check_in(student, training):
             return Response(
                 status=status.HTTP_400_BAD_REQUEST,
@@ -80,7 +80,8 @@ def training_checkin(request, training_id, **kwargs):
             )
 
         try:
-            TrainingCheckIn.objects.create(student=student, training_id=training_id)
+            with transaction.atomic():
+                TrainingCheckIn.objects.create(student=student, training_id=training_id)
             return Response({})
         except IntegrityError as e:
             return Response(
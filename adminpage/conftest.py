@@ -1,4 +1,7 @@
 # configuration for pytest
+import pytest
+
+from api.crud import crud_semester, crud_bootstrap
 
 # here you can add all modules
 # with fixtures
@@ -6,3 +9,14 @@ pytest_plugins = [
     "api.fixtures.user_creation",
     "api.fixtures.model_creation",
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_ongoing_semester_cache():
+    # semesters of previous tests are rolled back without any signals
+    crud_semester._drop_local_ongoing_semester()
+
+
+@pytest.fixture(autouse=True)
+def clear_reference_data_version():
+    crud_bootstrap._drop_local_reference_data_version()
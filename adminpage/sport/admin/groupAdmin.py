@@ -171,7 +171,7 @@ class GroupAdmin(DefaultFilterMixIn):
         return obj.capacity - obj.enroll_count
 
     def accredit(self, request, queryset):
-        queryset.update(accredited=True)
+        queryset.update(accredited=True, updated_at=timezone.now())
 
     actions = [accredit]
 
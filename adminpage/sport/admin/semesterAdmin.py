@@ -1,6 +1,8 @@
-from django.contrib import admin
-from django.forms import ModelForm, CheckboxSelectMultiple, ModelChoiceField
+from django.contrib import admin, messages
+from django.forms import ModelForm, CheckboxSelectMultiple, ModelChoiceField, BooleanField
+from django.template.response import TemplateResponse
 
+from api.crud import get_debts_to_roll_over
 from sport.models import Semester
 from .site import site
 from .utils import copy_sport_groups_and_schedule_from_semester
@@ -12,6 +14,10 @@ class SemesterAdminForm(ModelForm):
         required=False,
         label='Semester to copy groups and schedule from'
     )
+    copy_students = BooleanField(
+        required=False,
+        label='Copy allowed and banned students of the groups'
+    )
 
     class Meta:
         model = Semester
@@ -44,12 +50,40 @@ class SemesterAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         source_semester = form.cleaned_data.get('semester_to_copy')
         if source_semester and not change:
-            copy_sport_groups_and_schedule_from_semester(
+            report = copy_sport_groups_and_schedule_from_semester(
                 obj,
-                source_semester
+                source_semester,
+                copy_students=form.cleaned_data.get('copy_students', False),
+            )
+            self.message_user(
+                request,
+                f"Copied {report['groups']} groups with {report['schedules']} schedule timeslots, "
+                f"{report['trainings']} trainings and {report['links']} group links "
+                f"from {source_semester.name} in {report['seconds']:.1f} s"
             )
         else:
             super().save_model(request, obj, form, change)
+        # Set by the pre_save signal when debts are rolled over to a new semester
+        if hasattr(obj, "rolled_over_debts"):
+            self.message_user(request, f"Rolled over {obj.rolled_over_debts} debts to {obj.name}")
+
+    def preview_debt_rollover(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Please select exactly one semester", messages.ERROR)
+            return
+        semester = queryset.get()
+        debts = get_debts_to_roll_over(semester)
+        return TemplateResponse(request, "admin/sport/semester/debt_rollover_preview.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Debts to roll over from {semester.name}",
+            "semester": semester,
+            "debts": debts,
+            "total_debt": sum(debt["debt"] for debt in debts),
+        })
+    preview_debt_rollover.short_description = "Preview debts rolled over to the next semester (dry run)"
+
+    actions = [preview_debt_rollover]
 
     def get_fields(self, request, obj=None):
         if obj is None:
@@ -64,6 +98,7 @@ class SemesterAdmin(admin.ModelAdmin):
                 "number_hours_one_week_ill",
                 "nullify_groups",
                 "semester_to_copy",
+                "copy_students",
                 # "increase_course"
             )
         return (
@@ -1,8 +1,11 @@
+import logging
 import operator
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Tuple, TypedDict
 
 from django.contrib import admin
 from django.contrib.admin.widgets import AdminTimeWidget, AdminSplitDateTime
+from django.db import transaction
 from django.db.models.expressions import F
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -12,10 +15,12 @@ from django import forms
 import datetime
 
 from api.crud import get_ongoing_semester
-from sport.signals.schedule import create_trainings_current_semester
-from sport.models import Schedule, Semester, Group
+from sport.signals.schedule import get_schedule_trainings
+from sport.models import Schedule, Semester, Group, Training
 from adminpage.settings import NOT_COPYABLE_GROUPS
 
+logger = logging.getLogger(__name__)
+
 
 class DurationWidget(forms.TimeInput):
     class Media:
@@ -277,11 +282,11 @@ def get_new_sport_groups(new_semester: Semester, sport_groups: list[Group]) -> l
             continue
         new_group = Group(
             semester=new_semester,
-            sport=group.sport,
+            sport_id=group.sport_id,
             name=group.name,
             capacity=group.capacity,
             is_club=group.is_club,
-            trainer=group.trainer,
+            trainer_id=group.trainer_id,
             accredited=group.accredited,
             allowed_education_level=group.allowed_education_level,
             allowed_gender=group.allowed_gender,
@@ -299,26 +304,87 @@ def get_new_schedule_for_sport_group(sport_group: Group, new_sport_group: Group)
             weekday=schedule_obj.weekday,
             start=schedule_obj.start,
             end=schedule_obj.end,
-            training_class=schedule_obj.training_class,
+            training_class_id=schedule_obj.training_class_id,
         )
         new_timeslots.append(timeslot)
     return new_timeslots
 
 
-def copy_sport_groups_and_schedule_from_semester(semester: Semester, prev_semester: Semester) -> None:
-    semester.save()
-    sport_groups = Group.objects.filter(semester__pk=prev_semester.pk).prefetch_related('trainers', 'allowed_medical_groups', 'schedule').select_related('trainer').order_by('pk')
-    new_sport_groups = get_new_sport_groups(semester, sport_groups)
-    Group.objects.bulk_create(new_sport_groups)
-
-    new_schedule_timeslots = []
-    new_sport_groups = Group.objects.filter(semester__pk=semester.pk).order_by('pk')
-    for old_group, new_group in zip(sport_groups, new_sport_groups):
-        for trainer in old_group.trainers.all():
-            new_group.trainers.add(trainer)
-        for medical_group in old_group.allowed_medical_groups.all():
-            new_group.allowed_medical_groups.add(medical_group)
-        new_schedule_timeslots.extend(get_new_schedule_for_sport_group(old_group, new_group))
-    Schedule.objects.bulk_create(new_schedule_timeslots)
-    for timeslot in new_schedule_timeslots:
-        create_trainings_current_semester(timeslot, True)
+class SemesterCopyReport(TypedDict):
+    groups: int
+    schedules: int
+    trainings: int
+    links: int
+    seconds: float
+
+
+def copy_group_links(field_name: str, new_groups_by_old_id: Dict[int, Group]) -> int:
+    """
+    Copies links of a many-to-many field of groups to their copies with one insert into the through table
+    @return number of copied links
+    """
+    field = Group._meta.get_field(field_name)
+    through = field.remote_field.through
+    source, target = f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+    links = through.objects.filter(**{f"{source}__in": new_groups_by_old_id}).values_list(source, target)
+    created = through.objects.bulk_create([
+        through(**{source: new_groups_by_old_id[group_id].pk, target: target_id})
+        for group_id, target_id in links
+    ])
+    return len(created)
+
+
+def copy_sport_groups_and_schedule_from_semester(
+        semester: Semester,
+        prev_semester: Semester,
+        copy_students: bool = False,
+) -> SemesterCopyReport:
+    """
+    Saves a new semester with copies of groups, their teachers, medical groups and schedule
+    of the previous semester, and creates future trainings for the copied schedule.
+    The number of queries does not depend on the number of groups
+    @param copy_students - also copy allowed and banned students of the groups
+    @return numbers of created objects and time spent
+    """
+    started = time.perf_counter()
+    with transaction.atomic():
+        semester.save()
+        sport_groups = list(
+            Group.objects.filter(semester__pk=prev_semester.pk)
+            .exclude(name__in=NOT_COPYABLE_GROUPS)
+            .prefetch_related('schedule')
+            .order_by('pk')
+        )
+        # Primary keys are set by bulk_create on PostgreSQL, so copies are matched without querying them back
+        new_sport_groups = Group.objects.bulk_create(get_new_sport_groups(semester, sport_groups))
+        new_groups_by_old_id = {
+            old_group.pk: new_group for old_group, new_group in zip(sport_groups, new_sport_groups)
+        }
+        logger.info("Copied %d groups to %s in %.1f s", len(new_sport_groups), semester, time.perf_counter() - started)
+
+        link_fields = ['trainers', 'allowed_medical_groups']
+        if copy_students:
+            link_fields += ['allowed_students', 'banned_students']
+        links = sum(copy_group_links(field_name, new_groups_by_old_id) for field_name in link_fields)
+
+        new_schedule_timeslots = Schedule.objects.bulk_create([
+            timeslot
+            for old_group in sport_groups
+            for timeslot in get_new_schedule_for_sport_group(old_group, new_groups_by_old_id[old_group.pk])
+        ])
+        # Trainings of all timeslots are generated at once instead of in the post_save signal of every timeslot
+        trainings = Training.objects.bulk_create([
+            training
+            for timeslot in new_schedule_timeslots
+            for training in get_schedule_trainings(timeslot, semester)
+        ])
+        logger.info("Copied %d schedule timeslots with %d trainings to %s in %.1f s",
+                    len(new_schedule_timeslots), len(trainings), semester, time.perf_counter() - started)
+
+    return {
+        "groups": len(new_sport_groups),
+        "schedules": len(new_schedule_timeslots),
+        "trainings": len(trainings),
+        "links": links,
+        "seconds": time.perf_counter() - started,
+    }
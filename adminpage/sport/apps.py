@@ -7,3 +7,7 @@ class SportConfig(AppConfig):
     def ready(self) -> None:
         # Register signals
         import sport.signals  # noqa: F401
+
+        from prometheus_client import REGISTRY
+        from sport.metrics import EmailOutboxCollector
+        REGISTRY.register(EmailOutboxCollector())
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.crud.utils import dictfetchall
+
+# Cells of the cube that differ from the source tables, missing cells count as zeros
+CUBE_DIFF_SQL = """
+SELECT coalesce(c.day, s.day)                           AS day,
+       coalesce(c.group_id, s.group_id)                 AS group_id,
+       coalesce(c.medical_group_id, s.medical_group_id) AS medical_group_id,
+       c.attendance_count                               AS cube_attendance_count,
+       s.attendance_count                               AS actual_attendance_count,
+       c.hours                                          AS cube_hours,
+       s.hours                                          AS actual_hours,
+       c.students                                       AS cube_students,
+       s.students                                       AS actual_students
+FROM attendance_daily_cube c
+         FULL OUTER JOIN attendance_daily_cube_source s
+                         ON s.day = c.day AND s.group_id = c.group_id AND s.medical_group_id = c.medical_group_id
+WHERE c.id IS NULL
+   OR s.group_id IS NULL
+   OR (c.semester_id, c.sport_id, c.attendance_count, c.hours, c.students)
+    IS DISTINCT FROM (s.semester_id, s.sport_id, s.attendance_count, s.hours, s.students)
+ORDER BY 1, 2, 3
+"""
+
+CUBE_REBUILD_SQL = """
+INSERT INTO attendance_daily_cube (day, semester_id, group_id, sport_id, medical_group_id,
+                                   attendance_count, hours, students)
+SELECT day, semester_id, group_id, sport_id, medical_group_id, attendance_count, hours, students
+FROM attendance_daily_cube_source
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily attendance cube from attendance, trainings and groups. "
+        "With --verify, only compare the cube with the source tables and report mismatched cells."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Do not modify the cube, fail if it differs from the source tables",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify()
+        else:
+            self.rebuild()
+
+    def verify(self):
+        with connection.cursor() as cursor:
+            cursor.execute(CUBE_DIFF_SQL)
+            mismatches = dictfetchall(cursor)
+
+        for row in mismatches[:20]:
+            self.stdout.write(str(row))
+        if mismatches:
+            raise CommandError(f"Attendance cube has {len(mismatches)} mismatched cells, "
+                               f"run the command without --verify to rebuild it")
+        self.stdout.write(self.style.SUCCESS("Attendance cube is consistent."))
+
+    @transaction.atomic
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            # Block concurrent writers, so that triggers do not race with the rebuild
+            cursor.execute("LOCK TABLE attendance_daily_cube IN EXCLUSIVE MODE")
+            cursor.execute("DELETE FROM attendance_daily_cube")
+            cursor.execute(CUBE_REBUILD_SQL)
+            rebuilt = cursor.rowcount
+
+        self.stdout.write(self.style.SUCCESS(f"Done: rebuilt {rebuilt} attendance cube cells."))
@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.crud.utils import dictfetchall
+
+# Rows of the ledger that differ from the source tables, missing rows count as zeros
+LEDGER_DIFF_SQL = """
+SELECT coalesce(l.student_id, s.student_id)   AS student_id,
+       coalesce(l.semester_id, s.semester_id) AS semester_id,
+       l.hours_not_self                       AS ledger_hours_not_self,
+       s.hours_not_self                       AS actual_hours_not_self,
+       l.hours_self_debt                      AS ledger_hours_self_debt,
+       s.hours_self_debt                      AS actual_hours_self_debt,
+       l.hours_self_not_debt                  AS ledger_hours_self_not_debt,
+       s.hours_self_not_debt                  AS actual_hours_self_not_debt,
+       l.debt                                 AS ledger_debt,
+       s.debt                                 AS actual_debt
+FROM student_hours_ledger l
+         FULL OUTER JOIN student_hours_ledger_source s
+                         ON s.student_id = l.student_id AND s.semester_id = l.semester_id
+WHERE l.id IS NULL
+   OR (l.hours_not_self, l.hours_self_debt, l.hours_self_not_debt, l.debt)
+    <> (coalesce(s.hours_not_self, 0), coalesce(s.hours_self_debt, 0),
+        coalesce(s.hours_self_not_debt, 0), coalesce(s.debt, 0))
+ORDER BY 1, 2
+"""
+
+# Only changed rows are touched, so that `updated_at` keeps pointing at real changes
+LEDGER_UPSERT_SQL = """
+INSERT INTO student_hours_ledger (student_id, semester_id, hours_not_self, hours_self_debt,
+                                  hours_self_not_debt, debt, updated_at)
+SELECT student_id, semester_id, hours_not_self, hours_self_debt, hours_self_not_debt, debt, clock_timestamp()
+FROM student_hours_ledger_source
+ON CONFLICT (student_id, semester_id) DO UPDATE
+    SET hours_not_self      = excluded.hours_not_self,
+        hours_self_debt     = excluded.hours_self_debt,
+        hours_self_not_debt = excluded.hours_self_not_debt,
+        debt                = excluded.debt,
+        updated_at          = excluded.updated_at
+WHERE (student_hours_ledger.hours_not_self, student_hours_ledger.hours_self_debt,
+       student_hours_ledger.hours_self_not_debt, student_hours_ledger.debt)
+          <> (excluded.hours_not_self, excluded.hours_self_debt, excluded.hours_self_not_debt, excluded.debt)
+"""
+
+LEDGER_ZERO_SQL = """
+UPDATE student_hours_ledger l
+SET hours_not_self      = 0,
+    hours_self_debt     = 0,
+    hours_self_not_debt = 0,
+    debt                = 0,
+    updated_at          = clock_timestamp()
+WHERE (l.hours_not_self, l.hours_self_debt, l.hours_self_not_debt, l.debt) <> (0, 0, 0, 0)
+  AND NOT EXISTS(SELECT 1
+                 FROM student_hours_ledger_source s
+                 WHERE s.student_id = l.student_id
+                   AND s.semester_id = l.semester_id)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-student, per-semester hours ledger from attendance, "
+        "self-sport reports and debts. With --verify, only compare the ledger "
+        "with the source tables and report mismatched rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Do not modify the ledger, fail if it differs from the source tables",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            self.verify()
+        else:
+            self.rebuild()
+
+    def verify(self):
+        with connection.cursor() as cursor:
+            cursor.execute(LEDGER_DIFF_SQL)
+            mismatches = dictfetchall(cursor)
+
+        for row in mismatches[:20]:
+            self.stdout.write(str(row))
+        if mismatches:
+            raise CommandError(f"Hours ledger has {len(mismatches)} mismatched rows, "
+                               f"run the command without --verify to rebuild it")
+        self.stdout.write(self.style.SUCCESS("Hours ledger is consistent."))
+
+    @transaction.atomic
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            # Block concurrent writers, so that triggers do not race with the rebuild
+            cursor.execute("LOCK TABLE student_hours_ledger IN EXCLUSIVE MODE")
+            cursor.execute(LEDGER_UPSERT_SQL)
+            rebuilt = cursor.rowcount
+            cursor.execute(LEDGER_ZERO_SQL)
+            rebuilt += cursor.rowcount
+
+        self.stdout.write(self.style.SUCCESS(f"Done: fixed {rebuilt} hours ledger rows."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.crud import refresh_fitness_test_scores
+from sport.models import FitnessTestExercise
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the fitness test score table from results and grading tables. "
+        "Scores are refreshed on changes of results, exercises and grading tables, "
+        "run the command after bulk changes made outside of Django, e.g. of student genders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--semester",
+            type=int,
+            help="Only refresh the semester with this id (default: all semesters with exercises)",
+        )
+
+    def handle(self, *args, **options):
+        if options["semester"] is not None:
+            semester_ids = [options["semester"]]
+        else:
+            semester_ids = FitnessTestExercise.objects.filter(
+                semester__isnull=False,
+            ).values_list("semester_id", flat=True).distinct().order_by("semester_id")
+
+        students = 0
+        for semester_id in semester_ids:
+            students += refresh_fitness_test_scores(semester_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: refreshed scores of {students} students in {len(semester_ids)} semesters."
+        ))
@@ -0,0 +1,118 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from sport.models import EmailOutbox
+
+
+def pending_emails():
+    return EmailOutbox.objects.filter(
+        sent_at__isnull=True,
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def to_message(email: EmailOutbox, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        email.subject,
+        email.message,
+        from_email=email.from_email,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_message:
+        message.attach_alternative(email.html_message, "text/html")
+    return message
+
+
+def reschedule(email: EmailOutbox, error: Exception):
+    email.attempts += 1
+    email.last_error = f"{type(error).__name__}: {error}"
+    email.next_attempt_at = timezone.now() + settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+
+
+def send_batch() -> int:
+    """
+    Sends one batch of due emails over a single connection,
+    failed emails are rescheduled with exponential backoff
+    @return number of processed emails
+    """
+    with transaction.atomic():
+        # Rows locked by a concurrent worker are skipped, so workers never send an email twice
+        emails = list(
+            pending_emails()
+            .filter(next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at")
+            .select_for_update(skip_locked=True)[:settings.EMAIL_OUTBOX_BATCH_SIZE]
+        )
+        if not emails:
+            return 0
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for email in emails:
+                reschedule(email, e)
+        else:
+            try:
+                for email in emails:
+                    try:
+                        connection.send_messages([to_message(email, connection)])
+                    except Exception as e:
+                        reschedule(email, e)
+                    else:
+                        email.attempts += 1
+                        email.sent_at = timezone.now()
+                        email.last_error = ""
+            finally:
+                connection.close()
+
+        EmailOutbox.objects.bulk_update(emails, ["attempts", "last_error", "next_attempt_at", "sent_at"])
+        return len(emails)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send emails queued in the outbox. Each batch is sent over one SMTP connection, "
+        "failed emails are retried with exponential backoff. "
+        "By default, sends all due emails and exits, with --forever keeps polling the outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--forever",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when it is drained",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --forever (default 5)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = 0
+            while batch := send_batch():
+                processed += batch
+
+            if processed or not options["forever"]:
+                self.report(processed)
+            if not options["forever"]:
+                return
+            time.sleep(options["sleep"])
+
+    def report(self, processed):
+        pending = pending_emails().count()
+        failed = EmailOutbox.objects.filter(
+            sent_at__isnull=True, attempts__gte=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: processed {processed} emails, {pending} pending, {failed} failed."
+        ))
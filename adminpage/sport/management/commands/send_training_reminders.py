@@ -1,13 +1,16 @@
 import urllib.parse
 from datetime import datetime, time, timedelta
+from time import perf_counter
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Exists, OuterRef
 from django.forms.utils import to_current_timezone
 from django.utils import timezone
 
-from sport.models import Training, TrainingReminder
+from sport.models import Training, TrainingReminder, TrainingCheckIn, EmailOutbox
+from sport.utils import email_html
 
 
 class Command(BaseCommand):
@@ -18,6 +21,19 @@ class Command(BaseCommand):
         "Students who check in after a previous run will receive a reminder on the next run."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only load and render reminders, report counts and timing without sending",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of reminders queued in one transaction (default 500)",
+        )
+
     def handle(self, *args, **options):
         now = timezone.localtime()
         today = now.date()
@@ -44,55 +60,73 @@ class Command(BaseCommand):
             self.stdout.write("Outside reminder windows (06-14 and 18-24), nothing to do.")
             return
 
-        trainings = Training.objects.filter(
-            # Exclude 'Self training', 'Extra sport events', 'Medical leave', etc. trainings
-            ~Q(group__sport=None),
-            # Training time is inside target window
-            start__gte=window_start,
-            start__lt=window_end,
-        ).select_related("group", "training_class")
-
-        already_reminded = set(
-            TrainingReminder.objects.filter(training__in=trainings).values_list(
-                "training_id", "student_id"
-            )
+        started = perf_counter()
+        trainings = {
+            training.pk: training
+            for training in Training.objects.filter(
+                # Exclude 'Self training', 'Extra sport events', 'Medical leave', etc. trainings
+                ~Q(group__sport=None),
+                # Training time is inside target window
+                start__gte=window_start,
+                start__lt=window_end,
+            ).select_related("group__sport", "training_class")
+        }
+        recipients = list(
+            TrainingCheckIn.objects.filter(training_id__in=trainings.keys())
+            .exclude(Exists(TrainingReminder.objects.filter(
+                training_id=OuterRef("training_id"), student_id=OuterRef("student_id"),
+            )))
+            .order_by("training_id", "student_id")
+            .values_list("training_id", "student_id", "student__user__email", "student__user__first_name")
         )
+        loaded = perf_counter()
 
         subject, message = settings.EMAIL_TEMPLATES["training_reminder"]
-        reminders_to_create = []
-        sent_count = 0
+        training_context = {pk: self.get_training_context(t) for pk, t in trainings.items()}
+        emails = []
+        reminders = []
+        for training_id, student_id, email, first_name in recipients:
+            msg = message.format(student_name=first_name, **training_context[training_id])
+            emails.append(EmailOutbox(
+                subject=subject,
+                message=msg,
+                html_message=email_html(msg),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipients=[email],
+            ))
+            reminders.append(TrainingReminder(training_id=training_id, student_id=student_id))
+        rendered = perf_counter()
 
-        for training in trainings:
-            students = [
-                s for s in training.checked_in_students
-                if (training.pk, s.pk) not in already_reminded
-            ]
-            if not students:
-                continue
-
-            local_start = to_current_timezone(training.start)
-            local_end = to_current_timezone(training.end)
-            location = training.training_class.name if training.training_class else "—"
+        stats = (
+            f"{len(emails)} reminders for {len(trainings)} trainings "
+            f"(load {loaded - started:.2f}s, render {rendered - loaded:.2f}s"
+        )
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Dry run: would send {stats})."))
+            return
 
-            for student in students:
-                student.notify(
-                    subject,
-                    message,
-                    student_name=student.user.first_name,
-                    group_name=training.group.to_frontend_name(),
-                    date=local_start.strftime("%d.%m.%Y"),
-                    start_time=local_start.strftime("%H:%M"),
-                    end_time=local_end.strftime("%H:%M"),
-                    location=location,
-                    location_url=f"https://innohassle.ru/maps?q={urllib.parse.quote(location)}",
-                )
-                reminders_to_create.append(
-                    TrainingReminder(training=training, student=student)
-                )
-                sent_count += 1
+        # Each chunk is queued together with its reminder records,
+        # so a failed run never reminds twice about the same training
+        chunk_size = options["chunk_size"]
+        for i in range(0, len(emails), chunk_size):
+            with transaction.atomic():
+                EmailOutbox.objects.bulk_create(emails[i:i + chunk_size])
+                TrainingReminder.objects.bulk_create(reminders[i:i + chunk_size], ignore_conflicts=True)
 
-        TrainingReminder.objects.bulk_create(reminders_to_create, ignore_conflicts=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: queued {stats}, queue {perf_counter() - rendered:.2f}s)."
+        ))
 
-        self.stdout.write(
-            self.style.SUCCESS(f"Done: sent {sent_count} reminder emails.")
-        )
+    @staticmethod
+    def get_training_context(training: Training) -> dict:
+        local_start = to_current_timezone(training.start)
+        local_end = to_current_timezone(training.end)
+        location = training.training_class.name if training.training_class else "—"
+        return {
+            "group_name": training.group.to_frontend_name(),
+            "date": local_start.strftime("%d.%m.%Y"),
+            "start_time": local_start.strftime("%H:%M"),
+            "end_time": local_end.strftime("%H:%M"),
+            "location": location,
+            "location_url": f"https://innohassle.ru/maps?q={urllib.parse.quote(location)}",
+        }
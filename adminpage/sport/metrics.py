@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from prometheus_client.core import GaugeMetricFamily
+
+from sport.models import EmailOutbox
+
+
+class EmailOutboxCollector:
+    """
+    Exposes depth of the email outbox on the Prometheus metrics page,
+    values are queried on every scrape
+    """
+
+    def describe(self):
+        # Prevents querying the database when the collector is registered
+        yield GaugeMetricFamily("sport_email_outbox_pending", "Emails waiting to be sent")
+        yield GaugeMetricFamily("sport_email_outbox_failed", "Emails that ran out of attempts")
+        yield GaugeMetricFamily("sport_email_outbox_oldest_pending_seconds", "Age of the oldest pending email")
+
+    def collect(self):
+        try:
+            stats = EmailOutbox.objects.filter(sent_at__isnull=True).aggregate(
+                pending=Count("id", filter=Q(attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)),
+                failed=Count("id", filter=Q(attempts__gte=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)),
+                oldest=Min("created_at", filter=Q(attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)),
+            )
+        except DatabaseError:
+            return
+
+        oldest_age = (timezone.now() - stats["oldest"]).total_seconds() if stats["oldest"] else 0
+        yield GaugeMetricFamily("sport_email_outbox_pending", "Emails waiting to be sent",
+                                value=stats["pending"])
+        yield GaugeMetricFamily("sport_email_outbox_failed", "Emails that ran out of attempts",
+                                value=stats["failed"])
+        yield GaugeMetricFamily("sport_email_outbox_oldest_pending_seconds", "Age of the oldest pending email",
+                                value=oldest_age)
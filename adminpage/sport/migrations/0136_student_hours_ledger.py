@@ -0,0 +1,243 @@
+# Generated by Django 5.2.14 on 2026-10-18 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Aggregated hours and debt per (student, semester) computed from the source tables.
+# The ledger table is a materialization of this view.
+LEDGER_SOURCE_VIEW_SQL = """
+CREATE OR REPLACE VIEW student_hours_ledger_source AS
+SELECT src.student_id,
+       src.semester_id,
+       sum(src.hours_not_self)::int      AS hours_not_self,
+       sum(src.hours_self_debt)::int     AS hours_self_debt,
+       sum(src.hours_self_not_debt)::int AS hours_self_not_debt,
+       sum(src.debt)::int                AS debt
+FROM (SELECT a.student_id,
+             g.semester_id,
+             CASE WHEN a.cause_report_id IS NULL THEN a.hours ELSE 0 END               AS hours_not_self,
+             CASE WHEN r.debt THEN a.hours ELSE 0 END                                  AS hours_self_debt,
+             CASE WHEN a.cause_report_id IS NOT NULL AND NOT r.debt THEN a.hours ELSE 0 END AS hours_self_not_debt,
+             0                                                                         AS debt
+      FROM attendance a
+               JOIN training t ON t.id = a.training_id
+               JOIN "group" g ON g.id = t.group_id
+               LEFT JOIN self_sport_report r ON r.id = a.cause_report_id
+      UNION ALL
+      SELECT d.student_id, d.semester_id, 0, 0, 0, d.debt
+      FROM debt d
+      WHERE d.semester_id IS NOT NULL) src
+GROUP BY src.student_id, src.semester_id;
+"""
+
+LEDGER_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION training_semester_id(p_training_id int) RETURNS int AS
+$$
+    SELECT g.semester_id FROM training t JOIN "group" g ON g.id = t.group_id WHERE t.id = p_training_id;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_student_hours_ledger(p_student_id int, p_semester_id int) RETURNS void AS
+$$
+BEGIN
+    IF p_student_id IS NULL OR p_semester_id IS NULL THEN
+        RETURN;
+    END IF;
+    -- Serialize refreshes of the same row, so that the recomputation below
+    -- always sees changes committed by a concurrent refresh
+    PERFORM pg_advisory_xact_lock(p_student_id, p_semester_id);
+
+    INSERT INTO student_hours_ledger (student_id, semester_id, hours_not_self, hours_self_debt,
+                                      hours_self_not_debt, debt)
+    SELECT student_id, semester_id, hours_not_self, hours_self_debt, hours_self_not_debt, debt
+    FROM student_hours_ledger_source
+    WHERE student_id = p_student_id
+      AND semester_id = p_semester_id
+    ON CONFLICT (student_id, semester_id) DO UPDATE
+        SET hours_not_self      = excluded.hours_not_self,
+            hours_self_debt     = excluded.hours_self_debt,
+            hours_self_not_debt = excluded.hours_self_not_debt,
+            debt                = excluded.debt;
+
+    IF NOT FOUND THEN
+        DELETE FROM student_hours_ledger WHERE student_id = p_student_id AND semester_id = p_semester_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION attendance_hours_ledger_trigger() RETURNS trigger AS
+$$
+BEGIN
+    IF tg_op = 'UPDATE' AND old.student_id = new.student_id AND old.training_id IS NOT DISTINCT FROM new.training_id THEN
+        PERFORM refresh_student_hours_ledger(new.student_id, training_semester_id(new.training_id));
+        RETURN NULL;
+    END IF;
+    IF tg_op IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_student_hours_ledger(old.student_id, training_semester_id(old.training_id));
+    END IF;
+    IF tg_op IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_student_hours_ledger(new.student_id, training_semester_id(new.training_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION debt_hours_ledger_trigger() RETURNS trigger AS
+$$
+BEGIN
+    IF tg_op IN ('UPDATE', 'DELETE') THEN
+        PERFORM refresh_student_hours_ledger(old.student_id, old.semester_id);
+    END IF;
+    IF tg_op IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_student_hours_ledger(new.student_id, new.semester_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION self_sport_report_hours_ledger_trigger() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM refresh_student_hours_ledger(a.student_id, training_semester_id(a.training_id))
+    FROM attendance a
+    WHERE a.cause_report_id = new.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION training_hours_ledger_trigger() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM refresh_student_hours_ledger(a.student_id, s.semester_id)
+    FROM attendance a,
+         (SELECT g.semester_id FROM "group" g WHERE g.id IN (old.group_id, new.group_id)) s
+    WHERE a.training_id = new.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION group_hours_ledger_trigger() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM refresh_student_hours_ledger(a.student_id, s.semester_id)
+    FROM attendance a
+             JOIN training t ON t.id = a.training_id,
+         (VALUES (old.semester_id), (new.semester_id)) s (semester_id)
+    WHERE t.group_id = new.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION student_hours_ledger_cleanup_trigger() RETURNS trigger AS
+$$
+BEGIN
+    IF tg_table_name = 'student' THEN
+        DELETE FROM student_hours_ledger WHERE student_id = old.user_id;
+    ELSE
+        DELETE FROM student_hours_ledger WHERE semester_id = old.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER attendance_hours_ledger
+    AFTER INSERT OR UPDATE OR DELETE
+    ON attendance
+    FOR EACH ROW
+EXECUTE FUNCTION attendance_hours_ledger_trigger();
+
+CREATE TRIGGER debt_hours_ledger
+    AFTER INSERT OR UPDATE OR DELETE
+    ON debt
+    FOR EACH ROW
+EXECUTE FUNCTION debt_hours_ledger_trigger();
+
+CREATE TRIGGER self_sport_report_hours_ledger
+    AFTER UPDATE OF debt
+    ON self_sport_report
+    FOR EACH ROW
+    WHEN (old.debt IS DISTINCT FROM new.debt)
+EXECUTE FUNCTION self_sport_report_hours_ledger_trigger();
+
+CREATE TRIGGER training_hours_ledger
+    AFTER UPDATE OF group_id
+    ON training
+    FOR EACH ROW
+    WHEN (old.group_id IS DISTINCT FROM new.group_id)
+EXECUTE FUNCTION training_hours_ledger_trigger();
+
+CREATE TRIGGER group_hours_ledger
+    AFTER UPDATE OF semester_id
+    ON "group"
+    FOR EACH ROW
+    WHEN (old.semester_id IS DISTINCT FROM new.semester_id)
+EXECUTE FUNCTION group_hours_ledger_trigger();
+
+CREATE TRIGGER student_hours_ledger_cleanup
+    AFTER DELETE
+    ON student
+    FOR EACH ROW
+EXECUTE FUNCTION student_hours_ledger_cleanup_trigger();
+
+CREATE TRIGGER semester_hours_ledger_cleanup
+    AFTER DELETE
+    ON semester
+    FOR EACH ROW
+EXECUTE FUNCTION student_hours_ledger_cleanup_trigger();
+"""
+
+LEDGER_BACKFILL_SQL = """
+INSERT INTO student_hours_ledger (student_id, semester_id, hours_not_self, hours_self_debt, hours_self_not_debt, debt)
+SELECT student_id, semester_id, hours_not_self, hours_self_debt, hours_self_not_debt, debt
+FROM student_hours_ledger_source;
+"""
+
+LEDGER_DROP_SQL = """
+DROP TRIGGER IF EXISTS attendance_hours_ledger ON attendance;
+DROP TRIGGER IF EXISTS debt_hours_ledger ON debt;
+DROP TRIGGER IF EXISTS self_sport_report_hours_ledger ON self_sport_report;
+DROP TRIGGER IF EXISTS training_hours_ledger ON training;
+DROP TRIGGER IF EXISTS group_hours_ledger ON "group";
+DROP TRIGGER IF EXISTS student_hours_ledger_cleanup ON student;
+DROP TRIGGER IF EXISTS semester_hours_ledger_cleanup ON semester;
+DROP FUNCTION IF EXISTS attendance_hours_ledger_trigger();
+DROP FUNCTION IF EXISTS debt_hours_ledger_trigger();
+DROP FUNCTION IF EXISTS self_sport_report_hours_ledger_trigger();
+DROP FUNCTION IF EXISTS training_hours_ledger_trigger();
+DROP FUNCTION IF EXISTS group_hours_ledger_trigger();
+DROP FUNCTION IF EXISTS student_hours_ledger_cleanup_trigger();
+DROP FUNCTION IF EXISTS refresh_student_hours_ledger(int, int);
+DROP FUNCTION IF EXISTS training_semester_id(int);
+DROP VIEW IF EXISTS student_hours_ledger_source;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0135_trainingreminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentHoursLedger',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hours_not_self', models.IntegerField(default=0)),
+                ('hours_self_debt', models.IntegerField(default=0)),
+                ('hours_self_not_debt', models.IntegerField(default=0)),
+                ('debt', models.IntegerField(default=0)),
+                ('semester', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='hours_ledger', to='sport.semester')),
+                ('student', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='hours_ledger', to='sport.student')),
+            ],
+            options={
+                'verbose_name': 'student hours ledger',
+                'verbose_name_plural': 'student hours ledger',
+                'db_table': 'student_hours_ledger',
+                'constraints': [models.UniqueConstraint(fields=('student', 'semester'), name='unique_student_hours_ledger')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=LEDGER_SOURCE_VIEW_SQL + LEDGER_FUNCTIONS_SQL + LEDGER_BACKFILL_SQL,
+            reverse_sql=LEDGER_DROP_SQL,
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.14 on 2026-10-18 18:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Keep zeroed rows instead of deleting them and stamp every change with the wall clock time,
+# so that readers can pick up all changes with `updated_at > last seen change`
+REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION refresh_student_hours_ledger(p_student_id int, p_semester_id int) RETURNS void AS
+$$
+BEGIN
+    IF p_student_id IS NULL OR p_semester_id IS NULL THEN
+        RETURN;
+    END IF;
+    -- Serialize refreshes of the same row, so that the recomputation below
+    -- always sees changes committed by a concurrent refresh
+    PERFORM pg_advisory_xact_lock(p_student_id, p_semester_id);
+
+    INSERT INTO student_hours_ledger (student_id, semester_id, hours_not_self, hours_self_debt,
+                                      hours_self_not_debt, debt, updated_at)
+    SELECT p_student_id,
+           p_semester_id,
+           coalesce(max(hours_not_self), 0),
+           coalesce(max(hours_self_debt), 0),
+           coalesce(max(hours_self_not_debt), 0),
+           coalesce(max(debt), 0),
+           clock_timestamp()
+    FROM student_hours_ledger_source
+    WHERE student_id = p_student_id
+      AND semester_id = p_semester_id
+    ON CONFLICT (student_id, semester_id) DO UPDATE
+        SET hours_not_self      = excluded.hours_not_self,
+            hours_self_debt     = excluded.hours_self_debt,
+            hours_self_not_debt = excluded.hours_self_not_debt,
+            debt                = excluded.debt,
+            updated_at          = excluded.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_REFRESH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION refresh_student_hours_ledger(p_student_id int, p_semester_id int) RETURNS void AS
+$$
+BEGIN
+    IF p_student_id IS NULL OR p_semester_id IS NULL THEN
+        RETURN;
+    END IF;
+    PERFORM pg_advisory_xact_lock(p_student_id, p_semester_id);
+
+    INSERT INTO student_hours_ledger (student_id, semester_id, hours_not_self, hours_self_debt,
+                                      hours_self_not_debt, debt)
+    SELECT student_id, semester_id, hours_not_self, hours_self_debt, hours_self_not_debt, debt
+    FROM student_hours_ledger_source
+    WHERE student_id = p_student_id
+      AND semester_id = p_semester_id
+    ON CONFLICT (student_id, semester_id) DO UPDATE
+        SET hours_not_self      = excluded.hours_not_self,
+            hours_self_debt     = excluded.hours_self_debt,
+            hours_self_not_debt = excluded.hours_self_not_debt,
+            debt                = excluded.debt;
+
+    IF NOT FOUND THEN
+        DELETE FROM student_hours_ledger WHERE student_id = p_student_id AND semester_id = p_semester_id;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0136_student_hours_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenthoursledger',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='studenthoursledger',
+            index=models.Index(fields=['semester', 'updated_at'], name='student_hou_semeste_004cf2_idx'),
+        ),
+        migrations.RunSQL(
+            sql=REFRESH_FUNCTION_SQL,
+            reverse_sql=PREVIOUS_REFRESH_FUNCTION_SQL,
+        ),
+    ]
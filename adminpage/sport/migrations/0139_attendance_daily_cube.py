@@ -0,0 +1,218 @@
+# Generated by Django 5.2.14 on 2026-10-18 18:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Local date of a timestamp in the server time zone, days of the cube are taken in it
+LOCAL_DATE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION sport_local_date(ts timestamptz) RETURNS date AS
+$$
+    SELECT (ts AT TIME ZONE '{time_zone}')::date;
+$$ LANGUAGE sql IMMUTABLE;
+""".format(time_zone=settings.TIME_ZONE)
+
+# Attendance aggregated by (day, group, medical group) computed from the source tables.
+# The cube table is a materialization of this view.
+CUBE_SOURCE_VIEW_SQL = """
+CREATE OR REPLACE VIEW attendance_daily_cube_source AS
+SELECT sport_local_date(t.start)       AS day,
+       g.semester_id,
+       g.id                            AS group_id,
+       g.sport_id,
+       s.medical_group_id,
+       count(*)::int                   AS attendance_count,
+       sum(a.hours)::int               AS hours,
+       count(DISTINCT a.student_id)::int AS students
+FROM attendance a
+         JOIN training t ON t.id = a.training_id
+         JOIN "group" g ON g.id = t.group_id
+         JOIN student s ON s.user_id = a.student_id
+GROUP BY sport_local_date(t.start), g.id, s.medical_group_id;
+"""
+
+CUBE_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION refresh_attendance_cube(p_days date[], p_group_ids int[]) RETURNS void AS
+$$
+DECLARE
+    k record;
+BEGIN
+    -- Serialize refreshes of the same cells, locks are taken in a fixed order to avoid deadlocks
+    FOR k IN SELECT DISTINCT u.day, u.group_id
+             FROM unnest(p_days, p_group_ids) AS u (day, group_id)
+             WHERE u.day IS NOT NULL
+               AND u.group_id IS NOT NULL
+             ORDER BY u.group_id, u.day
+        LOOP
+            PERFORM pg_advisory_xact_lock(hashtextextended('attendance_daily_cube:' || k.group_id || ':' || k.day, 0));
+        END LOOP;
+
+    FOR k IN SELECT DISTINCT u.day, u.group_id
+             FROM unnest(p_days, p_group_ids) AS u (day, group_id)
+             WHERE u.day IS NOT NULL
+               AND u.group_id IS NOT NULL
+        LOOP
+            DELETE FROM attendance_daily_cube WHERE day = k.day AND group_id = k.group_id;
+            INSERT INTO attendance_daily_cube (day, semester_id, group_id, sport_id, medical_group_id,
+                                               attendance_count, hours, students)
+            SELECT day, semester_id, group_id, sport_id, medical_group_id, attendance_count, hours, students
+            FROM attendance_daily_cube_source
+            WHERE day = k.day
+              AND group_id = k.group_id;
+        END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level, so that bulk attendance changes refresh every cell once
+CREATE OR REPLACE FUNCTION attendance_daily_cube_trigger() RETURNS trigger AS
+$$
+BEGIN
+    IF tg_op = 'INSERT' THEN
+        PERFORM refresh_attendance_cube(array_agg(sport_local_date(t.start)), array_agg(t.group_id))
+        FROM new_rows n
+                 JOIN training t ON t.id = n.training_id;
+    ELSIF tg_op = 'DELETE' THEN
+        PERFORM refresh_attendance_cube(array_agg(sport_local_date(t.start)), array_agg(t.group_id))
+        FROM old_rows o
+                 JOIN training t ON t.id = o.training_id;
+    ELSE
+        PERFORM refresh_attendance_cube(array_agg(sport_local_date(t.start)), array_agg(t.group_id))
+        FROM (SELECT training_id FROM old_rows UNION SELECT training_id FROM new_rows) r
+                 JOIN training t ON t.id = r.training_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION training_attendance_daily_cube_trigger() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM refresh_attendance_cube(ARRAY [sport_local_date(old.start), sport_local_date(new.start)],
+                                    ARRAY [old.group_id, new.group_id]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION group_attendance_daily_cube_trigger() RETURNS trigger AS
+$$
+BEGIN
+    UPDATE attendance_daily_cube
+    SET semester_id = new.semester_id,
+        sport_id    = new.sport_id
+    WHERE group_id = new.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION student_attendance_daily_cube_trigger() RETURNS trigger AS
+$$
+BEGIN
+    PERFORM refresh_attendance_cube(array_agg(sport_local_date(t.start)), array_agg(t.group_id))
+    FROM attendance a
+             JOIN training t ON t.id = a.training_id
+    WHERE a.student_id = new.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER attendance_daily_cube_insert
+    AFTER INSERT
+    ON attendance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+EXECUTE FUNCTION attendance_daily_cube_trigger();
+
+CREATE TRIGGER attendance_daily_cube_update
+    AFTER UPDATE
+    ON attendance
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+EXECUTE FUNCTION attendance_daily_cube_trigger();
+
+CREATE TRIGGER attendance_daily_cube_delete
+    AFTER DELETE
+    ON attendance
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+EXECUTE FUNCTION attendance_daily_cube_trigger();
+
+CREATE TRIGGER training_attendance_daily_cube
+    AFTER UPDATE OF start, group_id
+    ON training
+    FOR EACH ROW
+    WHEN (old.start IS DISTINCT FROM new.start OR old.group_id IS DISTINCT FROM new.group_id)
+EXECUTE FUNCTION training_attendance_daily_cube_trigger();
+
+CREATE TRIGGER group_attendance_daily_cube
+    AFTER UPDATE OF semester_id, sport_id
+    ON "group"
+    FOR EACH ROW
+    WHEN (old.semester_id IS DISTINCT FROM new.semester_id OR old.sport_id IS DISTINCT FROM new.sport_id)
+EXECUTE FUNCTION group_attendance_daily_cube_trigger();
+
+CREATE TRIGGER student_attendance_daily_cube
+    AFTER UPDATE OF medical_group_id
+    ON student
+    FOR EACH ROW
+    WHEN (old.medical_group_id IS DISTINCT FROM new.medical_group_id)
+EXECUTE FUNCTION student_attendance_daily_cube_trigger();
+"""
+
+CUBE_BACKFILL_SQL = """
+INSERT INTO attendance_daily_cube (day, semester_id, group_id, sport_id, medical_group_id,
+                                   attendance_count, hours, students)
+SELECT day, semester_id, group_id, sport_id, medical_group_id, attendance_count, hours, students
+FROM attendance_daily_cube_source;
+"""
+
+CUBE_DROP_SQL = """
+DROP TRIGGER IF EXISTS attendance_daily_cube_insert ON attendance;
+DROP TRIGGER IF EXISTS attendance_daily_cube_update ON attendance;
+DROP TRIGGER IF EXISTS attendance_daily_cube_delete ON attendance;
+DROP TRIGGER IF EXISTS training_attendance_daily_cube ON training;
+DROP TRIGGER IF EXISTS group_attendance_daily_cube ON "group";
+DROP TRIGGER IF EXISTS student_attendance_daily_cube ON student;
+DROP FUNCTION IF EXISTS attendance_daily_cube_trigger();
+DROP FUNCTION IF EXISTS training_attendance_daily_cube_trigger();
+DROP FUNCTION IF EXISTS group_attendance_daily_cube_trigger();
+DROP FUNCTION IF EXISTS student_attendance_daily_cube_trigger();
+DROP FUNCTION IF EXISTS refresh_attendance_cube(date[], int[]);
+DROP VIEW IF EXISTS attendance_daily_cube_source;
+DROP FUNCTION IF EXISTS sport_local_date(timestamptz);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0138_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailyCube',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attendance_count', models.IntegerField(default=0)),
+                ('hours', models.IntegerField(default=0)),
+                ('students', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sport.group')),
+                ('medical_group', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sport.medicalgroup')),
+                ('semester', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sport.semester')),
+                ('sport', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sport.sport')),
+            ],
+            options={
+                'verbose_name': 'attendance daily cube',
+                'verbose_name_plural': 'attendance daily cube',
+                'db_table': 'attendance_daily_cube',
+                'indexes': [models.Index(fields=['semester', 'day'], name='attendance__semeste_326fe6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'group', 'medical_group'), name='unique_attendance_daily_cube')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=LOCAL_DATE_FUNCTION_SQL + CUBE_SOURCE_VIEW_SQL + CUBE_FUNCTIONS_SQL + CUBE_BACKFILL_SQL,
+            reverse_sql=CUBE_DROP_SQL,
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Expressions must match the ones built by api.crud.crud_users for the planner to use the indexes
+CREATE_TRIGRAM_INDEXES_SQL = """
+CREATE INDEX auth_user_email_trgm_index ON auth_user
+    USING gin (lower(email) gin_trgm_ops);
+CREATE INDEX auth_user_full_name_trgm_index ON auth_user
+    USING gin (lower(first_name || ' ' || last_name) gin_trgm_ops);
+"""
+
+DROP_TRIGRAM_INDEXES_SQL = """
+DROP INDEX IF EXISTS auth_user_full_name_trgm_index;
+DROP INDEX IF EXISTS auth_user_email_trgm_index;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0139_attendance_daily_cube'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            sql=CREATE_TRIGRAM_INDEXES_SQL,
+            reverse_sql=DROP_TRIGRAM_INDEXES_SQL,
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+# Concurrent uploads through update_or_create could create duplicate results, the latest one is kept
+DELETE_DUPLICATE_RESULTS_SQL = """
+DELETE FROM sport_fitnesstestresult r
+USING sport_fitnesstestresult newer
+WHERE r.student_id = newer.student_id
+  AND r.exercise_id = newer.exercise_id
+  AND r.session_id = newer.session_id
+  AND r.id < newer.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0140_auth_user_trigram_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=DELETE_DUPLICATE_RESULTS_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='fitnesstestresult',
+            constraint=models.UniqueConstraint(
+                fields=('student', 'exercise', 'session'), name='student_exercise_session',
+            ),
+        ),
+    ]
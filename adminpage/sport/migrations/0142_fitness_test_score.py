@@ -0,0 +1,57 @@
+# Generated by Django 5.2.14 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Rank and percentile of every student in the semester for Grafana,
+# percentile is the share of students with the same or a lower score, like in api.crud
+SCORE_RANK_VIEW_SQL = """
+CREATE OR REPLACE VIEW fitness_test_score_rank AS
+SELECT f.semester_id,
+       f.student_id,
+       f.retake,
+       f.total_score,
+       rank() OVER (PARTITION BY f.semester_id ORDER BY f.total_score DESC) AS rank,
+       round((100 * cume_dist() OVER (PARTITION BY f.semester_id ORDER BY f.total_score))::numeric, 1)
+                                                                             AS percentile
+FROM fitness_test_score f;
+"""
+
+SCORE_RANK_VIEW_DROP_SQL = """
+DROP VIEW IF EXISTS fitness_test_score_rank;
+"""
+
+
+# Scores of existing results are graded by the application code, which migrations must not import.
+# Fill the table after migrating with `python manage.py refresh_fitness_test_scores`
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0141_fitness_test_result_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FitnessTestScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('retake', models.BooleanField(default=False)),
+                ('total_score', models.IntegerField(default=0)),
+                ('exercise_scores', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('semester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitness_test_scores', to='sport.semester')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitness_test_scores', to='sport.student')),
+            ],
+            options={
+                'verbose_name': 'fitness test score',
+                'verbose_name_plural': 'fitness test scores',
+                'db_table': 'fitness_test_score',
+                'indexes': [models.Index(fields=['semester', 'total_score'], name='fitness_tes_semeste_6e85cb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'semester'), name='unique_fitness_test_score')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=SCORE_RANK_VIEW_SQL,
+            reverse_sql=SCORE_RANK_VIEW_DROP_SQL,
+        ),
+    ]
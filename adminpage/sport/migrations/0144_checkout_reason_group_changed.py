@@ -0,0 +1,18 @@
+# Generated by Django 5.2.14 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sport', '0143_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='checkouthistory',
+            name='checkout_reason',
+            field=models.CharField(choices=[('The recording was deleted by the student.', 'Student Cancel'), ('The recording was deleted by the coach.', 'Trainer Cancel'), ('Cancellation of training', 'Training Cancelled'), ('Change training time', 'Training Time Changed'), ('Change training group', 'Training Group Changed')], max_length=50),
+        ),
+    ]
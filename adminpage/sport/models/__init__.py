@@ -33,6 +33,10 @@ from .measurement import Measurement
 from .training_checkin import TrainingCheckIn
 from .checkout_history import CheckoutHistory
 from .training_reminder import TrainingReminder
+from .student_hours_ledger import StudentHoursLedger
+from .email_outbox import EmailOutbox
+from .attendance_daily_cube import AttendanceDailyCube
+from .fitness_test_score import FitnessTestScore
 
 DjangoGroup.add_to_class(
     'verbose_name',
@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class AttendanceDailyCube(models.Model):
+    """
+    Attendance pre-aggregated by day × group × medical group, with semester and sport of the group.
+
+    Rows are maintained by database triggers on attendance, training, group
+    and student (see migration 0139), so the table is read-only from Django's
+    point of view. Days are taken in the server time zone.
+    Use `manage.py rebuild_attendance_cube` to rebuild or verify the table.
+    """
+    day = models.DateField()
+    semester = models.ForeignKey(
+        "Semester",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    group = models.ForeignKey(
+        "Group",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    sport = models.ForeignKey(
+        "Sport",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    medical_group = models.ForeignKey(
+        "MedicalGroup",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    attendance_count = models.IntegerField(default=0)
+    hours = models.IntegerField(default=0)
+    students = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "attendance_daily_cube"
+        verbose_name = "attendance daily cube"
+        verbose_name_plural = "attendance daily cube"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "group", "medical_group"], name="unique_attendance_daily_cube"),
+        ]
+        indexes = [
+            models.Index(fields=("semester", "day")),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.group} ({self.medical_group}): {self.attendance_count} attendance"
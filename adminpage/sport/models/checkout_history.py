@@ -7,6 +7,7 @@ class CheckoutHistory(models.Model):
         TRAINER_CANCEL = "The recording was deleted by the coach."
         TRAINING_CANCELLED = "Cancellation of training"
         TRAINING_TIME_CHANGED = "Change training time"
+        TRAINING_GROUP_CHANGED = "Change training group"
 
     student = models.ForeignKey("Student", on_delete=models.SET_NULL, null=True)
     training = models.ForeignKey("Training", on_delete=models.SET_NULL, null=True)
@@ -0,0 +1,49 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class EmailOutbox(models.Model):
+    """
+    Emails waiting to be sent by `manage.py send_outbox_emails`.
+
+    Emails are written in the transaction of the change that caused them,
+    so they are sent only if the change is committed, and a slow SMTP server
+    does not block requests and admin saves.
+    """
+    subject = models.TextField()
+    message = models.TextField()
+    html_message = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=254, null=True, blank=True)
+    recipients = ArrayField(models.EmailField())
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "email_outbox"
+        verbose_name = "outgoing email"
+        verbose_name_plural = "outgoing emails"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(sent_at__isnull=True),
+                name="email_outbox_pending_idx",
+            ),
+        ]
+
+    @classmethod
+    def enqueue(cls, subject, message, recipient_list, from_email=None, html_message=None):
+        return cls.objects.create(
+            subject=subject,
+            message=message,
+            html_message=html_message,
+            from_email=from_email,
+            recipients=list(recipient_list),
+        )
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)}"
@@ -28,8 +28,8 @@ class FitnessTestResult(models.Model):
         blank=True
     )
 
-    # TODO: think about constarints
-    # class Meta:
-    #     constraints = [
-    #         models.UniqueConstraint(fields=['student', 'exercise'], name='student_exercise')
-    #     ]
+    class Meta:
+        constraints = [
+            # A student has one result per exercise in a session, retakes are separate sessions
+            models.UniqueConstraint(fields=['student', 'exercise', 'session'], name='student_exercise_session'),
+        ]
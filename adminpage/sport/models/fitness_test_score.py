@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class FitnessTestScore(models.Model):
+    """
+    Per-student, per-semester fitness test scores of the best attempt.
+
+    Rows are refreshed by `api.crud.refresh_fitness_test_scores` whenever
+    results, exercises or grading tables change, so that leaderboards and
+    Grafana read scores without grading every result again.
+    Use `manage.py refresh_fitness_test_scores` to rebuild the table.
+    """
+    student = models.ForeignKey(
+        "Student",
+        on_delete=models.CASCADE,
+        related_name="fitness_test_scores",
+    )
+    semester = models.ForeignKey(
+        "Semester",
+        on_delete=models.CASCADE,
+        related_name="fitness_test_scores",
+    )
+    retake = models.BooleanField(default=False)
+    total_score = models.IntegerField(default=0)
+    # exercise id -> score
+    exercise_scores = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "fitness_test_score"
+        verbose_name = "fitness test score"
+        verbose_name_plural = "fitness test scores"
+        constraints = [
+            models.UniqueConstraint(fields=["student", "semester"], name="unique_fitness_test_score"),
+        ]
+        indexes = [
+            models.Index(fields=("semester", "total_score")),
+        ]
+
+    def __str__(self):
+        return f"{self.student} in {self.semester}: {self.total_score} points"
@@ -54,6 +54,7 @@ class Group(models.Model):
         blank=True,
         help_text='List of students that are always included in sport complex access lists on top of general checkins list. Useful for specifying main team members.'
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "group"
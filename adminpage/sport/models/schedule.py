@@ -17,6 +17,7 @@ class Schedule(models.Model):
     start = models.TimeField(auto_now=False, auto_now_add=False, null=False)
     end = models.TimeField(auto_now=False, auto_now_add=False, null=False)
     training_class = models.ForeignKey("TrainingClass", on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "schedule"
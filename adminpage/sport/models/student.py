@@ -1,5 +1,4 @@
 from django.conf import settings
-from django.core.mail import send_mail
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.db.models import Q
@@ -8,7 +7,8 @@ from django.dispatch.dispatcher import receiver
 from tinymce.models import HTMLField
 
 from sport.models import MedicalGroupHistory, Gender
-from sport.utils import get_current_study_year
+from sport.models.email_outbox import EmailOutbox
+from sport.utils import get_current_study_year, email_html
 
 
 def validate_course(course):
@@ -82,28 +82,56 @@ class Student(models.Model):
 
     comment = HTMLField(null=True, blank=True, default='')
 
+    # Fields whose changes are handled by signals, see `has_changed`
+    TRACKED_FIELDS = ("medical_group_id", "student_status_id", "is_online", "sport_id")
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.__original_medical_group_id = self.medical_group_id
+        self.__original_values = self.__tracked_values()
+        self.__changed_fields = frozenset()
+
+    def __tracked_values(self):
+        # Deferred fields are not loaded here, fields assigned after loading are treated as changed on save
+        deferred = self.get_deferred_fields()
+        return {
+            field: getattr(self, field)
+            for field in self.TRACKED_FIELDS
+            if field not in deferred
+        }
+
+    def has_changed(self, field: str) -> bool:
+        """
+        Whether the tracked field was changed by the last save, new students have all fields changed
+        """
+        return field in self.__changed_fields
 
     def notify(self, subject, message, **kwargs):
         msg = message.format(**kwargs)
-        send_mail(
+        EmailOutbox.enqueue(
             subject,
             msg,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[self.user.email],
-            html_message=msg.replace("\n", "<br>"),
+            html_message=email_html(msg),
         )
 
     def save(self, *args, **kwargs):
         if self.telegram is not None and self.telegram[0] != '@':
             self.telegram = '@' + self.telegram
-        if self.medical_group_id != self.__original_medical_group_id:
+        deferred = self.get_deferred_fields()
+        changed_fields = frozenset(
+            field for field in self.TRACKED_FIELDS
+            if field not in deferred and (
+                field not in self.__original_values or getattr(self, field) != self.__original_values[field]
+            )
+        )
+        if "medical_group_id" in changed_fields:
             MedicalGroupHistory.objects.create(student=self,
                                                medical_group_id=self.medical_group_id)
+        self.__changed_fields = frozenset(self.TRACKED_FIELDS) if self._state.adding else changed_fields
 
         super().save(*args, **kwargs)
+        self.__original_values = self.__tracked_values()
 
     class Meta:
         db_table = "student"
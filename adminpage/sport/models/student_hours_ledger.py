@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class StudentHoursLedger(models.Model):
+    """
+    Per-student, per-semester totals of hours and debt.
+
+    Rows are maintained by database triggers on attendance, self_sport_report,
+    debt, training and group (see migrations 0136 and 0137), so the table is
+    read-only from Django's point of view. Rows are zeroed instead of being
+    deleted, so that every change is visible through `updated_at`.
+
+    Foreign keys are not enforced by the database because triggers may touch
+    the ledger while a student is being deleted; orphans are removed by
+    triggers on student and semester deletion.
+    Use `manage.py rebuild_hours_ledger` to rebuild or verify the table.
+    """
+    student = models.ForeignKey(
+        "Student",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="hours_ledger",
+    )
+    semester = models.ForeignKey(
+        "Semester",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="hours_ledger",
+    )
+    hours_not_self = models.IntegerField(default=0)
+    hours_self_debt = models.IntegerField(default=0)
+    hours_self_not_debt = models.IntegerField(default=0)
+    debt = models.IntegerField(default=0)
+    # Set by the database on every change, used to pick up changes incrementally
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "student_hours_ledger"
+        verbose_name = "student hours ledger"
+        verbose_name_plural = "student hours ledger"
+        constraints = [
+            models.UniqueConstraint(fields=["student", "semester"], name="unique_student_hours_ledger"),
+        ]
+        indexes = [
+            models.Index(fields=("semester", "updated_at")),
+        ]
+
+    @property
+    def total_hours(self) -> int:
+        return self.hours_not_self + self.hours_self_debt + self.hours_self_not_debt
+
+    def __str__(self):
+        return f"{self.student} in {self.semester}: {self.total_hours} hours, {self.debt} debt"
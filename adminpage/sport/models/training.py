@@ -18,6 +18,7 @@ class Training(models.Model):
     end = models.DateTimeField(null=False)
     training_class = models.ForeignKey("TrainingClass", on_delete=models.SET_NULL, null=True, blank=True)
     custom_name = models.CharField(max_length=100, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "training"
@@ -7,6 +7,7 @@ class TrainingCheckIn(models.Model):
     training = models.ForeignKey("Training", on_delete=models.CASCADE, related_name='checkins')
     attendance = models.OneToOneField('Attendance',
                                       null=True, blank=True, on_delete=models.SET_NULL, related_name='checkin')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.student} at {self.training}"
@@ -3,6 +3,7 @@ from .schedule import (
     create_trainings_current_semester,
 )
 from .semester import (
+    reset_ongoing_semester,
     special_groups_create,
     get_or_create_student_group,
     get_or_create_college_group,
@@ -17,3 +18,10 @@ from .user import (
 )
 from .reference import update_hours_for_reference
 from .self_sport_report import create_attendance_record
+from .fitness_test import (
+    refresh_student_fitness_test_score,
+    refresh_fitness_test_scores_on_grading_change,
+    refresh_fitness_test_scores_on_exercise_change,
+)
+from .reference_data import reset_reference_data
+from .group import touch_group_on_access_change
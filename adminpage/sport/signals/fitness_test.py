@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch.dispatcher import receiver
+
+from api.crud import refresh_fitness_test_scores_on_commit
+from sport.models import FitnessTestResult, FitnessTestExercise, FitnessTestGrading
+
+
+def exercise_semester_id(exercise_id: int):
+    # The exercise is already gone when its results and grading tables are deleted with it
+    return FitnessTestExercise.objects.filter(pk=exercise_id).values_list("semester_id", flat=True).first()
+
+
+@receiver(post_save, sender=FitnessTestResult)
+@receiver(post_delete, sender=FitnessTestResult)
+def refresh_student_fitness_test_score(instance: FitnessTestResult, **kwargs):
+    semester_id = exercise_semester_id(instance.exercise_id)
+    if semester_id is not None:
+        refresh_fitness_test_scores_on_commit(semester_id, [instance.student_id])
+
+
+@receiver(post_save, sender=FitnessTestGrading)
+@receiver(post_delete, sender=FitnessTestGrading)
+def refresh_fitness_test_scores_on_grading_change(instance: FitnessTestGrading, **kwargs):
+    semester_id = exercise_semester_id(instance.exercise_id)
+    if semester_id is not None:
+        refresh_fitness_test_scores_on_commit(semester_id)
+
+
+@receiver(post_save, sender=FitnessTestExercise)
+@receiver(post_delete, sender=FitnessTestExercise)
+def refresh_fitness_test_scores_on_exercise_change(instance: FitnessTestExercise, **kwargs):
+    if instance.semester_id is not None:
+        refresh_fitness_test_scores_on_commit(instance.semester_id)
@@ -0,0 +1,32 @@
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from sport.models import Group
+
+# Lists which decide who sees the trainings of a group in the calendar
+GROUP_ACCESS_LISTS = (
+    Group.trainers, Group.allowed_medical_groups, Group.allowed_students, Group.banned_students,
+)
+
+
+def touch_group_on_access_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # m2m changes do not save the group, its updated_at is set here for calendar fingerprints
+    if not reverse:
+        group_ids = [instance.pk] if action in ("post_add", "post_remove", "post_clear") else []
+    elif action in ("post_add", "post_remove"):
+        group_ids = pk_set
+    elif action == "pre_clear":
+        # the cleared groups are not known after the clear
+        field_name = next(
+            descriptor.field.m2m_reverse_field_name() for descriptor in GROUP_ACCESS_LISTS
+            if descriptor.through is sender
+        )
+        group_ids = list(sender.objects.filter(**{field_name: instance.pk}).values_list("group_id", flat=True))
+    else:
+        group_ids = []
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(updated_at=timezone.now())
+
+
+for descriptor in GROUP_ACCESS_LISTS:
+    m2m_changed.connect(touch_group_on_access_change, sender=descriptor.through)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+
+from api.crud import invalidate_reference_data
+from sport.models import (
+    Semester, MedicalGroup, TrainingClass, SelfSportType, Measurement, Sport, Group, FAQCategory, FAQElement,
+)
+
+# Models shown by the bootstrap endpoint, groups decide which sports are listed
+REFERENCE_DATA_MODELS = (
+    Semester, MedicalGroup, TrainingClass, SelfSportType, Measurement, Sport, Group, FAQCategory, FAQElement,
+)
+
+
+def reset_reference_data(sender, **kwargs):
+    invalidate_reference_data()
+
+
+for model in REFERENCE_DATA_MODELS:
+    post_save.connect(reset_reference_data, sender=model)
+    post_delete.connect(reset_reference_data, sender=model)
@@ -1,5 +1,6 @@
+from collections import defaultdict
 from datetime import date, timedelta, datetime
-from typing import Iterator
+from typing import Iterator, List, Dict
 
 from django.conf import settings
 from django.db.models.signals import post_save, pre_delete, pre_save
@@ -7,7 +8,7 @@ from django.dispatch.dispatcher import receiver
 from django.forms.utils import to_current_timezone
 from django.utils import timezone
 
-from sport.models import Schedule, Training, CheckoutHistory
+from sport.models import Schedule, Semester, Training, TrainingCheckIn, CheckoutHistory
 
 
 def get_today() -> date:
@@ -80,37 +81,152 @@ def notify_about_removed_training(instance: Training, **kwargs):
                        time=to_current_timezone(instance.start).strftime('%d.%m.%Y %H:%M'))
 
 
-@receiver(post_save, sender=Schedule)
-def create_trainings_current_semester(instance: Schedule, created, **kwargs):
-    # if schedule was changed - then time or date changed,
-    # so we recreate all future trainings
-    if not created:
-        remove_future_trainings_from_schedule(instance, **kwargs)
-
-    semester = instance.group.semester
+def get_schedule_trainings(schedule: Schedule, semester: Semester) -> List[Training]:
+    """
+    Future trainings of a schedule timeslot till the end of the semester, not saved
+    """
     today = get_today()
     server_timezone = timezone.localtime().tzinfo
     server_time = datetime.now(server_timezone)
     trainings = []
     for week_start in week_generator(max(get_current_monday(), semester.start), semester.end):
-        training_date = week_start + timedelta(days=instance.weekday)
+        training_date = week_start + timedelta(days=schedule.weekday)
         if today <= training_date <= semester.end:
             training_start = datetime.combine(
                 date=training_date,
-                time=instance.start,
+                time=schedule.start,
                 tzinfo=server_timezone
             )
             if server_time < training_start:
                 training_end = datetime.combine(
                     date=training_date,
-                    time=instance.end,
+                    time=schedule.end,
                     tzinfo=server_timezone
                 )
                 trainings.append(Training(
-                    group=instance.group,
-                    schedule=instance,
+                    group=schedule.group,
+                    schedule=schedule,
                     start=training_start,
                     end=training_end,
-                    training_class=instance.training_class,
+                    training_class_id=schedule.training_class_id,
                 ))
-    Training.objects.bulk_create(trainings)
+    return trainings
+
+
+def training_week(training: Training) -> date:
+    start = timezone.localtime(training.start).date()
+    return start - timedelta(days=start.weekday())
+
+
+def checkout_from_trainings(
+        group_name: str,
+        changes: Dict[int, str],
+        reasons: Dict[int, CheckoutHistory.Reason],
+) -> int:
+    """
+    Cancels check-ins for changed trainings and sends one email per student listing all their changes
+    @param group_name - name of the group shown in the email
+    @param changes - training id -> description of the change
+    @param reasons - training id -> checkout reason
+    @return number of cancelled check-ins
+    """
+    checkins = list(
+        TrainingCheckIn.objects.filter(training_id__in=changes)
+        .select_related("student__user")
+        .order_by("training__start")
+    )
+    if not checkins:
+        return 0
+
+    CheckoutHistory.objects.bulk_create([
+        CheckoutHistory(
+            student_id=checkin.student_id,
+            training_id=checkin.training_id,
+            checkin_date=checkin.date,
+            checkout_reason=reasons[checkin.training_id],
+        )
+        for checkin in checkins
+    ])
+    changes_by_student = defaultdict(list)
+    for checkin in checkins:
+        changes_by_student[checkin.student].append(changes[checkin.training_id])
+    for student, student_changes in changes_by_student.items():
+        student.notify(*settings.EMAIL_TEMPLATES['trainings_rescheduled'],
+                       student_name=student.user.first_name,
+                       group_name=group_name,
+                       changes="\n".join(student_changes))
+    TrainingCheckIn.objects.filter(pk__in=[checkin.pk for checkin in checkins]).delete()
+    return len(checkins)
+
+
+def reconcile_schedule_trainings(schedule: Schedule) -> Dict[str, int]:
+    """
+    Brings future trainings of a changed schedule timeslot in line with it.
+    Trainings are matched by week: a training with another time or group is moved, a training with another class
+    is updated in place, missing trainings are created and only trainings left without a week are deleted.
+    Check-ins survive unless their training is moved or deleted
+    @return numbers of created, updated, moved and deleted trainings and cancelled check-ins
+    """
+    existing = {}
+    obsolete = []
+    for training in Training.objects.filter(schedule=schedule, start__gt=timezone.now()).order_by("start"):
+        week = training_week(training)
+        if week in existing:
+            obsolete.append(training)
+        else:
+            existing[week] = training
+
+    created, updated = [], []
+    changes, reasons = {}, {}
+    group_name = schedule.group.to_frontend_name()
+    for desired in get_schedule_trainings(schedule, schedule.group.semester):
+        training = existing.pop(training_week(desired), None)
+        if training is None:
+            created.append(desired)
+            continue
+        old_start = to_current_timezone(training.start).strftime('%d.%m.%Y %H:%M')
+        if (training.start, training.end) != (desired.start, desired.end):
+            changes[training.pk] = "{} moved to {}{}".format(
+                old_start,
+                to_current_timezone(desired.start).strftime('%d.%m.%Y %H:%M'),
+                "" if training.group_id == desired.group_id else f" in group {group_name}",
+            )
+            reasons[training.pk] = CheckoutHistory.Reason.TRAINING_TIME_CHANGED
+        elif training.group_id != desired.group_id:
+            changes[training.pk] = f"{old_start} moved to group {group_name}"
+            reasons[training.pk] = CheckoutHistory.Reason.TRAINING_GROUP_CHANGED
+        elif training.training_class_id == desired.training_class_id:
+            continue
+        training.group_id = desired.group_id
+        training.start = desired.start
+        training.end = desired.end
+        training.training_class_id = desired.training_class_id
+        training.updated_at = timezone.now()
+        updated.append(training)
+    obsolete.extend(existing.values())
+    for training in obsolete:
+        changes[training.pk] = "{} cancelled".format(to_current_timezone(training.start).strftime('%d.%m.%Y %H:%M'))
+        reasons[training.pk] = CheckoutHistory.Reason.TRAINING_CANCELLED
+
+    # Check-ins are cancelled here at once, so per-training signals below have nobody to notify
+    checkouts = checkout_from_trainings(group_name, changes, reasons)
+    Training.objects.bulk_update(updated, ["group", "start", "end", "training_class", "updated_at"])
+    Training.objects.bulk_create(created)
+    Training.objects.filter(pk__in=[training.pk for training in obsolete]).delete()
+    return {
+        "created": len(created),
+        "updated": len(updated),
+        "moved": len(changes) - len(obsolete),
+        "deleted": len(obsolete),
+        "checkouts": checkouts,
+    }
+
+
+@receiver(post_save, sender=Schedule)
+def create_trainings_current_semester(instance: Schedule, created, **kwargs):
+    # if schedule was changed, only trainings that differ from it are changed
+    if not created:
+        reconcile_schedule_trainings(instance)
+        return
+
+    Training.objects.bulk_create(get_schedule_trainings(instance, instance.group.semester))
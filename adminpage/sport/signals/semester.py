@@ -3,15 +3,15 @@ import datetime
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group as AuthGroup
-from django.db.models.functions import Coalesce
-from django.db.models.signals import post_save, pre_save, m2m_changed, post_migrate
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed, post_migrate
 from django.dispatch.dispatcher import receiver
-from django.db.models import F, OuterRef, ExpressionWrapper, IntegerField
+from django.db.models import F
+from django.db.models.functions import Now
 from datetime import datetime
 
-from sport.models import Semester, Sport, Trainer, Group, Schedule, Student, Debt, Attendance
+from sport.models import Semester, Sport, Trainer, Group, Schedule, Student, Debt
 
-from api.crud import get_free_places_for_sport, SumSubquery, get_ongoing_semester
+from api.crud import get_free_places_for_sport, invalidate_ongoing_semester, roll_over_debts
 
 User = get_user_model()
 
@@ -51,6 +51,13 @@ def create_auth_groups(sender, **kwargs):
         get_or_create_college_group()
 
 
+# Must be registered before other semester receivers, which may resolve the ongoing semester
+@receiver(post_save, sender=Semester)
+@receiver(post_delete, sender=Semester)
+def reset_ongoing_semester(sender, instance, **kwargs):
+    invalidate_ongoing_semester()
+
+
 @receiver(post_save, sender=Semester)
 def special_groups_create(sender, instance, created, **kwargs):
     get_free_places_for_sport(1)
@@ -115,29 +122,10 @@ def validate_semester(sender, instance, *args, **kwargs):
             raise ValueError("Last semester has a intersection with other semester")
 
     if instance.pk is None:
-        try:
-            qs = Student.objects.filter(student_status_id=0, course__in=get_ongoing_semester().participating_courses.all())
-
-            # TODO: Fix duplicate warning
-            qs = qs.annotate(_debt=Coalesce(
-                SumSubquery(Debt.objects.filter(semester_id=get_ongoing_semester().pk,
-                                                student_id=OuterRef("pk")), 'debt'),
-                0
-            ))
-            qs = qs.annotate(_ongoing_semester_hours=Coalesce(
-                SumSubquery(Attendance.objects.filter(
-                    training__group__semester_id=get_ongoing_semester().pk, student_id=OuterRef("pk")), 'hours'),
-                0
-            ))
-            qs = qs.annotate(complex_hours=ExpressionWrapper(
-                F('_ongoing_semester_hours') - F('_debt'), output_field=IntegerField()
-            ))
-
-            for s in qs:
-                if s.complex_hours < get_ongoing_semester().hours:
-                    Debt.objects.get_or_create(student_id=s.pk, semester=None, debt=get_ongoing_semester().hours - s.complex_hours)
-        except:
-            pass
+        # Same choice as current_semester(), which fails when no semester has started yet
+        ongoing_semester = Semester.objects.filter(start__lte=Now()).order_by('-start').first()
+        if ongoing_semester is not None:
+            instance.rolled_over_debts = roll_over_debts(ongoing_semester)
 
 
 @receiver(m2m_changed, sender=Semester.nullify_groups.through)
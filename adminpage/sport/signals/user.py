@@ -8,7 +8,7 @@ from django.db.models.signals import m2m_changed, post_save, pre_save
 from django.dispatch.dispatcher import receiver
 from django_auth_adfs.signals import post_authenticate
 
-from sport.models import Student, Trainer, CustomPermission, Group as Group_model
+from sport.models import Student, Trainer, CustomPermission, StudentStatuses, Group as Group_model
 
 from api.crud.crud_semester import get_ongoing_semester
 
@@ -49,6 +49,9 @@ def create_student_profile(instance, action, reverse, pk_set, **kwargs):
 
 @receiver(post_save, sender=Student)
 def add_group_for_student_status(instance: Student, sender, using, **kwargs):
+    if not instance.has_changed("student_status_id"):
+        return
+
     expected_group_name = "STUDENT_STATUS_{}".format(instance.student_status.id)
     current_groups = instance.user.groups.filter(name__startswith="STUDENT_STATUS")
 
@@ -76,12 +79,15 @@ def add_group_for_student_status(instance: Student, sender, using, **kwargs):
 
 @receiver(pre_save, sender=Student)
 def change_course(instance: Student, sender, using, **kwargs):
-    if instance.student_status.name == "Alumnus":
+    if instance.student_status_id == StudentStatuses.ALUMNUS:
         instance.course = None
 
 
 @receiver(post_save, sender=Student)
 def change_online_status(instance: Student, sender, using, **kwargs):
+    if not instance.has_changed("is_online"):
+        return
+
     user = User.objects.get(id=instance.user_id)
     content_type = ContentType.objects.get_for_model(CustomPermission)
     if instance.is_online is True:
@@ -92,12 +98,15 @@ def change_online_status(instance: Student, sender, using, **kwargs):
 
 @receiver(post_save, sender=Student)
 def change_status_to_academic_leave(instance: Student, sender, using, **kwargs):
-    if instance.student_status.name == "Academic leave":
+    if instance.has_changed("student_status_id") and instance.student_status.name == "Academic leave":
         get_ongoing_semester().academic_leave_students.add(instance)
 
 
 @receiver(post_save, sender=Student)
 def change_sport_of_student(instance: Student, sender, using, **kwargs):
+    if not instance.has_changed("sport_id"):
+        return
+
     groups = get_student_groups(instance)
     if len(groups) == 0:
         return
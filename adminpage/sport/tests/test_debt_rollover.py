@@ -0,0 +1,71 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.crud import get_debts_to_roll_over
+from sport.models import Semester, Debt, StudentStatuses
+from sport.models.course import Course
+
+
+@pytest.mark.django_db
+def test_debt_rollover(
+        user_factory,
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        training_factory,
+        attendance_factory,
+):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 2, 20))
+    semester.participating_courses.set([Course.objects.get_or_create(course=1)[0]])
+    group = group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=semester)
+    training = training_factory(
+        group=group,
+        start=datetime(2020, 1, 15, 12, 0, 0, tzinfo=timezone.utc),
+        end=datetime(2020, 1, 15, 13, 30, 0, tzinfo=timezone.utc),
+    )
+
+    def student(email, hours, course=1, status=StudentStatuses.NORMAL):
+        obj = student_factory(email).student
+        obj.course = course
+        obj.student_status_id = status
+        obj.save()
+        if hours:
+            attendance_factory(obj, training, hours)
+        return obj
+
+    lacking = student("lacking@example.com", 10)
+    indebted = student("indebted@example.com", 5)
+    Debt.objects.create(student=indebted, semester=semester, debt=3)
+    student("enough@example.com", semester.hours)
+    student("other_course@example.com", 0, course=2)
+    student("dropped@example.com", 0, status=StudentStatuses.DROPPED)
+
+    expected = [
+        {"student_id": indebted.pk, "email": "indebted@example.com", "debt": semester.hours - 2},
+        {"student_id": lacking.pk, "email": "lacking@example.com", "debt": semester.hours - 10},
+    ]
+    preview = [{k: v for k, v in debt.items() if k != "full_name"} for debt in get_debts_to_roll_over(semester)]
+    assert preview == expected
+
+    admin = user_factory("admin@example.com", password="password", is_staff=True, is_superuser=True)
+    client = APIClient()
+    client.force_login(admin)
+    response = client.post(reverse("admin:sport_semester_changelist"), {
+        "action": "preview_debt_rollover",
+        ACTION_CHECKBOX_NAME: [semester.pk],
+    })
+    assert response.status_code == 200
+    assert b"lacking@example.com" in response.content
+    # the preview is a dry run
+    assert Debt.objects.count() == 1
+
+    next_semester = Semester.objects.create(name="F20", start=date(2020, 8, 20), end=date(2020, 12, 20))
+    assert next_semester.rolled_over_debts == 2
+    assert sorted(Debt.objects.filter(semester=next_semester).values_list("student_id", "debt")) == sorted(
+        (debt["student_id"], debt["debt"]) for debt in expected
+    )
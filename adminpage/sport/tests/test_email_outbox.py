@@ -0,0 +1,57 @@
+import pytest
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from sport.models import EmailOutbox
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-01-15 12:00')
+def test_send_outbox_emails(student_factory, monkeypatch, freezer):
+    good = student_factory("good@foo.bar").student
+    bad = student_factory("bad@foo.bar").student
+
+    good.notify("Subject", "Hello, {name}\nBye", name="good")
+    bad.notify("Subject", "Hello, {name}", name="bad")
+    # emails are queued instead of being sent in place
+    assert len(mail.outbox) == 0
+    assert EmailOutbox.objects.count() == 2
+
+    send_messages = EmailBackend.send_messages
+
+    def flaky_send_messages(self, messages):
+        if "bad@foo.bar" in messages[0].to:
+            raise ConnectionError("SMTP is down")
+        return send_messages(self, messages)
+
+    monkeypatch.setattr(EmailBackend, "send_messages", flaky_send_messages)
+    call_command("send_outbox_emails")
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == ["good@foo.bar"]
+    assert mail.outbox[0].body == "Hello, good\nBye"
+    assert mail.outbox[0].alternatives[0][0] == "Hello, good<br>Bye"
+
+    failed = EmailOutbox.objects.get(recipients=["bad@foo.bar"])
+    assert failed.sent_at is None
+    assert failed.attempts == 1
+    assert failed.last_error == "ConnectionError: SMTP is down"
+
+    # the email is retried only after a delay, which grows with every attempt
+    call_command("send_outbox_emails")
+    assert EmailOutbox.objects.get(pk=failed.pk).attempts == 1
+    freezer.tick(settings.EMAIL_OUTBOX_RETRY_DELAY)
+    call_command("send_outbox_emails")
+    failed.refresh_from_db()
+    assert failed.attempts == 2
+    assert failed.next_attempt_at == timezone.now() + settings.EMAIL_OUTBOX_RETRY_DELAY * 2
+
+    monkeypatch.setattr(EmailBackend, "send_messages", send_messages)
+    freezer.tick(settings.EMAIL_OUTBOX_RETRY_DELAY * 2)
+    call_command("send_outbox_emails")
+    failed.refresh_from_db()
+    assert failed.sent_at is not None
+    assert [m.to for m in mail.outbox] == [["good@foo.bar"], ["bad@foo.bar"]]
@@ -0,0 +1,78 @@
+from datetime import date, time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from sport.admin.utils import copy_sport_groups_and_schedule_from_semester
+from sport.models import Group, Schedule, Semester, Training, MedicalGroups
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-08-10 10:00')
+def test_copy_semester_groups_and_schedule(
+        student_factory,
+        trainer_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+        schedule_factory,
+):
+    prev_semester = semester_factory("S20", date(2020, 1, 20), date(2020, 5, 31))
+    sport = sport_factory("Football")
+    trainer = trainer_factory("trainer@example.com").trainer
+    allowed = student_factory("allowed@example.com").student
+    banned = student_factory("banned@example.com").student
+    groups_count = 30
+    for i in range(groups_count):
+        group = group_factory(f"G{i}", capacity=20, sport=sport, semester=prev_semester, trainer=trainer)
+        group.allowed_students.add(allowed)
+        group.banned_students.add(banned)
+        schedule_factory(group, Schedule.Weekday.MONDAY, time(10, 0), time(11, 30))
+        schedule_factory(group, Schedule.Weekday.THURSDAY, time(18, 0), time(19, 30))
+
+    semester = Semester(name="F20", start=date(2020, 8, 24), end=date(2020, 9, 6))
+    with CaptureQueriesContext(connection) as queries:
+        report = copy_sport_groups_and_schedule_from_semester(semester, prev_semester, copy_students=True)
+
+    # saving the semester itself takes most of the queries, copying takes a constant number
+    assert len(queries) < 50
+    assert report["groups"] == groups_count
+    assert report["schedules"] == 2 * groups_count
+    assert report["trainings"] == 4 * groups_count
+    # teacher, 3 medical groups, allowed and banned student per group
+    assert report["links"] == 6 * groups_count
+
+    new_groups = Group.objects.filter(semester=semester, sport=sport)
+    assert new_groups.count() == groups_count
+    for group in new_groups.prefetch_related("trainers", "allowed_medical_groups", "allowed_students",
+                                             "banned_students"):
+        assert list(group.trainers.all()) == [trainer]
+        assert sorted(medical_group.pk for medical_group in group.allowed_medical_groups.all()) == [
+            MedicalGroups.SPECIAL1, MedicalGroups.PREPARATIVE, MedicalGroups.GENERAL,
+        ]
+        assert list(group.allowed_students.all()) == [allowed]
+        assert list(group.banned_students.all()) == [banned]
+    assert Training.objects.filter(group__semester=semester).count() == 4 * groups_count
+    assert Training.objects.filter(group__semester=semester, schedule__group__semester=semester).count() \
+        == 4 * groups_count
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2020-08-10 10:00')
+def test_copy_semester_skips_student_lists(
+        student_factory,
+        sport_factory,
+        semester_factory,
+        group_factory,
+):
+    prev_semester = semester_factory("S20", date(2020, 1, 20), date(2020, 5, 31))
+    group = group_factory("G1", capacity=20, sport=sport_factory("Football"), semester=prev_semester)
+    group.allowed_students.add(student_factory("allowed@example.com").student)
+
+    semester = Semester(name="F20", start=date(2020, 8, 24), end=date(2020, 9, 6))
+    copy_sport_groups_and_schedule_from_semester(semester, prev_semester)
+
+    new_group = Group.objects.get(semester=semester, name="G1")
+    assert not new_group.allowed_students.exists()
+    assert new_group.allowed_medical_groups.count() == 3
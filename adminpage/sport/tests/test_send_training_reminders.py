@@ -0,0 +1,50 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from django.core.management import call_command
+
+from sport.models import EmailOutbox, TrainingCheckIn, TrainingReminder
+
+training_start = datetime(2020, 1, 15, 15, 0, 0, tzinfo=timezone.utc)
+training_end = datetime(2020, 1, 15, 16, 30, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+# Morning run, 08:00 in Moscow
+@pytest.mark.freeze_time(datetime(2020, 1, 15, 5, 0, 0, tzinfo=timezone.utc))
+def test_send_training_reminders(student_factory, sport_factory, semester_factory, group_factory,
+                                 training_factory, django_assert_max_num_queries):
+    semester = semester_factory("S20", date(2020, 1, 1), date(2020, 1, 30))
+    trainings = [
+        training_factory(
+            group=group_factory(f"G{i}", capacity=20, sport=sport_factory(f"sport {i}"), semester=semester),
+            start=training_start,
+            end=training_end,
+        )
+        for i in range(3)
+    ]
+    training = trainings[0]
+    students = [student_factory(email=f"student{i}@example.com").student for i in range(5)]
+    for student in students:
+        TrainingCheckIn.objects.create(student=student, training=training)
+    for other in trainings[1:]:
+        TrainingCheckIn.objects.create(student=students[0], training=other)
+
+    call_command("send_training_reminders", "--dry-run")
+    assert not EmailOutbox.objects.exists()
+    assert not TrainingReminder.objects.exists()
+
+    # the number of queries must not depend on the number of reminders and trainings
+    with django_assert_max_num_queries(8):
+        call_command("send_training_reminders")
+
+    emails = EmailOutbox.objects.order_by("pk")
+    assert [email.recipients for email in emails[:5]] == [[s.user.email] for s in students]
+    assert "18:00" in emails[0].message
+    assert "<br>" in emails[0].html_message
+    assert ["sport 1 - G1" in email.message for email in emails[5:]] == [True, False]
+    assert TrainingReminder.objects.filter(training=training).count() == 5
+
+    # students are reminded only once
+    call_command("send_training_reminders")
+    assert EmailOutbox.objects.count() == 7
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+import pytest
+
+from sport.models import Student, StudentStatuses, MedicalGroupHistory, MedicalGroups
+from sport.utils import today
+
+
+@pytest.mark.django_db
+def test_unchanged_student_save_is_one_query(student_factory, django_assert_num_queries):
+    user = student_factory("student@foo.bar")
+    student = Student.objects.get(pk=user.pk)
+
+    # post_save handlers skip unchanged fields, only the update is left
+    with django_assert_num_queries(1):
+        student.save()
+
+    # a user save (e.g. on login) saves the student too
+    user.refresh_from_db()
+    with django_assert_num_queries(4):
+        user.save()
+
+
+@pytest.mark.django_db
+def test_student_changes_run_handlers(student_factory, semester_factory):
+    semester = semester_factory("S20", today() - timedelta(days=10), today() + timedelta(days=10))
+    student = student_factory("student@foo.bar").student
+    assert student.user.groups.filter(name=f"STUDENT_STATUS_{StudentStatuses.NORMAL}").exists()
+    assert not MedicalGroupHistory.objects.filter(student=student).exists()
+
+    student.is_online = True
+    student.student_status_id = StudentStatuses.ACADEMIC_LEAVE
+    student.medical_group_id = MedicalGroups.GENERAL
+    student.save()
+    assert student.has_changed("is_online") and not student.has_changed("sport_id")
+
+    user = student.user
+    assert user.user_permissions.filter(codename="more_than_10_hours_of_self_sport").exists()
+    assert list(user.groups.filter(name__startswith="STUDENT_STATUS").values_list("name", flat=True)) == [
+        f"STUDENT_STATUS_{StudentStatuses.ACADEMIC_LEAVE}"
+    ]
+    assert semester.academic_leave_students.filter(pk=student.pk).exists()
+    assert MedicalGroupHistory.objects.filter(student=student, medical_group_id=MedicalGroups.GENERAL).count() == 1
+
+    student.save()
+    assert not any(student.has_changed(field) for field in Student.TRACKED_FIELDS)
+    assert MedicalGroupHistory.objects.filter(student=student).count() == 1
+
+
+@pytest.mark.django_db
+def test_deferred_student_fields_are_not_changed(student_factory):
+    user = student_factory("student@foo.bar")
+    student = Student.objects.only("user_id", "telegram").get(pk=user.pk)
+
+    student.save()
+    assert not any(student.has_changed(field) for field in Student.TRACKED_FIELDS)
+    assert not MedicalGroupHistory.objects.filter(student=student).exists()
@@ -4,13 +4,14 @@ from typing import TYPE_CHECKING
 from datetime import date
 from enum import IntEnum
 
-from django.core.mail import send_mail
 from django.conf import settings
 from django.db.models import QuerySet
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils import timezone
 
+from sport.models.email_outbox import EmailOutbox
+
 if TYPE_CHECKING:
     from sport.models import Student
 
@@ -55,13 +56,19 @@ def today() -> date:
 def str_or_empty(field) -> str:
     return str(field) if field else ""
 
+
+def email_html(message: str) -> str:
+    """HTML version of a plain text email"""
+    return message.replace("\n", "<br>")
+
+
 def notify_students(students: QuerySet[Student], subject, message, **kwargs):
     msg = message.format(**kwargs)
     emails = list(students.values_list("user__email", flat=True).distinct())
-    send_mail(
+    EmailOutbox.enqueue(
         subject,
         msg,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=emails,
-        html_message=msg.replace("\n", "<br>"),
+        html_message=email_html(msg),
     )